@@ -8,14 +8,147 @@ Programa de gestión de asistencia con columnas de días (lunes a viernes) y sop
   5) Guardar/actualizar la asistencia en la base de datos.
 """
 
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-import sqlite3
-import calendar
-from datetime import datetime, date
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+
+import archivo_anual
+import bd
+import importar_asistencia
+import mantenimiento
+import memoria
+import respaldo
 
 DB_PATH = "asistencia_multiples_cursos.db"
 
+# Intervalo entre instantáneas automáticas de la base (minutos)
+INTERVALO_RESPALDO_MIN = 30
+
+# Intervalo entre mantenimientos automáticos: huérfanos, ANALYZE y vacuum incremental (minutos)
+INTERVALO_MANTENIMIENTO_MIN = 6 * 60
+
+# Intervalo de sondeo de cambios hechos por otras estaciones (ms)
+INTERVALO_SONDEO_MS = 2000
+
+# Color de las celdas con conflictos de edición entre estaciones
+COLOR_CONFLICTO = "#FFB6C1"
+
+# Espera sin nuevos cambios antes de guardar automáticamente (ms)
+DEBOUNCE_AUTOGUARDADO_MS = 1500
+
+# Ediciones que se pueden deshacer
+MAX_DESHACER = 200
+
+# Meses que se mantienen en memoria para navegar sin volver a consultar la BD
+MESES_EN_CACHE = 12
+
+
+def leer_datos_mes(id_curso, anio, mes):
+    """
+    Lee de la BD los alumnos de un curso y sus registros del mes.
+    Devuelve (alumnos, registros) con registros: (id_alumno, fecha_iso) -> (presente, versión).
+    Abre su propia conexión, por lo que puede usarse desde un hilo de precarga.
+    """
+    archivado = archivo_anual.esta_archivado(anio)
+    conn = archivo_anual.conectar([anio]) if archivado else bd.conectar(DB_PATH)
+    try:
+        dias = bd.dias_laborales(anio, mes)
+        # Un año archivado muestra los alumnos que tenía el curso ese año
+        tabla = archivo_anual.tabla_asistencia(anio)
+        alumnos = bd.listar_alumnos(conn, id_curso, tabla)
+        registros = bd.leer_mes(
+            conn, id_curso, dias[0].isoformat(), dias[-1].isoformat(), tabla, con_version=not archivado
+        )
+    finally:
+        conn.close()
+    return alumnos, registros
+
+
+class CacheMeses:
+    """
+    Caché LRU de meses cargados, con clave (id_curso, año, mes).
+    Se vacía cuando cambia PRAGMA data_version de la conexión de monitoreo,
+    es decir, cuando cualquier conexión confirmó cambios en la base.
+    """
+
+    def __init__(self, capacidad=MESES_EN_CACHE):
+        self.capacidad = capacidad
+        self.datos = OrderedDict()
+        self.data_version = None
+        self.lock = threading.Lock()
+
+    def validar(self, data_version):
+        """Vacía la caché si la base cambió desde la última validación."""
+        with self.lock:
+            if data_version != self.data_version:
+                self.datos.clear()
+                self.data_version = data_version
+
+    def obtener(self, clave):
+        with self.lock:
+            if clave not in self.datos:
+                return None
+            self.datos.move_to_end(clave)
+            return self.datos[clave]
+
+    def contiene(self, clave):
+        with self.lock:
+            return clave in self.datos
+
+    def guardar(self, clave, valor, data_version):
+        """Guarda un mes leído con la base en data_version; se descarta si la base cambió entretanto."""
+        with self.lock:
+            if data_version != self.data_version:
+                return
+            self.datos[clave] = valor
+            self.datos.move_to_end(clave)
+            while len(self.datos) > self.capacidad:
+                self.datos.popitem(last=False)
+
+
+class DiarioEdiciones:
+    """
+    Diario en memoria de las ediciones de la grilla, para deshacer y rehacer.
+    Cada entrada es una lista de cambios (clave, valor_anterior, valor_nuevo);
+    una operación masiva se registra como una sola entrada.
+    """
+
+    def __init__(self, maximo=MAX_DESHACER):
+        self.maximo = maximo
+        self.entradas = []
+        self.posicion = 0  # Entradas aplicadas; las siguientes se pueden rehacer
+
+    def registrar(self, cambios):
+        """Agrega una entrada y descarta lo que se podía rehacer."""
+        if not cambios:
+            return
+        del self.entradas[self.posicion:]
+        self.entradas.append(list(cambios))
+        if len(self.entradas) > self.maximo:
+            del self.entradas[0]
+        self.posicion = len(self.entradas)
+
+    def deshacer(self):
+        """Devuelve [(clave, valor)] para revertir la última entrada, o None si no hay."""
+        if self.posicion == 0:
+            return None
+        self.posicion -= 1
+        return [(clave, antes) for clave, antes, _ in reversed(self.entradas[self.posicion])]
+
+    def rehacer(self):
+        """Devuelve [(clave, valor)] para volver a aplicar la entrada deshecha, o None si no hay."""
+        if self.posicion == len(self.entradas):
+            return None
+        self.posicion += 1
+        return [(clave, despues) for clave, _, despues in self.entradas[self.posicion - 1]]
+
+    def limpiar(self):
+        self.entradas.clear()
+        self.posicion = 0
+
+
 class AsistenciaApp:
     def __init__(self, root):
         self.root = root
@@ -58,6 +191,10 @@ class AsistenciaApp:
         btn_guardar = tk.Button(top_frame, text="Guardar", command=self.guardar_asistencia)
         btn_guardar.pack(side=tk.LEFT, padx=5)
         
+        # Botones para deshacer y rehacer ediciones (también Ctrl+Z / Ctrl+Y)
+        tk.Button(top_frame, text="Deshacer", command=self.deshacer).pack(side=tk.LEFT, padx=2)
+        tk.Button(top_frame, text="Rehacer", command=self.rehacer).pack(side=tk.LEFT, padx=2)
+        
         # Botón para cargar alumnos desde TXT
         btn_cargar_alumnos = tk.Button(top_frame, text="Cargar Alumnos", command=self.cargar_alumnos_desde_txt)
         btn_cargar_alumnos.pack(side=tk.LEFT, padx=5)
@@ -66,10 +203,32 @@ class AsistenciaApp:
         btn_importar_alumnos = tk.Button(top_frame, text="Importar Alumnos", command=self.importar_alumnos_desde_txt)
         btn_importar_alumnos.pack(side=tk.LEFT, padx=5)
         
+        # Botón para importar asistencia desde CSV (registros en papel o lectores de tarjetas)
+        btn_importar_asistencia = tk.Button(top_frame, text="Importar Asistencia", command=self.importar_asistencia_desde_csv)
+        btn_importar_asistencia.pack(side=tk.LEFT, padx=5)
+        
         # Botón para agregar alumno manualmente
         btn_agregar_alumno = tk.Button(top_frame, text="Agregar Alumno", command=self.agregar_alumno)
         btn_agregar_alumno.pack(side=tk.LEFT, padx=5)
         
+        # Botón para respaldar la base de datos (en segundo plano)
+        btn_respaldar = tk.Button(top_frame, text="Respaldar", command=self.respaldar_db)
+        btn_respaldar.pack(side=tk.LEFT, padx=5)
+        
+        # Indicador del guardado automático (guardado / pendiente / guardando)
+        self.label_estado = tk.Label(top_frame, text="Guardado", fg="green")
+        self.label_estado.pack(side=tk.RIGHT, padx=5)
+        
+        # Búsqueda de alumnos en todos los cursos (sin distinguir tildes, admite nombres parciales)
+        buscar_frame = tk.Frame(self.root)
+        buscar_frame.pack(side=tk.TOP, fill=tk.X, padx=5)
+        tk.Label(buscar_frame, text="Buscar alumno:").pack(side=tk.LEFT, padx=5)
+        self.texto_busqueda = tk.StringVar()
+        entry_busqueda = tk.Entry(buscar_frame, textvariable=self.texto_busqueda, width=30)
+        entry_busqueda.pack(side=tk.LEFT)
+        entry_busqueda.bind("<Return>", lambda e: self.buscar_alumno())
+        tk.Button(buscar_frame, text="Buscar", command=self.buscar_alumno).pack(side=tk.LEFT, padx=5)
+        
         # Frame que contendrá la grilla (canvas con scroll horizontal y vertical)
         self.frame_grilla = tk.Frame(self.root)
         self.frame_grilla.pack(fill=tk.BOTH, expand=True)
@@ -102,50 +261,77 @@ class AsistenciaApp:
         # Lista de días (datetime.date) de lunes a viernes para el mes cargado
         self.dias_laborales = []
         
+        # Indica si el mes cargado pertenece a un año archivado (solo lectura)
+        self.anio_archivado = False
+        
+        # Estado de cada celda al cargarla, para guardar solo lo modificado y detectar conflictos
+        # Clave: (id_alumno, fecha_date) -> versión de la fila en la BD (None si no existía)
+        self.versiones = {}
+        # Clave: (id_alumno, fecha_date) -> valor presente al cargar o al último guardado
+        self.valores_cargados = {}
+        # Clave: (id_alumno, fecha_date) -> tk.Checkbutton
+        self.checks = {}
+        # Clave: id_alumno -> (label total asistido, label % asistido)
+        self.labels_totales = {}
+        # Clave: id_alumno -> label con el nombre (para ubicar al alumno en la grilla)
+        self.labels_nombres = {}
+        self.id_curso_cargado = None
+        
         # Label para mostrar info (por ejemplo, si no hay alumnos, etc.)
         self.label_info = tk.Label(self.root, text="", fg="blue")
         self.label_info.pack(pady=2)
+        
+        # Contador de widgets, variables Tcl y memoria (para detectar fugas en sesiones largas)
+        self.label_memoria = tk.Label(self.root, text="", fg="gray")
+        self.label_memoria.pack(side=tk.BOTTOM, anchor="e", padx=5)
+        memoria.mostrar_contador(self.root, self.label_memoria)
+        
+        # Menú contextual de días y alumnos: uno solo, que se rearma en cada clic derecho
+        self.menu_contextual = tk.Menu(self.root, tearoff=0)
+        
+        # Instantáneas automáticas de la base de datos
+        self.hilo_respaldo = None
+        self.root.after(INTERVALO_RESPALDO_MIN * 60 * 1000, self.respaldo_programado)
+        
+        # Mantenimiento automático en segundo plano
+        self.hilo_mantenimiento = None
+        self.root.after(INTERVALO_MANTENIMIENTO_MIN * 60 * 1000, self.mantenimiento_programado)
+        
+        # Conexión dedicada a detectar cambios de otras estaciones (PRAGMA data_version)
+        self.conn_monitor = bd.conectar(DB_PATH)
+        self.ultima_data_version = bd.data_version(self.conn_monitor)
+        self.root.after(INTERVALO_SONDEO_MS, self.sondear_cambios)
+        
+        # Meses ya leídos (incluye los precargados en segundo plano)
+        self.cache_meses = CacheMeses()
+        
+        # Guardado automático: cambios pendientes, los que se están guardando en segundo plano
+        # y el hilo que los guarda. Clave -> (presente, versión cargada, id_curso): cada celda lleva
+        # los datos de la grilla en que se editó, aunque luego se cargue otro curso o mes
+        self.pendientes = {}
+        self.en_vuelo = {}
+        self.hilo_guardado = None
+        self.id_autoguardado = None
+        # Mientras es True, los cambios en la grilla no se encolan (vienen de la BD)
+        self.suspender_autoguardado = False
+        self.root.protocol("WM_DELETE_WINDOW", self.al_cerrar)
+        
+        # Diario de ediciones para deshacer/rehacer y valor actual de cada celda de la grilla
+        self.diario = DiarioEdiciones()
+        self.valores_grilla = {}
+        self.root.bind_all("<Control-z>", self.deshacer)
+        self.root.bind_all("<Control-y>", self.rehacer)
     
     def crear_db(self):
         """Crea la base de datos y las tablas si no existen."""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Tabla de cursos
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cursos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT UNIQUE
-            )
-        """)
-        
-        # Tabla de alumnos (relacionados a un curso)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS alumnos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT,
-                id_curso INTEGER,
-                FOREIGN KEY(id_curso) REFERENCES cursos(id)
-            )
-        """)
-        
-        # Tabla de asistencia
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS asistencia (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                id_alumno INTEGER,
-                fecha TEXT,
-                presente INTEGER,
-                FOREIGN KEY(id_alumno) REFERENCES alumnos(id)
-            )
-        """)
-        
-        conn.commit()
+        conn = bd.conectar(DB_PATH)
+        # Tablas cursos, alumnos y asistencia, versión por fila e índice único (alumno, fecha)
+        bd.crear_esquema(conn)
         conn.close()
     
     def cargar_cursos_iniciales(self):
         """Opcional: inserta algunos cursos de ejemplo si la tabla está vacía."""
-        conn = sqlite3.connect(DB_PATH)
+        conn = bd.conectar(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM cursos")
         count = cursor.fetchone()[0]
@@ -162,7 +348,7 @@ class AsistenciaApp:
         Opcional: inserta algunos alumnos de ejemplo si la tabla está vacía.
         Todos se asocian al primer curso (id=1) para ilustrar.
         """
-        conn = sqlite3.connect(DB_PATH)
+        conn = bd.conectar(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM alumnos")
         count = cursor.fetchone()[0]
@@ -182,10 +368,8 @@ class AsistenciaApp:
     
     def cargar_cursos_en_combobox(self):
         """Carga la lista de cursos desde la BD en el ComboBox."""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT nombre FROM cursos ORDER BY nombre")
-        cursos = [row[0] for row in cursor.fetchall()]
+        conn = bd.conectar(DB_PATH)
+        cursos = [nombre for _, nombre in bd.listar_cursos(conn)]
         conn.close()
         
         self.combo_cursos['values'] = cursos
@@ -194,24 +378,17 @@ class AsistenciaApp:
     
     def get_id_curso_por_nombre(self, nombre_curso):
         """Devuelve el id de un curso dado su nombre."""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM cursos WHERE nombre = ?", (nombre_curso,))
-        row = cursor.fetchone()
+        conn = bd.conectar(DB_PATH)
+        id_curso = bd.id_curso_por_nombre(conn, nombre_curso)
         conn.close()
-        return row[0] if row else None
+        return id_curso
     
     def obtener_dias_laborales(self, anio, mes):
         """
         Devuelve una lista de objetos date correspondientes
         a lunes-viernes del mes dado.
         """
-        cal = calendar.Calendar()
-        dias = []
-        for d in cal.itermonthdates(anio, mes):
-            if d.month == mes and d.weekday() < 5:  # weekday(): 0->lunes, 4->viernes
-                dias.append(d)
-        return dias
+        return bd.dias_laborales(anio, mes)
     
     def cargar_asistencia(self):
         """
@@ -233,26 +410,30 @@ class AsistenciaApp:
         mes = self.mes_seleccionado.get()
         anio = self.anio_seleccionado.get()
         
+        # Guardar lo pendiente del mes actual antes de reemplazar la grilla: al terminar se refrescan
+        # las celdas del mes en pantalla, que todavía es el anterior
+        self.vaciar_pendientes(esperar=True)
+        
         # Obtener lista de días laborales
         self.dias_laborales = self.obtener_dias_laborales(anio, mes)
         
         # Limpiar el frame para reconstruir la grilla
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        self.asistencia_vars.clear()
+        self.limpiar_grilla()
+        self.id_curso_cargado = id_curso
         
-        # Cargar alumnos del curso
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, nombre FROM alumnos WHERE id_curso = ? ORDER BY nombre", (id_curso,))
-        alumnos = cursor.fetchall()
+        # Los años archivados se leen desde su base adjunta en solo lectura
+        self.anio_archivado = archivo_anual.esta_archivado(anio)
+        
+        # Alumnos del curso y registros del mes: (id_alumno, fecha_iso) -> (presente, versión)
+        alumnos, registros = self.obtener_datos_mes(id_curso, anio, mes)
         
         if not alumnos:
             self.label_info.config(text="No hay alumnos en este curso.")
-            conn.close()
             return
+        elif self.anio_archivado:
+            self.label_info.config(text=f"Alumnos del {curso} para {mes}/{anio} (año archivado, solo lectura)")
         else:
-            self.label_info.config(text=f"Alumnos del {curso} para {mes}/{anio}")
+            self.label_info.config(text=f"Alumnos del {curso} para {mes}/{anio} (clic derecho en un día o alumno para marcar en bloque)")
         
         # Título de columnas (primer row)
         # Columna 0: "Alumno"
@@ -263,8 +444,10 @@ class AsistenciaApp:
         for col_idx, dia in enumerate(self.dias_laborales, start=1):
             # Encabezado con fecha en formato dd/mm
             dia_str = dia.strftime("%d/%m")
-            tk.Label(self.scrollable_frame, text=dia_str, font=("Arial", 10, "bold"), borderwidth=1, relief="solid", width=8)\
-                .grid(row=0, column=col_idx, sticky="nsew")
+            label_dia = tk.Label(self.scrollable_frame, text=dia_str, font=("Arial", 10, "bold"), borderwidth=1, relief="solid", width=8)
+            label_dia.grid(row=0, column=col_idx, sticky="nsew")
+            # Clic derecho: operaciones sobre todo el día
+            label_dia.bind("<Button-3>", lambda e, dia=dia: self.menu_dia(e, dia))
         
         # Columnas para total asistido y porcentaje asistido
         tk.Label(self.scrollable_frame, text="Total Asistido", font=("Arial", 10, "bold"), borderwidth=1, relief="solid", width=15)\
@@ -275,8 +458,11 @@ class AsistenciaApp:
         # Para cada alumno, fila
         for row_idx, (id_alumno, nombre_alumno) in enumerate(alumnos, start=1):
             # Nombre del alumno
-            tk.Label(self.scrollable_frame, text=nombre_alumno, borderwidth=1, relief="solid", width=30)\
-                .grid(row=row_idx, column=0, sticky="nsew")
+            label_nombre = tk.Label(self.scrollable_frame, text=nombre_alumno, borderwidth=1, relief="solid", width=30)
+            label_nombre.grid(row=row_idx, column=0, sticky="nsew")
+            self.labels_nombres[id_alumno] = label_nombre
+            # Clic derecho: operaciones sobre un rango de días del alumno
+            label_nombre.bind("<Button-3>", lambda e, id_alumno=id_alumno: self.menu_alumno(e, id_alumno))
             
             total_asistido = 0
             
@@ -284,29 +470,33 @@ class AsistenciaApp:
             for col_idx, dia in enumerate(self.dias_laborales, start=1):
                 var_check = tk.IntVar(value=0)
                 # Ver si ya existe un registro en la BD para ese alumno y día
-                cursor.execute("""
-                    SELECT presente FROM asistencia
-                    WHERE id_alumno = ? AND fecha = ?
-                """, (id_alumno, dia.isoformat()))
-                row_db = cursor.fetchone()
-                if row_db:
-                    var_check.set(row_db[0])  # 1 o 0
-                    total_asistido += row_db[0]
+                registro = registros.get((id_alumno, dia.isoformat()))
+                if registro:
+                    var_check.set(registro[0])  # 1 o 0
+                    total_asistido += registro[0]
                 
                 chk = tk.Checkbutton(self.scrollable_frame, variable=var_check)
                 chk.grid(row=row_idx, column=col_idx, sticky="nsew")
                 
-                # Guardar en diccionario
+                # Guardar en diccionarios
                 self.asistencia_vars[(id_alumno, dia)] = var_check
+                self.versiones[(id_alumno, dia)] = registro[1] if registro else None
+                self.valores_cargados[(id_alumno, dia)] = var_check.get()
+                self.valores_grilla[(id_alumno, dia)] = var_check.get()
+                self.checks[(id_alumno, dia)] = chk
+                
+                # Cada clic queda encolado para el guardado automático
+                var_check.trace_add("write", lambda *_, clave=(id_alumno, dia): self.celda_modificada(clave))
             
             # Calcular porcentaje asistido
             porcentaje_asistido = (total_asistido / len(self.dias_laborales)) * 100 if self.dias_laborales else 0
             
             # Mostrar total asistido y porcentaje asistido
-            tk.Label(self.scrollable_frame, text=str(total_asistido), borderwidth=1, relief="solid", width=15)\
-                .grid(row=row_idx, column=len(self.dias_laborales) + 1, sticky="nsew")
-            tk.Label(self.scrollable_frame, text=f"{porcentaje_asistido:.2f}%", borderwidth=1, relief="solid", width=15)\
-                .grid(row=row_idx, column=len(self.dias_laborales) + 2, sticky="nsew")
+            label_total = tk.Label(self.scrollable_frame, text=str(total_asistido), borderwidth=1, relief="solid", width=15)
+            label_total.grid(row=row_idx, column=len(self.dias_laborales) + 1, sticky="nsew")
+            label_porcentaje = tk.Label(self.scrollable_frame, text=f"{porcentaje_asistido:.2f}%", borderwidth=1, relief="solid", width=15)
+            label_porcentaje.grid(row=row_idx, column=len(self.dias_laborales) + 2, sticky="nsew")
+            self.labels_totales[id_alumno] = (label_total, label_porcentaje)
             
             # Botones para editar y borrar
             btn_editar = tk.Button(self.scrollable_frame, text="Editar", command=lambda id_alumno=id_alumno: self.editar_alumno(id_alumno))
@@ -315,7 +505,111 @@ class AsistenciaApp:
             btn_borrar = tk.Button(self.scrollable_frame, text="Borrar", command=lambda id_alumno=id_alumno: self.borrar_alumno(id_alumno))
             btn_borrar.grid(row=row_idx, column=len(self.dias_laborales) + 4, sticky="nsew")
         
+        # Dejar listos en segundo plano el mes anterior y el siguiente
+        self.precargar_meses_vecinos(id_curso, anio, mes)
+    
+    def limpiar_grilla(self):
+        """
+        Destruye los widgets de la grilla y libera sus variables: se quitan los trace de cada IntVar
+        (con sus comandos Tcl) y se borra la variable Tcl, aunque quede alguna referencia al IntVar.
+        """
+        for widget in self.scrollable_frame.winfo_children():
+            widget.destroy()
+        for var_check in self.asistencia_vars.values():
+            for modos, nombre in var_check.trace_info():
+                var_check.trace_remove(modos, nombre)
+            self.root.tk.globalunsetvar(str(var_check))
+        self.asistencia_vars.clear()
+        self.valores_grilla.clear()
+        self.diario.limpiar()
+        self.versiones.clear()
+        self.valores_cargados.clear()
+        self.checks.clear()
+        self.labels_totales.clear()
+        self.labels_nombres.clear()
+    
+    def obtener_datos_mes(self, id_curso, anio, mes):
+        """Devuelve (alumnos, registros) del mes desde la caché o, si no está, desde la BD."""
+        version = bd.data_version(self.conn_monitor)
+        self.cache_meses.validar(version)
+        datos = self.cache_meses.obtener((id_curso, anio, mes))
+        if datos is None:
+            datos = leer_datos_mes(id_curso, anio, mes)
+            self.cache_meses.guardar((id_curso, anio, mes), datos, version)
+        return datos
+    
+    def precargar_meses_vecinos(self, id_curso, anio, mes):
+        """Lee en un hilo aparte el mes anterior y el siguiente que no estén en caché."""
+        version = bd.data_version(self.conn_monitor)
+        anterior = (anio, mes - 1) if mes > 1 else (anio - 1, 12)
+        siguiente = (anio, mes + 1) if mes < 12 else (anio + 1, 1)
+        pendientes = [(id_curso, a, m) for a, m in (anterior, siguiente) if not self.cache_meses.contiene((id_curso, a, m))]
+        if not pendientes:
+            return
+        
+        def precargar():
+            for clave in pendientes:
+                try:
+                    self.cache_meses.guardar(clave, leer_datos_mes(*clave), version)
+                except Exception:
+                    # La precarga es opcional: si falla, el mes se leerá al pedirlo
+                    pass
+        
+        threading.Thread(target=precargar, name="precarga_meses", daemon=True).start()
+    
+    def buscar_alumno(self):
+        """Busca alumnos por nombre en todos los cursos y muestra los resultados."""
+        texto = self.texto_busqueda.get().strip()
+        if not texto:
+            return
+        conn = bd.conectar(DB_PATH)
+        resultados = bd.buscar_alumnos(conn, texto)
         conn.close()
+        
+        if not resultados:
+            messagebox.showinfo("Búsqueda", f"No se encontraron alumnos para \"{texto}\".")
+        elif len(resultados) == 1:
+            self.ir_a_alumno(resultados[0][0], resultados[0][3])
+        else:
+            self.mostrar_resultados_busqueda(resultados)
+    
+    def mostrar_resultados_busqueda(self, resultados):
+        """Ventana con los alumnos encontrados; doble clic o Enter lleva a su fila en la grilla."""
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Resultados de la búsqueda")
+        lista = tk.Listbox(ventana, width=60, height=min(len(resultados), 15))
+        lista.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        for _, nombre, _, nombre_curso in resultados:
+            lista.insert(tk.END, f"{nombre}  ({nombre_curso})")
+        lista.selection_set(0)
+        lista.focus_set()
+        
+        def elegir(event=None):
+            seleccion = lista.curselection()
+            if seleccion:
+                id_alumno, _, _, nombre_curso = resultados[seleccion[0]]
+                ventana.destroy()
+                self.ir_a_alumno(id_alumno, nombre_curso)
+        
+        lista.bind("<Double-Button-1>", elegir)
+        lista.bind("<Return>", elegir)
+    
+    def ir_a_alumno(self, id_alumno, nombre_curso):
+        """Carga el curso del alumno (si no está en pantalla), desplaza la grilla hasta su fila y la resalta."""
+        if self.curso_seleccionado.get() != nombre_curso or id_alumno not in self.labels_nombres:
+            self.curso_seleccionado.set(nombre_curso)
+            self.cargar_asistencia()
+        
+        label_nombre = self.labels_nombres.get(id_alumno)
+        if label_nombre is None:
+            return
+        self.canvas.update_idletasks()
+        fila = label_nombre.grid_info()["row"]
+        self.canvas.yview_moveto(max(fila - 1, 0) / (len(self.labels_nombres) + 1))
+        
+        color_normal = label_nombre.cget("bg")
+        label_nombre.config(bg="yellow")
+        self.root.after(2000, lambda: label_nombre.winfo_exists() and label_nombre.config(bg=color_normal))
     
     def agregar_alumno(self):
         """Agrega un nuevo alumno manualmente."""
@@ -331,7 +625,7 @@ class AsistenciaApp:
                 messagebox.showwarning("Atención", "Curso inválido.")
                 return
             
-            conn = sqlite3.connect(DB_PATH)
+            conn = bd.conectar(DB_PATH)
             cursor = conn.cursor()
             
             try:
@@ -348,7 +642,7 @@ class AsistenciaApp:
         """Edita el nombre de un alumno."""
         nuevo_nombre = simpledialog.askstring("Editar Alumno", "Ingrese el nuevo nombre del alumno:")
         if nuevo_nombre:
-            conn = sqlite3.connect(DB_PATH)
+            conn = bd.conectar(DB_PATH)
             cursor = conn.cursor()
             cursor.execute("UPDATE alumnos SET nombre = ? WHERE id = ?", (nuevo_nombre, id_alumno))
             conn.commit()
@@ -358,57 +652,464 @@ class AsistenciaApp:
     def borrar_alumno(self, id_alumno):
         """Borra un alumno de la base de datos."""
         if messagebox.askyesno("Confirmar Borrado", "¿Está seguro de que desea borrar este alumno?"):
-            conn = sqlite3.connect(DB_PATH)
+            conn = bd.conectar(DB_PATH)
             cursor = conn.cursor()
+            # Su asistencia se borra en cascada (ON DELETE CASCADE)
             cursor.execute("DELETE FROM alumnos WHERE id = ?", (id_alumno,))
-            cursor.execute("DELETE FROM asistencia WHERE id_alumno = ?", (id_alumno,))
             conn.commit()
             conn.close()
             self.cargar_asistencia()
     
+    def respaldar_db(self, programado=False):
+        """
+        Crea una instantánea de la base en un hilo aparte, sin bloquear la grilla.
+        El respaldo programado se omite si otra estación está respaldando o respaldó hace poco.
+        """
+        if self.hilo_respaldo and self.hilo_respaldo.is_alive():
+            return
+        # Con varias estaciones, basta la instantánea de una sola en cada intervalo
+        intervalo = INTERVALO_RESPALDO_MIN / 2 if programado else None
+        self.hilo_respaldo = respaldo.crear_instantanea_en_segundo_plano(DB_PATH, intervalo_min=intervalo)
+        if not programado:
+            self.label_info.config(text="Respaldando base de datos...")
+        self.root.after(200, self.verificar_respaldo)
+    
+    def verificar_respaldo(self):
+        """Consulta periódicamente si terminó el respaldo en curso y muestra el resultado."""
+        hilo = self.hilo_respaldo
+        if hilo.is_alive():
+            self.root.after(200, self.verificar_respaldo)
+        elif hilo.error:
+            self.label_info.config(text=f"Error al respaldar: {hilo.error}")
+        elif hilo.resultado:
+            self.label_info.config(text=f"Respaldo creado: {hilo.resultado}")
+    
+    def respaldo_programado(self):
+        """Crea una instantánea automática y programa la siguiente."""
+        self.respaldar_db(programado=True)
+        self.root.after(INTERVALO_RESPALDO_MIN * 60 * 1000, self.respaldo_programado)
+    
+    def mantenimiento_programado(self):
+        """Ejecuta el mantenimiento de la base en un hilo aparte y programa el siguiente."""
+        if not (self.hilo_mantenimiento and self.hilo_mantenimiento.is_alive()):
+            self.hilo_mantenimiento = mantenimiento.mantener_en_segundo_plano(DB_PATH)
+            self.root.after(200, self.verificar_mantenimiento)
+        self.root.after(INTERVALO_MANTENIMIENTO_MIN * 60 * 1000, self.mantenimiento_programado)
+    
+    def verificar_mantenimiento(self):
+        """Consulta periódicamente si terminó el mantenimiento en curso y muestra el resultado."""
+        hilo = self.hilo_mantenimiento
+        if hilo.is_alive():
+            self.root.after(200, self.verificar_mantenimiento)
+        elif hilo.error:
+            self.label_info.config(text=f"Error en el mantenimiento: {hilo.error}")
+        else:
+            self.label_info.config(text=f"Mantenimiento: {mantenimiento.describir(hilo.resultado)}")
+    
     def guardar_asistencia(self):
         """
-        Guarda/actualiza la asistencia en la base de datos
-        para todos los alumnos y días visibles.
+        Guarda/actualiza la asistencia en la base de datos.
+        Se escriben solo las celdas editadas (según el diario de ediciones), en segundo plano;
+        los días editados quedan registrados para todo el curso.
         """
         if not self.asistencia_vars:
             messagebox.showinfo("Información", "No hay datos para guardar.")
             return
+        if self.anio_archivado:
+            messagebox.showwarning("Atención", "El año cargado está archivado y es de solo lectura.")
+            return
+        self.vaciar_pendientes()
+    
+    def celda_modificada(self, clave):
+        """Registra en el diario el clic sobre una celda y lo encola para guardar."""
+        if self.suspender_autoguardado or self.anio_archivado:
+            return
+        nuevo = self.asistencia_vars[clave].get()
+        anterior = self.valores_grilla[clave]
+        if nuevo == anterior:
+            return
+        self.valores_grilla[clave] = nuevo
+        self.diario.registrar([(clave, anterior, nuevo)])
+        self.actualizar_totales(clave[0])
+        self.encolar_cambios([(clave, nuevo)])
+    
+    def aplicar_cambios(self, cambios, registrar=True, encolar=True):
+        """
+        Aplica en la grilla una lista de cambios (clave, valor) y, con encolar=True, los encola para guardar.
+        Con registrar=True quedan en el diario como una sola entrada (operaciones masivas).
+        """
+        if self.anio_archivado:
+            return
+        cambios = [(clave, valor) for clave, valor in cambios
+                   if clave in self.asistencia_vars and self.valores_grilla[clave] != valor]
+        if not cambios:
+            return
+        if registrar:
+            self.diario.registrar([(clave, self.valores_grilla[clave], valor) for clave, valor in cambios])
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        self.suspender_autoguardado = True
+        try:
+            for clave, valor in cambios:
+                self.asistencia_vars[clave].set(valor)
+                self.valores_grilla[clave] = valor
+        finally:
+            self.suspender_autoguardado = False
+        for id_alumno in {id_alumno for (id_alumno, _), _ in cambios}:
+            self.actualizar_totales(id_alumno)
+        if encolar:
+            self.encolar_cambios(cambios)
+    
+    def en_campo_de_texto(self, event):
+        """Indica si el atajo se pulsó escribiendo en un campo de texto (búsqueda, diálogos), que tiene su propio deshacer."""
+        return event is not None and isinstance(event.widget, (tk.Entry, ttk.Entry, tk.Text))
+    
+    def deshacer(self, event=None):
+        """Revierte la última edición de la grilla (Ctrl+Z)."""
+        if self.en_campo_de_texto(event):
+            return
+        cambios = self.diario.deshacer()
+        if cambios:
+            self.aplicar_cambios(cambios, registrar=False)
+    
+    def rehacer(self, event=None):
+        """Vuelve a aplicar la última edición deshecha (Ctrl+Y)."""
+        if self.en_campo_de_texto(event):
+            return
+        cambios = self.diario.rehacer()
+        if cambios:
+            self.aplicar_cambios(cambios, registrar=False)
+    
+    def encolar_cambios(self, cambios):
+        """Agrega cambios a los pendientes de guardar y reprograma el autoguardado."""
+        for clave, valor in cambios:
+            self.pendientes[clave] = (valor, self.versiones.get(clave), self.id_curso_cargado)
+        if self.id_autoguardado:
+            self.root.after_cancel(self.id_autoguardado)
+        self.id_autoguardado = self.root.after(DEBOUNCE_AUTOGUARDADO_MS, self.vaciar_pendientes)
+        self.actualizar_estado_guardado()
+    
+    def menu_dia(self, event, dia):
+        """Menú de operaciones masivas sobre un día (columna) de la grilla."""
+        menu = self.rearmar_menu()
+        menu.add_command(label="Todos presentes", command=lambda: self.marcar_dia(dia, 1))
+        menu.add_command(label="Todos ausentes", command=lambda: self.marcar_dia(dia, 0))
+        menu.add_command(label="Copiar día anterior", command=lambda: self.copiar_dia_anterior(dia))
+        menu.tk_popup(event.x_root, event.y_root)
+    
+    def menu_alumno(self, event, id_alumno):
+        """Menú de operaciones masivas sobre la fila de un alumno."""
+        menu = self.rearmar_menu()
+        menu.add_command(label="Presente en rango de días...", command=lambda: self.marcar_rango_alumno(id_alumno, 1))
+        menu.add_command(label="Ausente en rango de días...", command=lambda: self.marcar_rango_alumno(id_alumno, 0))
+        menu.tk_popup(event.x_root, event.y_root)
+    
+    def rearmar_menu(self):
+        """Vacía el menú contextual (y libera los comandos de sus opciones) para volver a llenarlo."""
+        self.menu_contextual.delete(0, tk.END)
+        return self.menu_contextual
+    
+    def marcar_dia(self, dia, presente):
+        """Marca a todo el curso presente o ausente en un día."""
+        cambios = [((id_alumno, dia), presente) for id_alumno in self.labels_totales]
+        self.aplicar_masivo(cambios, bd.marcar_dia, self.id_curso_cargado, dia.isoformat(), presente)
+    
+    def marcar_rango_alumno(self, id_alumno, presente):
+        """Marca a un alumno presente o ausente en un rango de días del mes cargado."""
+        texto = simpledialog.askstring("Rango de días", "Días del mes a marcar (ej. 1-15):")
+        if not texto:
+            return
+        try:
+            desde, _, hasta = texto.partition("-")
+            desde, hasta = int(desde), int(hasta or desde)
+        except ValueError:
+            messagebox.showwarning("Atención", "Rango inválido. Use el formato inicio-fin, por ejemplo 1-15.")
+            return
+        dias = [dia for dia in self.dias_laborales if desde <= dia.day <= hasta]
+        if not dias:
+            messagebox.showwarning("Atención", "El rango no contiene días de lunes a viernes del mes cargado.")
+            return
+        cambios = [((id_alumno, dia), presente) for dia in dias]
+        self.aplicar_masivo(cambios, bd.marcar_rango_alumno, id_alumno, dias[0].isoformat(), dias[-1].isoformat(), presente)
+    
+    def copiar_dia_anterior(self, dia):
+        """Copia en un día la asistencia registrada el día hábil anterior."""
+        anterior = dia - timedelta(days=3 if dia.weekday() == 0 else 1)
+        # Lo pendiente se guarda primero para que el día anterior en la BD coincida con la grilla
+        self.vaciar_pendientes(esperar=True)
+        conn = bd.conectar(DB_PATH)
+        try:
+            registros = bd.leer_mes(conn, self.id_curso_cargado, anterior.isoformat(), anterior.isoformat())
+        finally:
+            conn.close()
+        if not registros:
+            messagebox.showinfo("Información", f"No hay asistencia registrada el {anterior.strftime('%d/%m')}.")
+            return
+        cambios = [((id_alumno, dia), presente) for (id_alumno, _), (presente, _) in registros.items()]
+        self.aplicar_masivo(cambios, bd.copiar_dia, self.id_curso_cargado, anterior.isoformat(), dia.isoformat())
+    
+    def aplicar_masivo(self, cambios, operacion, *args):
+        """
+        Aplica una operación masiva: la grilla se actualiza en una pasada y queda como una sola
+        entrada del diario; en la BD se guarda con una única sentencia (operacion(cursor, *args, versiones)).
+        Las celdas que otra estación modificó después de cargarlas no se sobrescriben: se marcan como conflicto.
+        """
+        if not self.asistencia_vars:
+            return
+        if self.anio_archivado:
+            messagebox.showwarning("Atención", "El año cargado está archivado y es de solo lectura.")
+            return
         
-        # Recorremos todos los (id_alumno, fecha) en el diccionario
+        # Las ediciones pendientes se guardan antes, para que la sentencia masiva no se cruce con ellas
+        self.vaciar_pendientes(esperar=True)
+        versiones = {(id_alumno, dia.isoformat()): self.versiones[(id_alumno, dia)]
+                     for (id_alumno, dia), _ in cambios if (id_alumno, dia) in self.versiones}
+        conn = bd.conectar(DB_PATH)
         try:
-            for (id_alumno, fecha_dia), var_check in self.asistencia_vars.items():
-                presente = var_check.get()  # 0 o 1
-                # Verificamos si existe ya un registro
-                cursor.execute("""
-                    SELECT id FROM asistencia
-                    WHERE id_alumno = ? AND fecha = ?
-                """, (id_alumno, fecha_dia.isoformat()))
-                row_db = cursor.fetchone()
-                
-                if row_db:
-                    # Actualizar
-                    cursor.execute("""
-                        UPDATE asistencia
-                        SET presente = ?
-                        WHERE id = ?
-                    """, (presente, row_db[0]))
-                else:
-                    # Insertar
-                    cursor.execute("""
-                        INSERT INTO asistencia (id_alumno, fecha, presente)
-                        VALUES (?, ?, ?)
-                    """, (id_alumno, fecha_dia.isoformat(), presente))
-            
-            conn.commit()
-            messagebox.showinfo("Éxito", "Asistencia guardada/actualizada correctamente.")
+            conflictos = bd.ejecutar_en_transaccion(conn, operacion, *args, versiones)
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo guardar la asistencia:\n{e}")
+            messagebox.showerror("Error", f"No se pudo aplicar la operación:\n{e}")
+            return
         finally:
             conn.close()
+        
+        conflictivas = {(id_alumno, date.fromisoformat(fecha)) for id_alumno, fecha in conflictos}
+        self.aplicar_cambios([(clave, valor) for clave, valor in cambios if clave not in conflictivas], encolar=False)
+        # Tomar las nuevas versiones de las filas escritas por la sentencia masiva
+        # (y los valores de la otra estación en las celdas en conflicto)
+        self.refrescar_celdas()
+        if not conflictos:
+            return
+        
+        for (id_alumno, fecha), (presente, version) in conflictos.items():
+            clave = (id_alumno, date.fromisoformat(fecha))
+            if presente is None:
+                # Otra estación borró la fila: un nuevo guardado de la celda la vuelve a crear
+                self.versiones[clave] = None
+                self.valores_cargados[clave] = None
+            self.checks[clave].config(bg=COLOR_CONFLICTO)
+        borradas = sum(1 for presente, _ in conflictos.values() if presente is None)
+        detalle = f" ({borradas} borrada(s))" if borradas else ""
+        messagebox.showwarning(
+            "Conflictos",
+            f"Otra estación modificó {len(conflictos)} celda(s) después de cargarlas{detalle}\n"
+            "La operación no las sobrescribió. Están marcadas en rosado con el valor de la otra estación: "
+            "edítelas si corresponde cambiarlas."
+        )
+    
+    def vaciar_pendientes(self, esperar=False):
+        """
+        Guarda los cambios pendientes en una sola transacción en un hilo aparte.
+        Con esperar=True bloquea hasta terminar (al cambiar de mes o cerrar la ventana).
+        """
+        if self.id_autoguardado:
+            self.root.after_cancel(self.id_autoguardado)
+            self.id_autoguardado = None
+        
+        if self.hilo_guardado:
+            if not esperar:
+                # Hay un guardado en curso: se reintenta cuando termine
+                self.id_autoguardado = self.root.after(DEBOUNCE_AUTOGUARDADO_MS, self.vaciar_pendientes)
+                return
+            self.hilo_guardado.join()
+            self.aplicar_resultado_guardado()
+        
+        # Las celdas que volvieron a su valor guardado no necesitan escribirse
+        for clave in [c for c, (presente, version, _) in self.pendientes.items()
+                      if version is not None and presente == self.valores_cargados.get(c)]:
+            del self.pendientes[clave]
+        if not self.pendientes:
+            self.actualizar_estado_guardado()
+            return
+        
+        self.en_vuelo = dict(self.pendientes)
+        self.pendientes.clear()
+        celdas = [
+            (id_alumno, dia.isoformat(), presente, version)
+            for (id_alumno, dia), (presente, version, _) in self.en_vuelo.items()
+        ]
+        # Los días editados quedan registrados para el curso de cada celda (ausente si no hay registro)
+        dias_por_curso = {}
+        for (_, dia), (_, _, id_curso) in self.en_vuelo.items():
+            dias_por_curso.setdefault(id_curso, set()).add(dia.isoformat())
+        
+        def tarea():
+            conn = bd.conectar(DB_PATH)
+            try:
+                hilo.resultado = bd.guardar_celdas(conn, celdas, dias_por_curso=dias_por_curso)
+            except Exception as e:
+                hilo.error = e
+            finally:
+                conn.close()
+        
+        hilo = threading.Thread(target=tarea, name="autoguardado", daemon=True)
+        hilo.resultado = None
+        hilo.error = None
+        self.hilo_guardado = hilo
+        hilo.start()
+        self.actualizar_estado_guardado()
+        
+        if esperar:
+            hilo.join()
+            self.aplicar_resultado_guardado()
+        else:
+            self.root.after(100, self.verificar_guardado)
+    
+    def verificar_guardado(self):
+        """Consulta periódicamente si terminó el guardado en segundo plano."""
+        if self.hilo_guardado is None:
+            return
+        if self.hilo_guardado.is_alive():
+            self.root.after(100, self.verificar_guardado)
+        else:
+            self.aplicar_resultado_guardado()
+    
+    def aplicar_resultado_guardado(self):
+        """Actualiza versiones, marca conflictos o reencola las celdas si el guardado falló."""
+        hilo, self.hilo_guardado = self.hilo_guardado, None
+        if hilo is None:
+            return
+        en_vuelo, self.en_vuelo = self.en_vuelo, {}
+        
+        if hilo.error:
+            # Se reencolan las celdas que no volvieron a modificarse mientras tanto
+            for clave, entrada in en_vuelo.items():
+                self.pendientes.setdefault(clave, entrada)
+            self.label_estado.config(text=f"Error al guardar ({len(self.pendientes)} pendientes)", fg="red")
+            self.label_info.config(text=f"No se pudo guardar la asistencia: {hilo.error}")
+            self.id_autoguardado = self.root.after(DEBOUNCE_AUTOGUARDADO_MS * 4, self.vaciar_pendientes)
+            return
+        
+        guardadas, conflictos = hilo.resultado
+        # Las celdas rechazadas porque otra estación borró la fila o el alumno no se vuelven a intentar
+        for (id_alumno, fecha), (presente, _) in conflictos.items():
+            if presente is None:
+                self.pendientes.pop((id_alumno, date.fromisoformat(fecha)), None)
+        for (id_alumno, fecha), version in guardadas.items():
+            clave = (id_alumno, date.fromisoformat(fecha))
+            self.actualizar_version_pendiente(clave, version)
+            if clave in self.asistencia_vars:
+                self.versiones[clave] = version
+                self.valores_cargados[clave] = en_vuelo[clave][0]
+                self.checks[clave].config(bg=self.root.cget("bg"))
+        
+        for (id_alumno, fecha), (presente, version) in conflictos.items():
+            # Se toma la versión actual como base: un nuevo "Guardar" conservará el valor de esta estación.
+            # Si otra estación borró la fila (None, None), el nuevo guardado la vuelve a crear
+            clave = (id_alumno, date.fromisoformat(fecha))
+            self.actualizar_version_pendiente(clave, version)
+            if clave in self.asistencia_vars:
+                self.versiones[clave] = version
+                self.valores_cargados[clave] = presente
+                self.checks[clave].config(bg=COLOR_CONFLICTO)
+        
+        # Adoptar los registros de ausente creados para los días editados
+        dias = {dia for _, dia in en_vuelo}
+        if any(self.versiones[(id_alumno, dia)] is None for (id_alumno, dia) in self.asistencia_vars if dia in dias):
+            self.refrescar_celdas()
+        
+        self.actualizar_estado_guardado()
+        if conflictos:
+            borradas = sum(1 for presente, _ in conflictos.values() if presente is None)
+            detalle = f" ({borradas} borrada(s))" if borradas else ""
+            # Celdas editadas en otro curso o mes, ya no visibles en la grilla: se listan
+            ocultas = sorted((dia, id_alumno) for id_alumno, dia in
+                             ((id_alumno, date.fromisoformat(fecha)) for id_alumno, fecha in conflictos)
+                             if (id_alumno, dia) not in self.asistencia_vars)
+            if ocultas:
+                ids = sorted({id_alumno for _, id_alumno in ocultas})
+                nombres = dict(self.conn_monitor.execute(
+                    f"SELECT id, nombre FROM alumnos WHERE id IN ({', '.join('?' * len(ids))})", ids))
+                detalle += (f".\n{len(ocultas)} no están en pantalla: "
+                            + ", ".join(f"{nombres.get(id_alumno, 'alumno borrado')} el {dia.strftime('%d/%m/%Y')}"
+                                        for dia, id_alumno in ocultas[:10])
+                            + (" ..." if len(ocultas) > 10 else ""))
+            messagebox.showwarning(
+                "Conflictos",
+                f"Otra estación modificó {len(conflictos)} celda(s) después de cargarlas{detalle}\n"
+                "No se sobrescribieron. Las celdas en pantalla están marcadas en rosado: guarde de nuevo "
+                "para conservar sus valores o recargue el mes para ver los de la otra estación."
+            )
+    
+    def actualizar_version_pendiente(self, clave, version):
+        """Si la celda volvió a editarse mientras se guardaba, su cambio pendiente parte de la nueva versión."""
+        if clave in self.pendientes:
+            presente, _, id_curso = self.pendientes[clave]
+            self.pendientes[clave] = (presente, version, id_curso)
+    
+    def actualizar_estado_guardado(self):
+        """Muestra si hay cambios pendientes, guardándose o todo guardado."""
+        if self.hilo_guardado:
+            self.label_estado.config(text=f"Guardando ({len(self.en_vuelo)})...", fg="orange")
+        elif self.pendientes:
+            self.label_estado.config(text=f"Pendiente ({len(self.pendientes)})", fg="orange")
+        else:
+            self.label_estado.config(text="Guardado", fg="green")
+    
+    def al_cerrar(self):
+        """Guarda los cambios pendientes antes de cerrar la ventana."""
+        try:
+            self.vaciar_pendientes(esperar=True)
+        except Exception as e:
+            self.label_info.config(text=f"No se pudo guardar la asistencia: {e}")
+        if self.pendientes and not messagebox.askyesno(
+            "Cambios sin guardar",
+            f"No se pudieron guardar {len(self.pendientes)} cambio(s). ¿Cerrar de todos modos?"
+        ):
+            return
+        self.root.destroy()
+    
+    def actualizar_totales(self, id_alumno):
+        """Recalcula el total y el porcentaje asistido de un alumno a partir de la grilla."""
+        total_asistido = sum(self.asistencia_vars[(id_alumno, dia)].get() for dia in self.dias_laborales)
+        porcentaje_asistido = (total_asistido / len(self.dias_laborales)) * 100 if self.dias_laborales else 0
+        label_total, label_porcentaje = self.labels_totales[id_alumno]
+        label_total.config(text=str(total_asistido))
+        label_porcentaje.config(text=f"{porcentaje_asistido:.2f}%")
+    
+    def sondear_cambios(self):
+        """Detecta cambios confirmados por otras estaciones y refresca solo las celdas afectadas."""
+        try:
+            version = bd.data_version(self.conn_monitor)
+            if version != self.ultima_data_version and self.asistencia_vars and not self.anio_archivado:
+                self.refrescar_celdas()
+            self.ultima_data_version = version
+        except Exception as e:
+            self.label_info.config(text=f"No se pudo verificar cambios de otras estaciones: {e}")
+        finally:
+            self.root.after(INTERVALO_SONDEO_MS, self.sondear_cambios)
+    
+    def refrescar_celdas(self):
+        """
+        Relee el mes en pantalla y actualiza las celdas cuya versión cambió.
+        Las celdas con cambios locales sin guardar no se pisan: se marcan como conflicto.
+        """
+        registros = bd.leer_mes(
+            self.conn_monitor, self.id_curso_cargado,
+            self.dias_laborales[0].isoformat(), self.dias_laborales[-1].isoformat()
+        )
+        alumnos_afectados = set()
+        for (id_alumno, dia), var_check in self.asistencia_vars.items():
+            registro = registros.get((id_alumno, dia.isoformat()))
+            if registro is None or registro[1] == self.versiones[(id_alumno, dia)]:
+                continue
+            presente, version = registro
+            if var_check.get() == self.valores_cargados[(id_alumno, dia)]:
+                # Sin cambios locales: se adopta el valor de la otra estación
+                self.suspender_autoguardado = True
+                var_check.set(presente)
+                self.suspender_autoguardado = False
+                self.valores_grilla[(id_alumno, dia)] = presente
+                # Un cambio pendiente que volvió al valor cargado ya no corresponde
+                self.pendientes.pop((id_alumno, dia), None)
+                alumnos_afectados.add(id_alumno)
+            elif var_check.get() != presente:
+                self.checks[(id_alumno, dia)].config(bg=COLOR_CONFLICTO)
+                continue
+            self.versiones[(id_alumno, dia)] = version
+            self.valores_cargados[(id_alumno, dia)] = presente
+        
+        for id_alumno in alumnos_afectados:
+            self.actualizar_totales(id_alumno)
     
     def cargar_alumnos_desde_txt(self):
         """Carga alumnos desde un archivo TXT y los inserta en la base de datos."""
@@ -436,7 +1137,7 @@ class AsistenciaApp:
             messagebox.showwarning("Atención", "Curso inválido.")
             return
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = bd.conectar(DB_PATH)
         cursor = conn.cursor()
         
         try:
@@ -476,7 +1177,7 @@ class AsistenciaApp:
             messagebox.showwarning("Atención", "Curso inválido.")
             return
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = bd.conectar(DB_PATH)
         cursor = conn.cursor()
         
         try:
@@ -489,6 +1190,37 @@ class AsistenciaApp:
             messagebox.showerror("Error", f"No se pudo importar los alumnos:\n{e}")
         finally:
             conn.close()
+    
+    def importar_asistencia_desde_csv(self):
+        """Importa asistencia diaria desde un archivo CSV (ver importar_asistencia.py)."""
+        file_path = filedialog.askopenfilename(
+            title="Seleccionar archivo de asistencia",
+            filetypes=(("Archivos CSV", "*.csv"), ("Todos los archivos", "*.*"))
+        )
+        if not file_path:
+            return
+        
+        sobrescribir = messagebox.askyesnocancel(
+            "Importar asistencia",
+            "¿Sobrescribir la asistencia ya registrada con la del archivo?\n\n"
+            "Sí: el archivo reemplaza lo registrado.\nNo: solo se agregan los registros que faltan."
+        )
+        if sobrescribir is None:
+            return
+        
+        # Guardar antes lo editado en la grilla para no mezclarlo con la importación
+        self.vaciar_pendientes(esperar=True)
+        try:
+            resumen = importar_asistencia.importar(
+                file_path, "sobrescribir" if sobrescribir else "conservar", db_path=DB_PATH
+            )
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo importar la asistencia:\n{e}")
+            return
+        
+        messagebox.showinfo("Importación de asistencia", importar_asistencia.describir(resumen))
+        if self.curso_seleccionado.get():
+            self.cargar_asistencia()  # Recargar la grilla de asistencia
 
 # Ejecutar la aplicación
 if __name__ == "__main__":
@@ -0,0 +1,480 @@
+"""
+Almacenamiento compacto de la asistencia: una fila por alumno y mes con máscaras de bits.
+- asistencia_mensual (id_alumno, anio, mes, presentes, registrados): el bit d-1 corresponde al día d del mes;
+  registrados marca los días con registro (presente o ausente) y presentes los días en que asistió.
+- Al convertir, la tabla diaria asistencia se reemplaza por una vista del mismo nombre que expande las
+  máscaras en filas (id_alumno, fecha, presente), de modo que las consultas de solo lectura siguen funcionando.
+- bd usa las funciones de este módulo cuando la base está convertida: la grilla mensual se lee como una
+  fila por alumno, los guardados modifican bits y los totales del dashboard se calculan con popcount.
+- Sin fila por día no hay versión por fila: la versión de cada celda es su propio valor (0/1), y un
+  guardado solo se aplica si la celda conserva el valor con que se cargó (igual detección de conflictos).
+
+Uso:
+    python almacen_mensual.py estado       # Indica el almacenamiento actual y el tamaño de la base
+    python almacen_mensual.py a-mensual    # Convierte la asistencia diaria a máscaras mensuales
+    python almacen_mensual.py a-diario     # Vuelve a una fila por alumno y día
+"""
+
+import argparse
+import os
+from datetime import date, timedelta
+
+import bd
+
+DB_PATH = "asistencia_multiples_cursos.db"
+
+
+def popcount(mascara):
+    """Cantidad de bits en 1 de la máscara (días presentes o registrados)."""
+    return int(mascara or 0).bit_count()
+
+
+def ultimo_dia(mascara):
+    """Día del mes del último bit en 1 de la máscara (0 si no hay)."""
+    return int(mascara or 0).bit_length()
+
+
+def mascara_periodo(anio, mes, desde=None, hasta=None):
+    """Máscara con los días del mes dentro de [desde, hasta] (fechas ISO, inclusive; None = sin límite)."""
+    prefijo = f"{anio:04d}-{mes:02d}"
+    inicio, fin = 1, 31
+    if desde:
+        if desde[:7] > prefijo:
+            return 0
+        if desde[:7] == prefijo:
+            inicio = int(desde[8:10])
+    if hasta:
+        if hasta[:7] < prefijo:
+            return 0
+        if hasta[:7] == prefijo:
+            fin = int(hasta[8:10])
+    if fin < inicio:
+        return 0
+    return ((1 << fin) - 1) ^ ((1 << (inicio - 1)) - 1)
+
+
+class BitOr:
+    """Agregado SQL bit_or(x): OR de las máscaras del grupo (días registrados por algún alumno)."""
+
+    def __init__(self):
+        self.valor = 0
+
+    def step(self, mascara):
+        self.valor |= int(mascara or 0)
+
+    def finalize(self):
+        return self.valor
+
+
+def registrar_funciones(conn):
+    """Registra en la conexión las funciones SQL popcount, ultimo_dia, mascara_periodo y bit_or."""
+    conn.create_function("popcount", 1, popcount, deterministic=True)
+    conn.create_function("ultimo_dia", 1, ultimo_dia, deterministic=True)
+    conn.create_function("mascara_periodo", 4, mascara_periodo, deterministic=True)
+    conn.create_aggregate("bit_or", 1, BitOr)
+    return conn
+
+
+def en_uso(conn):
+    """Indica si la base usa el almacenamiento mensual."""
+    return conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'asistencia_mensual'"
+    ).fetchone() is not None
+
+
+def bit_dia(fecha):
+    """Devuelve (anio, mes, bit) de una fecha ISO."""
+    return int(fecha[:4]), int(fecha[5:7]), 1 << (int(fecha[8:10]) - 1)
+
+
+def agrupar(registros):
+    """Agrupa registros (id_alumno, fecha_iso, presente) en [(id_alumno, anio, mes, presentes, registrados)]."""
+    meses = {}
+    for id_alumno, fecha, presente in registros:
+        anio, mes, bit = bit_dia(fecha)
+        mascaras = meses.setdefault((id_alumno, anio, mes), [0, 0])
+        mascaras[1] |= bit
+        if presente:
+            mascaras[0] |= bit
+        else:
+            mascaras[0] &= ~bit
+    return [(id_alumno, anio, mes, presentes, registrados)
+            for (id_alumno, anio, mes), (presentes, registrados) in meses.items()]
+
+
+# --- Escritura (dentro de la transacción abierta en cursor) ---
+
+def escribir(cursor, registros, sobrescribir=True):
+    """
+    Escribe registros (id_alumno, fecha_iso, presente). Con sobrescribir=False solo se agregan
+    los días que el alumno no tenía registrados. Devuelve la cantidad de días (celdas) nuevos o
+    modificados, como el rowcount de la tabla diaria.
+    """
+    filas = agrupar(registros)
+    cambiadas = 0
+    for id_alumno, anio, mes, presentes, registrados in filas:
+        actual = cursor.execute(
+            "SELECT presentes, registrados FROM asistencia_mensual WHERE id_alumno = ? AND anio = ? AND mes = ?",
+            (id_alumno, anio, mes)).fetchone()
+        presentes_antes, registrados_antes = actual or (0, 0)
+        cambios = registrados & ~registrados_antes
+        if sobrescribir:
+            cambios |= (presentes ^ presentes_antes) & registrados & registrados_antes
+        cambiadas += popcount(cambios)
+    if sobrescribir:
+        actualizar = """
+            SET presentes = (presentes & ~excluded.registrados) | excluded.presentes,
+                registrados = registrados | excluded.registrados
+            WHERE (presentes & excluded.registrados) <> excluded.presentes
+               OR (registrados & excluded.registrados) <> excluded.registrados
+        """
+    else:
+        actualizar = """
+            SET presentes = presentes | (excluded.presentes & ~registrados),
+                registrados = registrados | excluded.registrados
+            WHERE (registrados & excluded.registrados) <> excluded.registrados
+        """
+    cursor.executemany(f"""
+        INSERT INTO asistencia_mensual (id_alumno, anio, mes, presentes, registrados)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(id_alumno, anio, mes) DO UPDATE {actualizar}
+    """, filas)
+    return cambiadas
+
+
+def aplicar_celdas(cursor, celdas):
+    """Como bd.aplicar_celdas, con la versión de cada celda igual a su valor al cargarla."""
+    guardadas = {}
+    conflictos = {}
+    for id_alumno, fecha, presente, version in celdas:
+        anio, mes, bit = bit_dia(fecha)
+        if version is None:
+            # La celda no tenía registro al cargarla: se registra solo si nadie la registró entretanto
+            # y el alumno sigue existiendo
+            cursor.execute("""
+                INSERT INTO asistencia_mensual (id_alumno, anio, mes, presentes, registrados)
+                SELECT ?1, ?2, ?3, ?4, ?5 WHERE EXISTS (SELECT 1 FROM alumnos WHERE id = ?1)
+                ON CONFLICT(id_alumno, anio, mes) DO UPDATE
+                SET presentes = presentes | excluded.presentes, registrados = registrados | excluded.registrados
+                WHERE registrados & excluded.registrados = 0
+            """, (id_alumno, anio, mes, bit if presente else 0, bit))
+        else:
+            # Se actualiza solo si la celda conserva el valor con que se cargó
+            cursor.execute("""
+                UPDATE asistencia_mensual
+                SET presentes = (presentes & ~:bit) | :nuevo
+                WHERE id_alumno = :id AND anio = :anio AND mes = :mes
+                  AND registrados & :bit <> 0 AND (presentes & :bit <> 0) = :cargado
+            """, {"bit": bit, "nuevo": bit if presente else 0, "id": id_alumno,
+                  "anio": anio, "mes": mes, "cargado": version})
+
+        if cursor.rowcount == 1:
+            guardadas[(id_alumno, fecha)] = presente
+            continue
+
+        # (None, None): el día ya no está registrado (otra estación lo borró), como en bd.aplicar_celdas
+        actual = leer_celda(cursor, id_alumno, fecha) or (None, None)
+        if actual[1] is not None and actual[0] == presente:
+            # Otra estación guardó el mismo valor: no hay conflicto real
+            guardadas[(id_alumno, fecha)] = presente
+        else:
+            conflictos[(id_alumno, fecha)] = actual
+    return guardadas, conflictos
+
+
+def leer_celda(cursor, id_alumno, fecha):
+    """Como bd.leer_celda: (presente, version) del día, o None si no está registrado."""
+    anio, mes, bit = bit_dia(fecha)
+    fila = cursor.execute("""
+        SELECT presentes & :bit <> 0, registrados & :bit <> 0
+        FROM asistencia_mensual WHERE id_alumno = :id AND anio = :anio AND mes = :mes
+    """, {"bit": bit, "id": id_alumno, "anio": anio, "mes": mes}).fetchone()
+    return (fila[0], fila[0]) if fila and fila[1] else None
+
+
+def registrar_dias(cursor, id_curso, fechas):
+    """Como bd.registrar_dias: los días quedan registrados (ausente si no había registro) para todo el curso."""
+    cursor.executemany("""
+        INSERT INTO asistencia_mensual (id_alumno, anio, mes, presentes, registrados)
+        SELECT id, ?, ?, 0, ? FROM alumnos WHERE id_curso = ?
+        ON CONFLICT(id_alumno, anio, mes) DO UPDATE
+        SET registrados = registrados | excluded.registrados
+        WHERE registrados & excluded.registrados = 0
+    """, [bit_dia(fecha) + (id_curso,) for fecha in fechas])
+
+
+def marcar_dia(cursor, id_curso, fecha, presente, excluidos=()):
+    """Como bd.marcar_dia, en una sentencia sobre las filas del mes, salvo para los alumnos excluidos."""
+    anio, mes, bit = bit_dia(fecha)
+    excluidos = list(excluidos)
+    cursor.execute(f"""
+        INSERT INTO asistencia_mensual (id_alumno, anio, mes, presentes, registrados)
+        SELECT id, ?, ?, ?, ? FROM alumnos WHERE id_curso = ? AND id NOT IN ({", ".join("?" * len(excluidos))})
+        ON CONFLICT(id_alumno, anio, mes) DO UPDATE
+        SET presentes = (presentes & ~excluded.registrados) | excluded.presentes,
+            registrados = registrados | excluded.registrados
+        WHERE (presentes & excluded.registrados) <> excluded.presentes
+           OR registrados & excluded.registrados = 0
+    """, [anio, mes, bit if presente else 0, bit, id_curso] + excluidos)
+
+
+def marcar_rango_alumno(cursor, id_alumno, desde, hasta, presente, excluidas=()):
+    """Como bd.marcar_rango_alumno: días de lunes a viernes del rango salvo las fechas excluidas, una fila por mes."""
+    dia, fin = date.fromisoformat(desde), date.fromisoformat(hasta)
+    registros = []
+    while dia <= fin:
+        if dia.weekday() < 5 and dia.isoformat() not in excluidas:
+            registros.append((id_alumno, dia.isoformat(), presente))
+        dia += timedelta(days=1)
+    escribir(cursor, registros)
+
+
+def copiar_dia(cursor, id_curso, origen, destino, excluidos=()):
+    """Como bd.copiar_dia: copia a otro día la asistencia registrada del curso en un día, salvo a los alumnos excluidos."""
+    anio, mes, bit = bit_dia(origen)
+    registros = [(id_alumno, destino, presente) for id_alumno, presente in cursor.execute("""
+        SELECT m.id_alumno, m.presentes & ? <> 0
+        FROM asistencia_mensual m
+        JOIN alumnos al ON al.id = m.id_alumno
+        WHERE al.id_curso = ? AND m.anio = ? AND m.mes = ? AND m.registrados & ? <> 0
+    """, (bit, id_curso, anio, mes, bit)).fetchall() if id_alumno not in excluidos]
+    escribir(cursor, registros)
+
+
+# --- Lectura ---
+
+def leer_mes(conn, id_curso, desde, hasta, con_version=True):
+    """Como bd.leer_mes, leyendo una fila por alumno y mes."""
+    registros = {}
+    for id_alumno, anio, mes, presentes, registrados in conn.execute("""
+        SELECT m.id_alumno, m.anio, m.mes, m.presentes, m.registrados
+        FROM asistencia_mensual m
+        JOIN alumnos al ON al.id = m.id_alumno
+        WHERE al.id_curso = ? AND (m.anio, m.mes) BETWEEN (?, ?) AND (?, ?)
+    """, (id_curso,) + bit_dia(desde)[:2] + bit_dia(hasta)[:2]):
+        registrados &= mascara_periodo(anio, mes, desde, hasta)
+        while registrados:
+            bit = registrados & -registrados
+            registrados ^= bit
+            presente = 1 if presentes & bit else 0
+            fecha = f"{anio:04d}-{mes:02d}-{bit.bit_length():02d}"
+            registros[(id_alumno, fecha)] = (presente, presente if con_version else 0)
+    return registros
+
+
+def _parametros_periodo(desde, hasta):
+    """
+    Condición SQL (con AND inicial) que descarta los meses fuera del período y sus parámetros con nombre.
+    La comparación por (anio, mes) usa la clave primaria; los días sueltos de los meses de borde
+    se filtran con mascara_periodo.
+    """
+    condicion = ""
+    parametros = {"desde": desde, "hasta": hasta}
+    if desde:
+        condicion += " AND (m.anio, m.mes) >= (:anio_desde, :mes_desde)"
+        parametros["anio_desde"], parametros["mes_desde"] = bit_dia(desde)[:2]
+    if hasta:
+        condicion += " AND (m.anio, m.mes) <= (:anio_hasta, :mes_hasta)"
+        parametros["anio_hasta"], parametros["mes_hasta"] = bit_dia(hasta)[:2]
+    return condicion, parametros
+
+
+def estadisticas_curso(conn, id_curso, desde=None, hasta=None):
+    """Como bd.estadisticas_curso, con popcount sobre las máscaras de cada mes."""
+    total_alumnos = conn.execute("SELECT COUNT(*) FROM alumnos WHERE id_curso = ?", (id_curso,)).fetchone()[0]
+
+    # Días registrados: OR de las máscaras de los alumnos del curso en cada mes
+    meses, parametros = _parametros_periodo(desde, hasta)
+    dias_registrados, asistencia_total = conn.execute(f"""
+        SELECT COALESCE(SUM(dias), 0), COALESCE(SUM(presentes), 0)
+        FROM (
+            SELECT popcount(bit_or(m.registrados & mascara_periodo(m.anio, m.mes, :desde, :hasta))) AS dias,
+                   SUM(popcount(m.presentes & mascara_periodo(m.anio, m.mes, :desde, :hasta))) AS presentes
+            FROM asistencia_mensual m
+            WHERE m.id_alumno IN (SELECT id FROM alumnos WHERE id_curso = :id_curso){meses}
+            GROUP BY m.anio, m.mes
+        )
+    """, {**parametros, "id_curso": id_curso}).fetchone()
+
+    total_posible = total_alumnos * dias_registrados
+    promedio_asistencia = (asistencia_total / total_posible) * 100 if total_posible > 0 else 0.0
+    return {
+        "total_alumnos": total_alumnos,
+        "dias_registrados": dias_registrados,
+        "asistencia_total": asistencia_total,
+        "promedio_asistencia": promedio_asistencia,
+    }
+
+
+def estadisticas_alumno(conn, id_alumno, desde=None, hasta=None):
+    """Como bd.estadisticas_alumno: (dias_presentes, dias_registrados) con popcount."""
+    meses, parametros = _parametros_periodo(desde, hasta)
+    return conn.execute(f"""
+        SELECT COALESCE(SUM(popcount(m.presentes & mascara_periodo(m.anio, m.mes, :desde, :hasta))), 0),
+               COALESCE(SUM(popcount(m.registrados & mascara_periodo(m.anio, m.mes, :desde, :hasta))), 0)
+        FROM asistencia_mensual m
+        WHERE m.id_alumno = :id_alumno{meses}
+    """, {**parametros, "id_alumno": id_alumno}).fetchone()
+
+
+def detalle_alumnos(conn, id_curso, desde=None, hasta=None, ids=None):
+    """Como bd.detalle_alumnos: días presentes (popcount) y última asistencia de cada alumno del curso."""
+    meses, parametros = _parametros_periodo(desde, hasta)
+    filtro_ids = ""
+    if ids is not None:
+        ids = list(ids)
+        filtro_ids = f" AND al.id IN ({', '.join(f':id{i}' for i in range(len(ids)))})"
+        parametros.update({f"id{i}": id_alumno for i, id_alumno in enumerate(ids)})
+    return conn.execute(f"""
+        SELECT al.id, al.nombre,
+               COALESCE(SUM(popcount(m.presentes & mascara_periodo(m.anio, m.mes, :desde, :hasta))), 0),
+               MAX(CASE WHEN m.presentes & mascara_periodo(m.anio, m.mes, :desde, :hasta) <> 0
+                        THEN printf('%04d-%02d-%02d', m.anio, m.mes,
+                                    ultimo_dia(m.presentes & mascara_periodo(m.anio, m.mes, :desde, :hasta)))
+                   END)
+        FROM alumnos al
+        LEFT JOIN asistencia_mensual m ON m.id_alumno = al.id{meses}
+        WHERE al.id_curso = :id_curso{filtro_ids}
+        GROUP BY al.id, al.nombre
+        ORDER BY al.nombre
+    """, {**parametros, "id_curso": id_curso})
+
+
+def detalle_informe(conn, id_curso, desde=None, hasta=None):
+    """Como informes.detalle_informe: [(nombre, dias_presentes, dias_totales, ultima_asistencia)] por alumno."""
+    meses, parametros = _parametros_periodo(desde, hasta)
+    return conn.execute(f"""
+        SELECT al.nombre,
+               COALESCE(SUM(popcount(m.presentes & mascara_periodo(m.anio, m.mes, :desde, :hasta))), 0),
+               COALESCE(SUM(popcount(m.registrados & mascara_periodo(m.anio, m.mes, :desde, :hasta))), 0),
+               MAX(CASE WHEN m.presentes & mascara_periodo(m.anio, m.mes, :desde, :hasta) <> 0
+                        THEN printf('%04d-%02d-%02d', m.anio, m.mes,
+                                    ultimo_dia(m.presentes & mascara_periodo(m.anio, m.mes, :desde, :hasta)))
+                   END)
+        FROM alumnos al
+        LEFT JOIN asistencia_mensual m ON m.id_alumno = al.id{meses}
+        WHERE al.id_curso = :id_curso
+        GROUP BY al.id, al.nombre
+        ORDER BY al.nombre
+    """, {**parametros, "id_curso": id_curso}).fetchall()
+
+
+# --- Esquema y conversión ---
+
+# Vista con el formato de la tabla diaria (id, id_alumno, fecha, presente, version), para las consultas existentes
+VISTA_DIARIA = """
+    CREATE VIEW asistencia AS
+    WITH RECURSIVE dias(d) AS (SELECT 1 UNION ALL SELECT d + 1 FROM dias WHERE d < 31)
+    SELECT NULL AS id,
+           m.id_alumno,
+           printf('%04d-%02d-%02d', m.anio, m.mes, dias.d) AS fecha,
+           (m.presentes >> (dias.d - 1)) & 1 AS presente,
+           (m.presentes >> (dias.d - 1)) & 1 AS version
+    FROM asistencia_mensual m
+    JOIN dias ON (m.registrados >> (dias.d - 1)) & 1 = 1
+"""
+
+
+def crear_triggers(cursor):
+    """Triggers que alimentan el registro de cambios (cambios_asistencia) con el alumno y el mes modificados."""
+    for nombre, evento, fila in (("ai", "INSERT", "new"), ("au", "UPDATE", "new"), ("ad", "DELETE", "old")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS asistencia_mensual_cambios_{nombre} AFTER {evento} ON asistencia_mensual BEGIN
+                INSERT INTO cambios_asistencia (id_alumno, fecha)
+                VALUES ({fila}.id_alumno, printf('%04d-%02d', {fila}.anio, {fila}.mes));
+            END
+        """)
+
+
+def a_mensual(conn):
+    """Convierte la tabla diaria asistencia a máscaras mensuales. Devuelve las filas mensuales creadas."""
+    if en_uso(conn):
+        raise ValueError("La base ya usa el almacenamiento mensual.")
+    bd.migrar(conn)  # Garantiza un único registro por alumno y día
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            CREATE TABLE asistencia_mensual (
+                id_alumno INTEGER NOT NULL,
+                anio INTEGER NOT NULL,
+                mes INTEGER NOT NULL,
+                presentes INTEGER NOT NULL DEFAULT 0,
+                registrados INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (id_alumno, anio, mes),
+                FOREIGN KEY(id_alumno) REFERENCES alumnos(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        """)
+        # Cada día es un bit distinto, así que la suma de los bits equivale a su OR
+        cursor.execute("""
+            INSERT INTO asistencia_mensual (id_alumno, anio, mes, presentes, registrados)
+            SELECT id_alumno,
+                   CAST(substr(fecha, 1, 4) AS INTEGER),
+                   CAST(substr(fecha, 6, 2) AS INTEGER),
+                   SUM(CASE WHEN presente = 1 THEN 1 << (CAST(substr(fecha, 9, 2) AS INTEGER) - 1) ELSE 0 END),
+                   SUM(1 << (CAST(substr(fecha, 9, 2) AS INTEGER) - 1))
+            FROM asistencia
+            GROUP BY 1, 2, 3
+        """)
+        filas = cursor.rowcount
+        cursor.execute("DROP TABLE asistencia")
+        cursor.execute(VISTA_DIARIA)
+        crear_triggers(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    conn.execute("VACUUM")
+    return filas
+
+
+def a_diario(conn):
+    """Vuelve a una fila por alumno y día. Devuelve las filas diarias creadas."""
+    if not en_uso(conn):
+        raise ValueError("La base ya usa el almacenamiento diario.")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            CREATE TABLE asistencia_diaria (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_alumno INTEGER,
+                fecha TEXT,
+                presente INTEGER,
+                version INTEGER NOT NULL DEFAULT 1,
+                FOREIGN KEY(id_alumno) REFERENCES alumnos(id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO asistencia_diaria (id_alumno, fecha, presente)
+            SELECT id_alumno, fecha, presente FROM asistencia ORDER BY fecha, id_alumno
+        """)
+        filas = cursor.rowcount
+        cursor.execute("DROP VIEW asistencia")
+        cursor.execute("DROP TABLE asistencia_mensual")
+        cursor.execute("ALTER TABLE asistencia_diaria RENAME TO asistencia")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    bd.migrar(conn)  # Índice único (alumno, fecha) y triggers del registro de cambios
+    conn.execute("VACUUM")
+    return filas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte la asistencia entre filas diarias y máscaras mensuales.")
+    parser.add_argument("comando", choices=["estado", "a-mensual", "a-diario"])
+    parser.add_argument("--db", default=DB_PATH, help="Ruta de la base de datos")
+    args = parser.parse_args()
+
+    conn = bd.conectar(args.db)
+    try:
+        if args.comando == "a-mensual":
+            print(f"{a_mensual(conn)} filas mensuales creadas.")
+        elif args.comando == "a-diario":
+            print(f"{a_diario(conn)} filas diarias creadas.")
+        almacen = "mensual (máscaras de bits)" if en_uso(conn) else "diario (una fila por día)"
+        print(f"Almacenamiento: {almacen}; tamaño de la base: {os.path.getsize(args.db) // 1024} KB")
+    finally:
+        conn.close()
@@ -0,0 +1,177 @@
+"""
+Archivado de años escolares cerrados en bases de datos por año.
+- Permite:
+  1) Mover la asistencia de un año cerrado a un archivo SQLite propio (archivo/asistencia_<año>.db),
+     dejando la base principal solo con los años vigentes.
+  2) Adjuntar (ATTACH) los años archivados en modo solo lectura cuando se consulta un año histórico.
+     Las consultas de un año archivado usan los alumnos y cursos copiados a su archivo (bd.tabla_alumnos):
+     los alumnos que después cambiaron de curso o se borraron siguen contando en el curso de ese año.
+  3) Crear una vista temporal que une todos los años para reportes multi-año.
+
+Uso:
+    python archivo_anual.py 2024        # Archiva el año 2024
+    python archivo_anual.py --listar    # Lista los años archivados
+"""
+
+import argparse
+import glob
+import os
+import re
+import sqlite3
+from datetime import datetime
+from urllib.parse import quote
+
+import almacen_mensual
+import bd
+
+DB_PATH = "asistencia_multiples_cursos.db"
+ARCHIVO_DIR = "archivo"
+
+# Nombre de la vista temporal que une la base principal con los años archivados
+VISTA_TODOS = "asistencia_todos"
+
+
+def ruta_archivo(anio):
+    """Devuelve la ruta del archivo SQLite de un año archivado."""
+    return os.path.join(ARCHIVO_DIR, f"asistencia_{int(anio)}.db")
+
+
+def anios_archivados():
+    """Devuelve la lista ordenada de años que tienen un archivo propio."""
+    anios = []
+    for ruta in glob.glob(os.path.join(ARCHIVO_DIR, "asistencia_*.db")):
+        m = re.search(r"asistencia_(\d{4})\.db$", ruta)
+        if m:
+            anios.append(int(m.group(1)))
+    return sorted(anios)
+
+
+def esta_archivado(anio):
+    """Indica si el año dado fue movido a un archivo propio."""
+    return os.path.exists(ruta_archivo(anio))
+
+
+def _uri_solo_lectura(ruta):
+    return f"file:{quote(os.path.abspath(ruta))}?mode=ro"
+
+
+def alias_anio(anio):
+    """Nombre con el que se adjunta la base de un año archivado."""
+    return f"hist_{int(anio)}"
+
+
+def tabla_asistencia(anio=None):
+    """
+    Devuelve la tabla de asistencia a consultar:
+    - None: la tabla de la base principal.
+    - "todos": la vista temporal con todos los años.
+    - un año archivado: la tabla de su base adjunta.
+    """
+    if anio is None:
+        return "asistencia"
+    if anio == "todos":
+        return VISTA_TODOS
+    if esta_archivado(anio):
+        return f"{alias_anio(anio)}.asistencia"
+    return "asistencia"
+
+
+def conectar(anios=None, db_path=DB_PATH, uri=None):
+    """
+    Abre la base principal y adjunta en solo lectura los años archivados indicados
+    (todos si anios es None). Crea además la vista temporal que une todos los años.
+    uri reemplaza a db_path como base principal (por ejemplo, una instantánea en memoria).
+    """
+    conn = bd.configurar(sqlite3.connect(uri or f"file:{quote(os.path.abspath(db_path))}", uri=True))
+    if anios is None:
+        anios = anios_archivados()
+    anios = [int(a) for a in anios if esta_archivado(a)]
+    for anio in anios:
+        conn.execute(f"ATTACH DATABASE ? AS {alias_anio(anio)}", (_uri_solo_lectura(ruta_archivo(anio)),))
+
+    selects = ["SELECT id_alumno, fecha, presente FROM main.asistencia"]
+    selects += [f"SELECT id_alumno, fecha, presente FROM {alias_anio(a)}.asistencia" for a in anios]
+    conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS {VISTA_TODOS} AS " + " UNION ALL ".join(selects))
+    return conn
+
+
+def archivar_anio(anio, db_path=DB_PATH):
+    """
+    Mueve la asistencia del año dado a su archivo propio y la borra de la base principal.
+    Devuelve la cantidad de registros movidos.
+    """
+    anio = int(anio)
+    if anio >= datetime.now().year:
+        raise ValueError(f"El año {anio} no está cerrado; solo se pueden archivar años anteriores.")
+
+    os.makedirs(ARCHIVO_DIR, exist_ok=True)
+    desde, hasta = f"{anio}-01-01", f"{anio}-12-31"
+
+    conn = bd.conectar(db_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS arch", (ruta_archivo(anio),))
+        cursor = conn.cursor()
+
+        # Copia de cursos y alumnos para que el archivo sea autocontenido
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS arch.cursos (
+                id INTEGER PRIMARY KEY,
+                nombre TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS arch.alumnos (
+                id INTEGER PRIMARY KEY,
+                nombre TEXT,
+                id_curso INTEGER
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS arch.asistencia (
+                id INTEGER PRIMARY KEY,
+                id_alumno INTEGER,
+                fecha TEXT,
+                presente INTEGER
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS arch.idx_asistencia_alumno_fecha ON asistencia (id_alumno, fecha)")
+
+        cursor.execute("INSERT OR REPLACE INTO arch.cursos (id, nombre) SELECT id, nombre FROM main.cursos")
+        cursor.execute("INSERT OR REPLACE INTO arch.alumnos (id, nombre, id_curso) SELECT id, nombre, id_curso FROM main.alumnos")
+        cursor.execute("""
+            INSERT OR REPLACE INTO arch.asistencia (id, id_alumno, fecha, presente)
+            SELECT id, id_alumno, fecha, presente
+            FROM main.asistencia
+            WHERE fecha BETWEEN ? AND ?
+        """, (desde, hasta))
+        movidos = cursor.rowcount
+        if almacen_mensual.en_uso(conn):
+            # Con almacenamiento mensual, main.asistencia es una vista sobre las máscaras del año
+            cursor.execute("DELETE FROM main.asistencia_mensual WHERE anio = ?", (anio,))
+        else:
+            cursor.execute("DELETE FROM main.asistencia WHERE fecha BETWEEN ? AND ?", (desde, hasta))
+        conn.commit()
+
+        conn.execute("DETACH DATABASE arch")
+        # Recuperar el espacio liberado en la base principal
+        conn.execute("VACUUM")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return movidos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archiva años escolares cerrados en bases por año.")
+    parser.add_argument("anio", nargs="?", type=int, help="Año a archivar")
+    parser.add_argument("--listar", action="store_true", help="Lista los años archivados")
+    args = parser.parse_args()
+
+    if args.listar or args.anio is None:
+        anios = anios_archivados()
+        print("Años archivados: " + (", ".join(map(str, anios)) if anios else "ninguno"))
+    else:
+        movidos = archivar_anio(args.anio)
+        print(f"Año {args.anio} archivado en {ruta_archivo(args.anio)}: {movidos} registros movidos.")
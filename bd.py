@@ -0,0 +1,724 @@
+"""
+Acceso compartido a la base de datos de asistencia para varias estaciones.
+- conectar(): abre la base en modo WAL con busy_timeout, para que los lectores (dashboard)
+  no bloqueen a quienes guardan asistencia y viceversa.
+- con_reintentos(): repite una operación de escritura con espera exponencial si la base está ocupada.
+- migrar(): agrega a bases existentes la columna de versión por fila, el índice único (alumno, fecha),
+  los índices por fecha y por curso que usan las consultas por período, el borrado en cascada
+  de la asistencia de un alumno (ON DELETE CASCADE, con foreign_keys activado en cada conexión),
+  además del registro de cambios de asistencia que usa el dashboard para actualizarse en vivo.
+- guardar_celdas(): guarda celdas de asistencia detectando conflictos con otras estaciones
+  mediante la versión de cada fila.
+- Consultas compartidas por las aplicaciones de escritorio y el servicio HTTP
+  (cursos, alumnos, días laborales, grilla mensual y estadísticas por curso).
+- buscar_alumnos(): búsqueda de alumnos en todos los cursos con un índice FTS5
+  que ignora tildes y admite prefijos ("perez" encuentra "Pérez Sánchez").
+- Si la base usa el almacenamiento mensual con máscaras de bits (almacen_mensual.py), las lecturas
+  y escrituras de asistencia de este módulo se delegan a ese módulo.
+
+Nota: el modo WAL requiere que todas las estaciones usen el mismo sistema de archivos con memoria
+compartida; si la base está en una carpeta de red que no lo soporta, usar JOURNAL_MODE = "DELETE".
+"""
+
+import calendar
+import random
+import re
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import almacen_mensual
+
+DB_PATH = "asistencia_multiples_cursos.db"
+
+JOURNAL_MODE = "WAL"
+
+# Tiempo que SQLite espera un bloqueo antes de fallar con "database is locked" (ms)
+BUSY_TIMEOUT_MS = 5000
+
+# Reintentos de escritura y espera inicial (segundos), que se duplica en cada intento
+REINTENTOS = 5
+ESPERA_INICIAL = 0.05
+
+# Días que se conserva el registro de cambios de asistencia (se depura al migrar)
+DIAS_REGISTRO_CAMBIOS = 1
+
+
+def configurar(conn):
+    """Aplica a una conexión ya abierta el modo de diario, la espera por bloqueos y las claves foráneas."""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    almacen_mensual.registrar_funciones(conn)
+    return conn
+
+
+def conectar(db_path=DB_PATH, **kwargs):
+    """Abre una conexión a la base configurada para acceso concurrente."""
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, **kwargs)
+    return configurar(conn)
+
+
+def es_bloqueo(error):
+    """Indica si el error corresponde a una base ocupada o bloqueada por otra estación."""
+    mensaje = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in mensaje or "busy" in mensaje)
+
+
+def con_reintentos(operacion, *args, reintentos=REINTENTOS, **kwargs):
+    """
+    Ejecuta operacion(*args, **kwargs) reintentando si la base está bloqueada.
+    La espera crece exponencialmente con una pequeña variación aleatoria,
+    para que varias estaciones no reintenten al mismo tiempo.
+    """
+    espera = ESPERA_INICIAL
+    for intento in range(reintentos + 1):
+        try:
+            return operacion(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not es_bloqueo(e) or intento == reintentos:
+                raise
+            time.sleep(espera * (1 + random.random()))
+            espera *= 2
+
+
+def crear_esquema(conn):
+    """Crea las tablas cursos, alumnos y asistencia si no existen y aplica las migraciones."""
+    cursor = conn.cursor()
+
+    # Base nueva: el espacio liberado se recupera por pasos con mantenimiento.py (incremental_vacuum)
+    if cursor.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+
+    # Tabla de cursos
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cursos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT UNIQUE
+        )
+    """)
+
+    # Tabla de alumnos (relacionados a un curso)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alumnos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT,
+            id_curso INTEGER,
+            FOREIGN KEY(id_curso) REFERENCES cursos(id)
+        )
+    """)
+
+    # Tabla de asistencia
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS asistencia (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_alumno INTEGER,
+            fecha TEXT,
+            presente INTEGER,
+            FOREIGN KEY(id_alumno) REFERENCES alumnos(id) ON DELETE CASCADE
+        )
+    """)
+
+    conn.commit()
+
+    # Versión por fila e índice único (alumno, fecha) en bases existentes
+    migrar(conn)
+
+
+def migrar(conn):
+    """Aplica las migraciones pendientes sobre una base existente."""
+    cursor = conn.cursor()
+    # Con almacenamiento mensual, asistencia es una vista: no lleva versión, índice ni triggers propios
+    mensual = almacen_mensual.en_uso(conn)
+    columnas = [fila[1] for fila in cursor.execute("PRAGMA table_info(asistencia)")]
+    if "version" not in columnas:
+        cursor.execute("ALTER TABLE asistencia ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+    # Al borrar un alumno se borra su asistencia (antes de crear índices y triggers, que se pierden al reconstruir)
+    _agregar_cascada(conn, "asistencia_mensual" if mensual else "asistencia")
+
+    # Un único registro por alumno y día (se conserva el más reciente si hubiera duplicados)
+    indices = [fila[1] for fila in cursor.execute("PRAGMA index_list(asistencia)")]
+    if not mensual and "idx_asistencia_alumno_fecha" not in indices:
+        cursor.execute("""
+            DELETE FROM asistencia
+            WHERE id NOT IN (SELECT MAX(id) FROM asistencia GROUP BY id_alumno, fecha)
+        """)
+        cursor.execute("CREATE UNIQUE INDEX idx_asistencia_alumno_fecha ON asistencia (id_alumno, fecha)")
+
+    # Consultas por período de todos los alumnos (exportación, archivo anual) y alumnos por curso
+    if not mensual:
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_asistencia_fecha ON asistencia (fecha, id_alumno, presente)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alumnos_curso ON alumnos (id_curso)")
+
+    # Índice de texto completo sobre alumnos.nombre, mantenido por triggers
+    existe_fts = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alumnos_fts'"
+    ).fetchone()
+    if not existe_fts:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE alumnos_fts USING fts5(
+                nombre,
+                content = 'alumnos',
+                content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """)
+        cursor.execute("INSERT INTO alumnos_fts (alumnos_fts) VALUES ('rebuild')")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alumnos_fts_ai AFTER INSERT ON alumnos BEGIN
+            INSERT INTO alumnos_fts (rowid, nombre) VALUES (new.id, new.nombre);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alumnos_fts_ad AFTER DELETE ON alumnos BEGIN
+            INSERT INTO alumnos_fts (alumnos_fts, rowid, nombre) VALUES ('delete', old.id, old.nombre);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alumnos_fts_au AFTER UPDATE OF nombre ON alumnos BEGIN
+            INSERT INTO alumnos_fts (alumnos_fts, rowid, nombre) VALUES ('delete', old.id, old.nombre);
+            INSERT INTO alumnos_fts (rowid, nombre) VALUES (new.id, new.nombre);
+        END
+    """)
+
+    # Registro de cambios de asistencia (alumno y día), escrito por triggers para que el dashboard
+    # actualice solo los alumnos afectados sin importar quién guardó (grilla, importación, servicio)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cambios_asistencia (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_alumno INTEGER,
+            fecha TEXT,
+            momento TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    if mensual:
+        almacen_mensual.crear_triggers(cursor)
+    else:
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS asistencia_cambios_ai AFTER INSERT ON asistencia BEGIN
+                INSERT INTO cambios_asistencia (id_alumno, fecha) VALUES (new.id_alumno, new.fecha);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS asistencia_cambios_au AFTER UPDATE OF presente ON asistencia BEGIN
+                INSERT INTO cambios_asistencia (id_alumno, fecha) VALUES (new.id_alumno, new.fecha);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS asistencia_cambios_ad AFTER DELETE ON asistencia BEGIN
+                INSERT INTO cambios_asistencia (id_alumno, fecha) VALUES (old.id_alumno, old.fecha);
+            END
+        """)
+    cursor.execute(
+        f"DELETE FROM cambios_asistencia WHERE momento < datetime('now', '-{DIAS_REGISTRO_CAMBIOS} days')"
+    )
+    conn.commit()
+
+
+def _agregar_cascada(conn, tabla):
+    """
+    Reconstruye tabla con su clave foránea a alumnos en ON DELETE CASCADE, si aún no la tiene
+    (SQLite no permite modificar una restricción). Se copian todas las filas, también las huérfanas,
+    que se depuran con mantenimiento.py. Índices y triggers de la tabla se recrean en migrar().
+    """
+    fila = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+    if fila is None or "ON DELETE CASCADE" in fila[0].upper():
+        return
+    sql = re.sub(r"REFERENCES\s+alumnos\s*\(\s*id\s*\)", "REFERENCES alumnos(id) ON DELETE CASCADE",
+                 fila[0], flags=re.IGNORECASE)
+    sql = re.sub(r"^CREATE TABLE\s+\S+?(?=\s*\()", f"CREATE TABLE {tabla}_nueva", sql)
+
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF")  # Solo tiene efecto fuera de una transacción
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {tabla}_nueva SELECT * FROM {tabla}")
+        cursor.execute(f"DROP TABLE {tabla}")
+        # Sin revalidar las vistas, que pueden referirse a la tabla eliminada (vista asistencia del almacén mensual)
+        cursor.execute("PRAGMA legacy_alter_table = ON")
+        cursor.execute(f"ALTER TABLE {tabla}_nueva RENAME TO {tabla}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+        conn.execute("PRAGMA foreign_keys = ON")
+
+
+def data_version(conn):
+    """Devuelve PRAGMA data_version: cambia cuando otra conexión confirma cambios en la base."""
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def ultimo_cambio(conn):
+    """Devuelve el id del último cambio de asistencia registrado (0 si no hay)."""
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM cambios_asistencia").fetchone()[0]
+
+
+def alumnos_cambiados(conn, id_curso, desde_cambio):
+    """
+    Devuelve (ultimo_cambio, ids) con los alumnos del curso cuya asistencia cambió después
+    del cambio desde_cambio. ids es None si esos cambios ya se depuraron del registro
+    (hay que recargar todo).
+    """
+    # Dos subconsultas: MIN y MAX juntos en un mismo SELECT recorren toda la tabla
+    primero, ultimo = conn.execute("""
+        SELECT (SELECT MIN(id) FROM cambios_asistencia), (SELECT COALESCE(MAX(id), 0) FROM cambios_asistencia)
+    """).fetchone()
+    if ultimo <= desde_cambio:
+        return desde_cambio, set()
+    if primero > desde_cambio + 1:
+        # Los ids son consecutivos: un salto indica que se depuraron cambios no vistos
+        return ultimo, None
+    ids = {fila[0] for fila in conn.execute("""
+        SELECT DISTINCT c.id_alumno
+        FROM cambios_asistencia c
+        JOIN alumnos al ON al.id = c.id_alumno
+        WHERE c.id > ? AND c.id <= ? AND al.id_curso = ?
+    """, (desde_cambio, ultimo, id_curso))}
+    return ultimo, ids
+
+
+def dias_laborales(anio, mes):
+    """Devuelve los días (date) de lunes a viernes del mes dado."""
+    cal = calendar.Calendar()
+    return [d for d in cal.itermonthdates(anio, mes) if d.month == mes and d.weekday() < 5]
+
+
+def listar_cursos(conn):
+    """Devuelve [(id, nombre)] de los cursos ordenados por nombre."""
+    return conn.execute("SELECT id, nombre FROM cursos ORDER BY nombre").fetchall()
+
+
+def id_curso_por_nombre(conn, nombre_curso):
+    """Devuelve el id de un curso dado su nombre, o None si no existe."""
+    row = conn.execute("SELECT id FROM cursos WHERE nombre = ?", (nombre_curso,)).fetchone()
+    return row[0] if row else None
+
+
+def listar_alumnos(conn, id_curso, tabla="asistencia"):
+    """
+    Devuelve [(id, nombre)] de los alumnos de un curso ordenados por nombre.
+    Con la tabla de un año archivado se usan los alumnos y cursos de ese año (ver tabla_alumnos).
+    """
+    return conn.execute(
+        f"SELECT id, nombre FROM {tabla_alumnos(tabla)} WHERE id_curso = ? ORDER BY nombre", (id_curso,)
+    ).fetchall()
+
+
+def buscar_alumnos(conn, texto, limite=20):
+    """
+    Busca alumnos por nombre en todos los cursos (sin distinguir tildes ni mayúsculas;
+    cada palabra se toma como prefijo). Devuelve [(id_alumno, nombre, id_curso, nombre_curso)].
+    """
+    palabras = re.findall(r"\w+", texto)
+    if not palabras:
+        return []
+    consulta = " ".join(f'"{palabra}"*' for palabra in palabras)
+    return conn.execute("""
+        SELECT al.id, al.nombre, c.id, c.nombre
+        FROM alumnos_fts f
+        JOIN alumnos al ON al.id = f.rowid
+        JOIN cursos c ON c.id = al.id_curso
+        WHERE alumnos_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+    """, (consulta, limite)).fetchall()
+
+
+def _misma_base(tabla, nombre):
+    esquema, punto, _ = tabla.rpartition(".")
+    return f"{esquema}.{nombre}" if punto else nombre
+
+
+def tabla_alumnos(tabla="asistencia"):
+    """
+    Tabla de alumnos de la misma base que la tabla de asistencia dada. Un año archivado
+    (<alias>.asistencia) tiene su propia copia de alumnos, con el curso de cada alumno en ese año
+    y los alumnos borrados después; las demás tablas usan los alumnos de la base principal.
+    """
+    return _misma_base(tabla, "alumnos")
+
+
+def tabla_cursos(tabla="asistencia"):
+    """Tabla de cursos de la misma base que la tabla de asistencia dada (ver tabla_alumnos)."""
+    return _misma_base(tabla, "cursos")
+
+
+def _mensual(conn, tabla="asistencia"):
+    """Indica si las consultas sobre tabla deben delegarse al almacenamiento mensual."""
+    return tabla == "asistencia" and almacen_mensual.en_uso(conn)
+
+
+def filtro_periodo(columna, desde, hasta):
+    """
+    Condición SQL (con AND inicial) y parámetros para limitar columna al período [desde, hasta].
+    Con ambos límites se usa BETWEEN, que el planificador resuelve como un rango del índice sobre fecha.
+    """
+    if desde and hasta:
+        return f" AND {columna} BETWEEN ? AND ?", [desde, hasta]
+    condicion, parametros = "", []
+    if desde:
+        condicion += f" AND {columna} >= ?"
+        parametros.append(desde)
+    if hasta:
+        condicion += f" AND {columna} <= ?"
+        parametros.append(hasta)
+    return condicion, parametros
+
+
+def estadisticas_curso(conn, id_curso, tabla="asistencia", desde=None, hasta=None):
+    """
+    Devuelve las estadísticas generales de un curso:
+    total_alumnos, dias_registrados, asistencia_total y promedio_asistencia (%).
+    desde y hasta (fechas ISO, inclusive) limitan el período; por defecto se considera todo.
+    """
+    if _mensual(conn, tabla):
+        return almacen_mensual.estadisticas_curso(conn, id_curso, desde, hasta)
+    cursor = conn.cursor()
+
+    # 1) Total de alumnos en el curso
+    cursor.execute(f"SELECT COUNT(*) FROM {tabla_alumnos(tabla)} WHERE id_curso = ?", (id_curso,))
+    total_alumnos = cursor.fetchone()[0]
+
+    # 2) Días registrados (distintos) y 3) suma de asistencias para los alumnos del curso
+    periodo, parametros = filtro_periodo("fecha", desde, hasta)
+    cursor.execute(f"""
+        SELECT COUNT(DISTINCT fecha), SUM(presente)
+        FROM {tabla}
+        WHERE id_alumno IN (
+            SELECT id FROM {tabla_alumnos(tabla)} WHERE id_curso = ?
+        ){periodo}
+    """, [id_curso] + parametros)
+    dias_registrados, asistencia_total = cursor.fetchone()
+    asistencia_total = asistencia_total or 0
+
+    # 4) Porcentaje promedio de asistencia
+    total_posible = total_alumnos * dias_registrados
+    promedio_asistencia = (asistencia_total / total_posible) * 100 if total_posible > 0 else 0.0
+
+    return {
+        "total_alumnos": total_alumnos,
+        "dias_registrados": dias_registrados,
+        "asistencia_total": asistencia_total,
+        "promedio_asistencia": promedio_asistencia,
+    }
+
+
+def detalle_alumnos(conn, id_curso, tabla="asistencia", desde=None, hasta=None, ids=None):
+    """
+    Devuelve un cursor con (id, nombre, dias_presentes, ultima_asistencia) por alumno del curso,
+    ordenado por nombre, en una sola consulta agrupada. desde y hasta limitan el período;
+    ids limita a esos alumnos.
+    """
+    if _mensual(conn, tabla):
+        return almacen_mensual.detalle_alumnos(conn, id_curso, desde, hasta, ids)
+    periodo, parametros = filtro_periodo("ast.fecha", desde, hasta)
+    filtro_ids = ""
+    if ids is not None:
+        ids = list(ids)
+        filtro_ids = f" AND al.id IN ({', '.join('?' * len(ids))})"
+    return conn.execute(f"""
+        SELECT al.id, al.nombre,
+               COALESCE(SUM(ast.presente), 0),
+               MAX(CASE WHEN ast.presente = 1 THEN ast.fecha END)
+        FROM {tabla_alumnos(tabla)} al
+        LEFT JOIN {tabla} ast ON ast.id_alumno = al.id{periodo}
+        WHERE al.id_curso = ?{filtro_ids}
+        GROUP BY al.id, al.nombre
+        ORDER BY al.nombre
+    """, parametros + [id_curso] + (ids or []))
+
+
+def estadisticas_alumno(conn, id_alumno, tabla="asistencia", desde=None, hasta=None):
+    """Devuelve (dias_presentes, dias_registrados) de un alumno en el período [desde, hasta] (por defecto todo)."""
+    if _mensual(conn, tabla):
+        return almacen_mensual.estadisticas_alumno(conn, id_alumno, desde, hasta)
+    periodo, parametros = filtro_periodo("fecha", desde, hasta)
+    dias_presentes, dias_registrados = conn.execute(f"""
+        SELECT COALESCE(SUM(presente), 0), COUNT(DISTINCT fecha)
+        FROM {tabla}
+        WHERE id_alumno = ?{periodo}
+    """, [id_alumno] + parametros).fetchone()
+    return dias_presentes, dias_registrados
+
+
+def leer_mes(conn, id_curso, desde, hasta, tabla="asistencia", con_version=True):
+    """
+    Devuelve {(id_alumno, fecha_iso): (presente, version)} para los alumnos de un curso
+    entre dos fechas ISO (inclusive).
+    """
+    if _mensual(conn, tabla):
+        return almacen_mensual.leer_mes(conn, id_curso, desde, hasta, con_version)
+    columna_version = "ast.version" if con_version else "0"
+    cursor = conn.execute(f"""
+        SELECT ast.id_alumno, ast.fecha, ast.presente, {columna_version}
+        FROM {tabla} ast
+        JOIN {tabla_alumnos(tabla)} al ON al.id = ast.id_alumno
+        WHERE al.id_curso = ? AND ast.fecha BETWEEN ? AND ?
+    """, (id_curso, desde, hasta))
+    return {(id_alumno, fecha): (presente, version) for id_alumno, fecha, presente, version in cursor}
+
+
+def aplicar_celdas(cursor, celdas):
+    """
+    Escribe celdas (id_alumno, fecha_iso, presente, version_cargada) dentro de la transacción
+    abierta en cursor. Devuelve (guardadas, conflictos) como guardar_celdas().
+    """
+    if _mensual(cursor.connection):
+        return almacen_mensual.aplicar_celdas(cursor, celdas)
+    guardadas = {}
+    conflictos = {}
+    for id_alumno, fecha, presente, version in celdas:
+        if version is None:
+            # La celda no existía al cargarla: se inserta solo si nadie la creó entretanto
+            # y el alumno sigue existiendo (si otra estación lo borró, queda como conflicto)
+            cursor.execute("""
+                INSERT INTO asistencia (id_alumno, fecha, presente, version)
+                SELECT ?1, ?2, ?3, 1 WHERE EXISTS (SELECT 1 FROM alumnos WHERE id = ?1)
+                ON CONFLICT(id_alumno, fecha) DO NOTHING
+            """, (id_alumno, fecha, presente))
+        else:
+            # Se actualiza solo si la fila sigue en la versión que se cargó
+            cursor.execute("""
+                UPDATE asistencia
+                SET presente = ?, version = version + 1
+                WHERE id_alumno = ? AND fecha = ? AND version = ?
+            """, (presente, id_alumno, fecha, version))
+
+        if cursor.rowcount == 1:
+            guardadas[(id_alumno, fecha)] = 1 if version is None else version + 1
+            continue
+
+        actual = cursor.execute(
+            "SELECT presente, version FROM asistencia WHERE id_alumno = ? AND fecha = ?",
+            (id_alumno, fecha)
+        ).fetchone()
+        if actual is None:
+            # Otra estación borró la fila después de cargarla
+            conflictos[(id_alumno, fecha)] = (None, None)
+        elif actual[0] == presente:
+            # Otra estación guardó el mismo valor: no hay conflicto real
+            guardadas[(id_alumno, fecha)] = actual[1]
+        else:
+            conflictos[(id_alumno, fecha)] = actual
+    return guardadas, conflictos
+
+
+def aplicar_upsert(cursor, registros):
+    """
+    Inserta o reemplaza registros (id_alumno, fecha_iso, presente) sin control de versión,
+    dentro de la transacción abierta en cursor. Devuelve la cantidad de registros nuevos o modificados.
+    """
+    if _mensual(cursor.connection):
+        return almacen_mensual.escribir(cursor, registros)
+    cursor.executemany("""
+        INSERT INTO asistencia (id_alumno, fecha, presente, version)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT(id_alumno, fecha) DO UPDATE
+        SET presente = excluded.presente, version = version + 1
+        WHERE presente <> excluded.presente
+    """, registros)
+    return cursor.rowcount
+
+
+def aplicar_nuevos(cursor, registros):
+    """
+    Inserta registros (id_alumno, fecha_iso, presente) que aún no existen, sin modificar
+    los ya registrados, dentro de la transacción abierta en cursor. Devuelve la cantidad de registros nuevos.
+    """
+    if _mensual(cursor.connection):
+        return almacen_mensual.escribir(cursor, registros, sobrescribir=False)
+    cursor.executemany("""
+        INSERT INTO asistencia (id_alumno, fecha, presente, version)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT(id_alumno, fecha) DO NOTHING
+    """, registros)
+    return cursor.rowcount
+
+
+def registrar_dias(cursor, id_curso, fechas):
+    """
+    Marca como registrados los días dados para todo el curso: inserta ausente (0)
+    para los alumnos que aún no tienen registro ese día. Una sentencia por día.
+    """
+    if _mensual(cursor.connection):
+        return almacen_mensual.registrar_dias(cursor, id_curso, fechas)
+    cursor.executemany("""
+        INSERT INTO asistencia (id_alumno, fecha, presente, version)
+        SELECT id, ?, 0, 1 FROM alumnos WHERE id_curso = ?
+        ON CONFLICT(id_alumno, fecha) DO NOTHING
+    """, [(fecha, id_curso) for fecha in fechas])
+
+
+def leer_celda(cursor, id_alumno, fecha):
+    """(presente, version) del registro de un alumno en un día, o None si no lo tiene."""
+    if _mensual(cursor.connection):
+        return almacen_mensual.leer_celda(cursor, id_alumno, fecha)
+    return cursor.execute(
+        "SELECT presente, version FROM asistencia WHERE id_alumno = ? AND fecha = ?", (id_alumno, fecha)
+    ).fetchone()
+
+
+def conflictos_masivos(cursor, versiones, objetivo):
+    """
+    Control de versión de una operación masiva, dentro de su transacción.
+    versiones: {(id_alumno, fecha_iso): version_cargada} de las celdas que la grilla cargó;
+    objetivo: {(id_alumno, fecha_iso): presente} que la operación escribiría.
+    Devuelve {(id_alumno, fecha_iso): (presente_actual, version_actual)} con las celdas que otra estación
+    modificó después de cargarlas a otro valor, o borró ((None, None)), como guardar_celdas().
+    """
+    conflictos = {}
+    for (id_alumno, fecha), version in versiones.items():
+        actual = leer_celda(cursor, id_alumno, fecha)
+        if actual is None:
+            if version is not None:
+                conflictos[(id_alumno, fecha)] = (None, None)
+        elif actual[1] != version and (id_alumno, fecha) in objetivo and actual[0] != objetivo[(id_alumno, fecha)]:
+            conflictos[(id_alumno, fecha)] = tuple(actual)
+    return conflictos
+
+
+def _lista(valores):
+    """Marcadores y parámetros para un IN (...) con los valores dados."""
+    valores = list(valores)
+    return ", ".join("?" * len(valores)), valores
+
+
+def marcar_dia(cursor, id_curso, fecha, presente, versiones=None):
+    """
+    Marca a todos los alumnos del curso como presentes o ausentes en un día, en una sentencia.
+    Con versiones (ver conflictos_masivos) no se pisan las celdas que otra estación cambió después
+    de cargarlas; se devuelven como conflictos.
+    """
+    conflictos = {}
+    if versiones:
+        conflictos = conflictos_masivos(cursor, versiones, {clave: presente for clave in versiones})
+    excluidos = [id_alumno for id_alumno, _ in conflictos]
+    if _mensual(cursor.connection):
+        almacen_mensual.marcar_dia(cursor, id_curso, fecha, presente, excluidos)
+        return conflictos
+    marcadores, ids = _lista(excluidos)
+    cursor.execute(f"""
+        INSERT INTO asistencia (id_alumno, fecha, presente, version)
+        SELECT id, ?, ?, 1 FROM alumnos WHERE id_curso = ? AND id NOT IN ({marcadores})
+        ON CONFLICT(id_alumno, fecha) DO UPDATE
+        SET presente = excluded.presente, version = version + 1
+        WHERE presente <> excluded.presente
+    """, [fecha, presente, id_curso] + ids)
+    return conflictos
+
+
+def marcar_rango_alumno(cursor, id_alumno, desde, hasta, presente, versiones=None):
+    """
+    Marca a un alumno como presente o ausente en los días de lunes a viernes de un rango, en una sentencia.
+    Esos días quedan registrados para todo su curso, como al guardar. Con versiones, como marcar_dia.
+    """
+    conflictos = {}
+    if versiones:
+        conflictos = conflictos_masivos(cursor, versiones, {clave: presente for clave in versiones})
+    excluidas = [fecha for _, fecha in conflictos]
+    if _mensual(cursor.connection):
+        almacen_mensual.marcar_rango_alumno(cursor, id_alumno, desde, hasta, presente, excluidas)
+    else:
+        marcadores, fechas = _lista(excluidas)
+        cursor.execute(f"""
+            WITH RECURSIVE dias(fecha) AS (
+                SELECT ?
+                UNION ALL
+                SELECT date(fecha, '+1 day') FROM dias WHERE fecha < ?
+            )
+            INSERT INTO asistencia (id_alumno, fecha, presente, version)
+            SELECT ?, fecha, ?, 1 FROM dias
+            WHERE strftime('%w', fecha) NOT IN ('0', '6') AND fecha NOT IN ({marcadores})
+            ON CONFLICT(id_alumno, fecha) DO UPDATE
+            SET presente = excluded.presente, version = version + 1
+            WHERE presente <> excluded.presente
+        """, [desde, hasta, id_alumno, presente] + fechas)
+
+    fila = cursor.execute("SELECT id_curso FROM alumnos WHERE id = ?", (id_alumno,)).fetchone()
+    if fila:
+        dias = []
+        dia, fin = date.fromisoformat(desde), date.fromisoformat(hasta)
+        while dia <= fin:
+            if dia.weekday() < 5:
+                dias.append(dia.isoformat())
+            dia += timedelta(days=1)
+        registrar_dias(cursor, fila[0], dias)
+    return conflictos
+
+
+def copiar_dia(cursor, id_curso, origen, destino, versiones=None):
+    """
+    Copia a otro día la asistencia registrada de los alumnos del curso en un día, en una sentencia.
+    Con versiones, como marcar_dia.
+    """
+    conflictos = {}
+    if versiones:
+        objetivo = {(id_alumno, destino): presente
+                    for (id_alumno, _), (presente, _) in leer_mes(cursor.connection, id_curso, origen, origen).items()}
+        conflictos = conflictos_masivos(cursor, versiones, objetivo)
+    excluidos = [id_alumno for id_alumno, _ in conflictos]
+    if _mensual(cursor.connection):
+        almacen_mensual.copiar_dia(cursor, id_curso, origen, destino, excluidos)
+        return conflictos
+    marcadores, ids = _lista(excluidos)
+    cursor.execute(f"""
+        INSERT INTO asistencia (id_alumno, fecha, presente, version)
+        SELECT ast.id_alumno, ?, ast.presente, 1
+        FROM asistencia ast
+        JOIN alumnos al ON al.id = ast.id_alumno
+        WHERE al.id_curso = ? AND ast.fecha = ? AND ast.id_alumno NOT IN ({marcadores})
+        ON CONFLICT(id_alumno, fecha) DO UPDATE
+        SET presente = excluded.presente, version = version + 1
+        WHERE presente <> excluded.presente
+    """, [destino, id_curso, origen] + ids)
+    return conflictos
+
+
+def _en_transaccion(conn, operacion, args):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        resultado = operacion(cursor, *args)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return resultado
+
+
+def ejecutar_en_transaccion(conn, operacion, *args):
+    """Ejecuta operacion(cursor, *args) en una transacción inmediata, reintentando si la base está bloqueada."""
+    return con_reintentos(_en_transaccion, conn, operacion, args)
+
+
+def _guardar_celdas(cursor, celdas, dias_por_curso):
+    resultado = aplicar_celdas(cursor, celdas)
+    for id_curso, dias in dias_por_curso.items():
+        registrar_dias(cursor, id_curso, dias)
+    return resultado
+
+
+def guardar_celdas(conn, celdas, id_curso=None, dias=(), dias_por_curso=None):
+    """
+    Guarda celdas (id_alumno, fecha_iso, presente, version_cargada) en una sola transacción.
+    version_cargada es None si la celda no tenía registro al cargarla.
+    Si se indican id_curso y dias (fechas ISO), esos días quedan registrados para todo el curso;
+    dias_por_curso ({id_curso: fechas}) hace lo mismo con celdas de varios cursos.
+    Devuelve (guardadas, conflictos):
+    - guardadas: {(id_alumno, fecha_iso): nueva_version}
+    - conflictos: {(id_alumno, fecha_iso): (presente_actual, version_actual)} para las celdas
+      que otra estación modificó después de cargarlas; esas celdas no se sobrescriben.
+      (None, None) si otra estación borró la fila o el alumno.
+    """
+    dias_por_curso = {curso: sorted(fechas) for curso, fechas in (dias_por_curso or {}).items() if fechas}
+    if id_curso is not None and dias:
+        dias_por_curso[id_curso] = sorted(set(dias_por_curso.get(id_curso, [])) | set(dias))
+    return ejecutar_en_transaccion(conn, _guardar_celdas, list(celdas), dias_por_curso)
@@ -1,25 +1,39 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import sqlite3
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from datetime import datetime, timedelta
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, HRFlowable
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+from datetime import date
+
+import archivo_anual
+import bd
+import informes
+import instantanea
+import memoria
 
 DB_PATH = "asistencia_multiples_cursos.db"
 
+# Filas del detalle que se insertan de inmediato y luego por bloque (carga diferida del Treeview)
+PRIMERA_PAGINA = 50
+FILAS_POR_BLOQUE = 200
+
+# Intervalo para detectar asistencia guardada desde la grilla u otras estaciones (ms)
+INTERVALO_SONDEO_MS = 2000
+
+# Consultar una instantánea en memoria de la base en vez del archivo compartido (también con --instantanea)
+USAR_INSTANTANEA = False
+
+# Períodos del dashboard: todo el año seleccionado, el mes o semestre actual, o un rango de fechas
+PERIODOS = ["Todo", "Mes", "Semestre", "Rango"]
+
 class DashboardApp:
-    def __init__(self, root):
+    def __init__(self, root, usar_instantanea=USAR_INSTANTANEA):
         self.root = root
         self.root.title("Dashboard de Asistencia")
         
         # Configuración de umbrales de asistencia
-        self.UMBRAL_REGULAR = 2  # Más de 2 asistencias
-        self.UMBRAL_RIESGO = 1   # 1-2 asistencias
+        self.UMBRAL_REGULAR = informes.UMBRAL_REGULAR  # Más de 2 asistencias
+        self.UMBRAL_RIESGO = informes.UMBRAL_RIESGO    # 1-2 asistencias
         
         # Definir y usar un estilo con más colores
         self.style = ttk.Style(self.root)
@@ -55,6 +69,7 @@ class DashboardApp:
 
         # Variables
         self.curso_seleccionado = tk.StringVar()
+        self.anio_seleccionado = tk.StringVar(value="Vigente")
 
         # Frame superior
         top_frame = ttk.Frame(root)
@@ -64,11 +79,42 @@ class DashboardApp:
         ttk.Label(top_frame, text="Curso:").pack(side=tk.LEFT, padx=5)
         self.combo_cursos = ttk.Combobox(top_frame, textvariable=self.curso_seleccionado, state="readonly")
         self.combo_cursos.pack(side=tk.LEFT)
+
+        # Año: la base vigente, un año archivado o todos los años juntos
+        ttk.Label(top_frame, text="Año:").pack(side=tk.LEFT, padx=5)
+        self.combo_anios = ttk.Combobox(top_frame, textvariable=self.anio_seleccionado, state="readonly", width=10)
+        self.combo_anios['values'] = ["Vigente", "Todos"] + [str(a) for a in archivo_anual.anios_archivados()]
+        self.combo_anios.pack(side=tk.LEFT)
+        self.combo_anios.bind("<<ComboboxSelected>>", lambda e: self.actualizar_periodo())
         btn_cargar = ttk.Button(top_frame, text="Cargar Datos", command=self.cargar_estadisticas)
         btn_cargar.pack(side=tk.LEFT, padx=5)
         btn_exportar = ttk.Button(top_frame, text="Exportar PDF", command=self.exportar_pdf)
         btn_exportar.pack(side=tk.LEFT, padx=5)
 
+        # Búsqueda de alumnos en todos los cursos (sin distinguir tildes, admite nombres parciales)
+        self.texto_busqueda = tk.StringVar()
+        ttk.Label(top_frame, text="Buscar alumno:").pack(side=tk.LEFT, padx=5)
+        entry_busqueda = ttk.Entry(top_frame, textvariable=self.texto_busqueda, width=25)
+        entry_busqueda.pack(side=tk.LEFT)
+        entry_busqueda.bind("<Return>", lambda e: self.buscar_alumno())
+        ttk.Button(top_frame, text="Buscar", command=self.buscar_alumno).pack(side=tk.LEFT, padx=5)
+
+        # Período: las fechas se completan al elegir mes o semestre y se pueden editar (AAAA-MM-DD)
+        self.periodo_seleccionado = tk.StringVar(value="Todo")
+        self.desde_var = tk.StringVar()
+        self.hasta_var = tk.StringVar()
+        periodo_frame = ttk.Frame(root)
+        periodo_frame.pack(side=tk.TOP, fill=tk.X, padx=5)
+        ttk.Label(periodo_frame, text="Período:").pack(side=tk.LEFT, padx=5)
+        combo_periodo = ttk.Combobox(periodo_frame, textvariable=self.periodo_seleccionado, state="readonly",
+                                     width=10, values=PERIODOS)
+        combo_periodo.pack(side=tk.LEFT)
+        combo_periodo.bind("<<ComboboxSelected>>", lambda e: self.actualizar_periodo())
+        ttk.Label(periodo_frame, text="Desde:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(periodo_frame, textvariable=self.desde_var, width=11).pack(side=tk.LEFT)
+        ttk.Label(periodo_frame, text="Hasta:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(periodo_frame, textvariable=self.hasta_var, width=11).pack(side=tk.LEFT)
+
         # Frame para las 4 estadísticas
         stats_frame = ttk.Frame(root)
         stats_frame.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
@@ -122,7 +168,7 @@ class DashboardApp:
             detalle_frame, 
             columns=columnas, 
             show="headings",
-            yscrollcommand=self.scroll_y.set, 
+            yscrollcommand=self.on_tree_scroll, 
             xscrollcommand=self.scroll_x.set
         )
         self.tree.heading("#", text="#")
@@ -144,14 +190,54 @@ class DashboardApp:
         self.scroll_y.config(command=self.tree.yview)
         self.scroll_x.config(command=self.tree.xview)
 
+        # Configurar colores para los estados (antes de insertar filas)
+        self.tree.tag_configure("Regular", background="#90EE90")  # Verde claro
+        self.tree.tag_configure("Riesgo", background="#FFB6C1")   # Rojo claro
+        self.tree.tag_configure("No Asiste", background="#D3D3D3") # Gris
+
+        # Carga diferida del detalle: conexión y filas pendientes de insertar,
+        # tarea programada con root.after e ítems insertados (incluye los ocultos por el filtro)
+        self.conn_detalle = None
+        self.filas_pendientes = None
+        self.id_carga_bloque = None
+        self.items_tree = []
+        self.dias_registrados = 0
+
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
         self.scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
 
+        # Mensajes de estado (p. ej. errores al verificar cambios de otras estaciones)
+        self.label_info = ttk.Label(root, text="", foreground="blue")
+        self.label_info.pack(side=tk.BOTTOM, anchor="w", padx=5)
+
+        # Contador de widgets, variables Tcl, figuras y memoria (para detectar fugas en sesiones largas)
+        self.label_memoria = ttk.Label(root, text="", foreground="gray")
+        self.label_memoria.pack(side=tk.BOTTOM, anchor="e", padx=5)
+        memoria.mostrar_contador(self.root, self.label_memoria)
+
         # Frame para gráficos
         self.graph_frame = ttk.Frame(root)
         self.graph_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
+        # Actualización en vivo: curso y año en pantalla, último cambio de asistencia visto
+        # y alumno cuyo gráfico se muestra (None si se muestran los gráficos generales)
+        self.id_curso_cargado = None
+        self.anio_cargado = None
+        self.periodo_cargado = (None, None)
+        self.stats_cargadas = None
+        self.ultimo_cambio = 0
+        self.id_alumno_grafico = None
+
+        # Conexión que solo consulta PRAGMA data_version y el registro de cambios
+        self.conn_monitor = bd.conectar(DB_PATH)
+        bd.migrar(self.conn_monitor)
+        self.ultima_data_version = bd.data_version(self.conn_monitor)
+        self.root.after(INTERVALO_SONDEO_MS, self.sondear_cambios)
+
+        # Instantánea en memoria (opcional): las consultas no compiten con los guardados de los docentes
+        self.instantanea = instantanea.Instantanea(DB_PATH) if usar_instantanea else None
+
         # Cargar cursos en el ComboBox
         self.cargar_cursos_en_combobox()
 
@@ -160,16 +246,70 @@ class DashboardApp:
 
     def cargar_cursos_en_combobox(self):
         """Carga la lista de cursos en el ComboBox desde la base de datos."""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT nombre FROM cursos ORDER BY nombre")
-        cursos = [row[0] for row in cursor.fetchall()]
+        conn = self.conectar_base()
+        cursos = [nombre for _, nombre in bd.listar_cursos(conn)]
         conn.close()
 
         self.combo_cursos['values'] = cursos
         if cursos:
             self.combo_cursos.current(0)  # Selecciona el primero por defecto
 
+    def conectar_base(self):
+        """Abre una conexión de consulta: a la instantánea en memoria si está activa, si no a la base."""
+        return self.instantanea.conectar() if self.instantanea else bd.conectar(DB_PATH)
+
+    def conexion_cambios(self):
+        """Conexión para leer el registro de cambios, coherente con los datos que se consultan."""
+        return self.instantanea.conn if self.instantanea else self.conn_monitor
+
+    def conectar_anio(self, anio=None):
+        """
+        Abre la conexión según el año seleccionado (o el indicado) y devuelve (conn, tabla_asistencia).
+        Los años archivados se adjuntan en solo lectura; "Todos" usa la vista que une todos los años.
+        """
+        anio = anio or self.anio_seleccionado.get()
+        uri = self.instantanea.uri if self.instantanea else None
+        if anio == "Vigente":
+            return self.conectar_base(), archivo_anual.tabla_asistencia()
+        if anio == "Todos":
+            return archivo_anual.conectar(uri=uri), archivo_anual.tabla_asistencia("todos")
+        return archivo_anual.conectar([int(anio)], uri=uri), archivo_anual.tabla_asistencia(int(anio))
+
+    def actualizar_periodo(self):
+        """Completa las fechas del período elegido: mes o semestre actual dentro del año seleccionado."""
+        periodo = self.periodo_seleccionado.get()
+        hoy = date.today()
+        anio = self.anio_seleccionado.get()
+        anio = int(anio) if anio.isdigit() else hoy.year
+        if periodo == "Todo":
+            desde = hasta = ""
+        elif periodo == "Mes":
+            desde, hasta = informes.periodo_mes(f"{anio}-{hoy.month}")
+        elif periodo == "Semestre":
+            desde, hasta = informes.periodo_semestre(anio, 1 if hoy.month <= informes.SEMESTRES[1][1] else 2)
+        else:
+            return  # Rango: las fechas se escriben a mano
+        self.desde_var.set(desde)
+        self.hasta_var.set(hasta)
+
+    def leer_periodo(self):
+        """
+        Devuelve (desde, hasta) ISO del período elegido, (None, None) para todo el año seleccionado,
+        o None si las fechas no son válidas (se avisa al usuario).
+        """
+        if self.periodo_seleccionado.get() == "Todo":
+            return None, None
+        try:
+            desde = date.fromisoformat(self.desde_var.get().strip()).isoformat()
+            hasta = date.fromisoformat(self.hasta_var.get().strip()).isoformat()
+        except ValueError:
+            messagebox.showwarning("Atención", "Ingrese las fechas del período como AAAA-MM-DD.")
+            return None
+        if desde > hasta:
+            messagebox.showwarning("Atención", "La fecha inicial del período es posterior a la final.")
+            return None
+        return desde, hasta
+
     def cargar_estadisticas(self):
         """Carga y muestra las estadísticas y el detalle de asistencia para el curso seleccionado."""
         curso = self.curso_seleccionado.get()
@@ -182,131 +322,219 @@ class DashboardApp:
             messagebox.showwarning("Atención", "Curso inválido.")
             return
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        periodo = self.leer_periodo()
+        if periodo is None:
+            return
+        desde, hasta = periodo
 
-        # 1) Total de alumnos en el curso
-        cursor.execute("SELECT COUNT(*) FROM alumnos WHERE id_curso = ?", (id_curso,))
-        total_alumnos = cursor.fetchone()[0]
+        # Los cambios posteriores a este punto se aplicarán en el próximo sondeo
+        self.ultimo_cambio = bd.ultimo_cambio(self.conexion_cambios())
+        self.ultima_data_version = bd.data_version(self.conn_monitor)
 
-        # 2) Días registrados (distintos) en asistencia para los alumnos de este curso
-        cursor.execute("""
-            SELECT COUNT(DISTINCT fecha)
-            FROM asistencia
-            WHERE id_alumno IN (
-                SELECT id FROM alumnos WHERE id_curso = ?
-            )
-        """, (id_curso,))
-        dias_registrados = cursor.fetchone()[0]
-
-        # 3) Suma total de asistencias (presente=1) para el curso
-        cursor.execute("""
-            SELECT SUM(presente)
-            FROM asistencia
-            WHERE id_alumno IN (
-                SELECT id FROM alumnos WHERE id_curso = ?
-            )
-        """, (id_curso,))
-        asistencia_total = cursor.fetchone()[0]
-        if asistencia_total is None:
-            asistencia_total = 0
-
-        # 4) Porcentaje promedio de asistencia
-        total_posible = total_alumnos * dias_registrados
-        if total_posible > 0:
-            promedio_asistencia = (asistencia_total / total_posible) * 100
-        else:
-            promedio_asistencia = 0.0
+        conn, tabla = self.conectar_anio()
 
-        # Actualizamos los labels
-        self.label_total_alumnos.config(text=f"Total Alumnos: {total_alumnos}")
-        self.label_dias_registrados.config(text=f"Días Registrados: {dias_registrados}")
-        self.label_asistencia_total.config(text=f"Asistencia Total: {asistencia_total}")
-        self.label_porcentaje_promedio.config(text=f"Prom. Asistencia: {promedio_asistencia:.2f}%")
+        # Totales del curso en el período: alumnos, días registrados, asistencias y promedio
+        stats = bd.estadisticas_curso(conn, id_curso, tabla, desde, hasta)
+        self.mostrar_estadisticas(stats)
 
         # Cargar detalle por alumno con información adicional
-        self.tree.delete(*self.tree.get_children())  # Limpiar la tabla
-
-        cursor.execute("""
-            SELECT id, nombre
-            FROM alumnos
-            WHERE id_curso = ?
-            ORDER BY nombre
-        """, (id_curso,))
-        alumnos = cursor.fetchall()
-
-        for idx, (id_alumno, nombre_alumno) in enumerate(alumnos, 1):
-            # Días presentes y última asistencia
-            cursor.execute("""
-                SELECT SUM(presente), MAX(CASE WHEN presente = 1 THEN fecha END)
-                FROM asistencia
-                WHERE id_alumno = ?
-            """, (id_alumno,))
-            dias_presentes, ultima_asistencia = cursor.fetchone()
-            
-            if dias_presentes is None:
-                dias_presentes = 0
-            
-            # Calcular porcentaje y estado
-            porcentaje = (dias_presentes / dias_registrados * 100) if dias_registrados > 0 else 0
-            
-            # Determinar estado basado en asistencia
-            estado, color = self.determinar_estado(dias_presentes, dias_registrados, ultima_asistencia)
-            
-            # Formatear última asistencia
-            ultima_asistencia_fmt = ultima_asistencia if ultima_asistencia else "Sin registros"
-            
-            self.tree.insert("", "end", values=(
-                idx,
-                nombre_alumno,
-                dias_presentes,
-                dias_registrados,
-                f"{porcentaje:.1f}%",
-                ultima_asistencia_fmt,
-                estado
-            ), tags=(color,))
-
-        # Configurar colores para los estados
-        self.tree.tag_configure("Regular", background="#90EE90")  # Verde claro
-        self.tree.tag_configure("Riesgo", background="#FFB6C1")   # Rojo claro
-        self.tree.tag_configure("No Asiste", background="#D3D3D3") # Gris
+        self.detener_carga_detalle()
+        self.tree.delete(*self.items_tree)  # Limpiar la tabla
+        self.items_tree = []
+        self.dias_registrados = stats["dias_registrados"]
+        self.id_curso_cargado = id_curso
+        self.anio_cargado = self.anio_seleccionado.get()
+        self.periodo_cargado = periodo
+        self.stats_cargadas = stats
+
+        # Días presentes y última asistencia de cada alumno: se insertan por bloques desde el cursor
+        self.conn_detalle = conn
+        self.filas_pendientes = enumerate(bd.detalle_alumnos(conn, id_curso, tabla, desde, hasta), 1)
+        self.insertar_bloque(PRIMERA_PAGINA)
 
-        conn.close()
-        self.aplicar_filtro()  # Aplicar el filtro actual
-        
         # Crear gráficos generales
-        self.crear_graficos(total_alumnos, dias_registrados, asistencia_total, promedio_asistencia)
+        self.crear_graficos(**stats)
+
+    def mostrar_estadisticas(self, stats):
+        """Actualiza los cuatro recuadros de estadísticas del curso."""
+        self.label_total_alumnos.config(text=f"Total Alumnos: {stats['total_alumnos']}")
+        self.label_dias_registrados.config(text=f"Días Registrados: {stats['dias_registrados']}")
+        self.label_asistencia_total.config(text=f"Asistencia Total: {stats['asistencia_total']}")
+        self.label_porcentaje_promedio.config(text=f"Prom. Asistencia: {stats['promedio_asistencia']:.2f}%")
+
+    def valores_fila(self, idx, nombre_alumno, dias_presentes, dias_registrados, ultima_asistencia):
+        """Devuelve (valores, estado) de la fila de un alumno en el Treeview."""
+        # Calcular porcentaje y estado
+        porcentaje = (dias_presentes / dias_registrados * 100) if dias_registrados > 0 else 0
+        
+        # Determinar estado basado en asistencia
+        estado, color = self.determinar_estado(dias_presentes, dias_registrados, ultima_asistencia)
+        
+        # Formatear última asistencia
+        ultima_asistencia_fmt = ultima_asistencia if ultima_asistencia else "Sin registros"
+        
+        return (
+            idx,
+            nombre_alumno,
+            dias_presentes,
+            dias_registrados,
+            f"{porcentaje:.1f}%",
+            ultima_asistencia_fmt,
+            estado
+        ), estado
+
+    def insertar_bloque(self, cantidad=FILAS_POR_BLOQUE):
+        """
+        Inserta en el Treeview las siguientes filas del detalle y programa el próximo bloque,
+        para que las primeras filas aparezcan de inmediato aunque el curso sea muy grande.
+        """
+        self.id_carga_bloque = None
+        if self.filas_pendientes is None:
+            return
+
+        dias_registrados = self.dias_registrados
+        filtro = self.filtro_var.get()
+        insertadas = 0
+        for idx, (id_alumno, nombre_alumno, dias_presentes, ultima_asistencia) in self.filas_pendientes:
+            valores, estado = self.valores_fila(idx, nombre_alumno, dias_presentes, dias_registrados, ultima_asistencia)
+            item = self.tree.insert("", "end", iid=str(id_alumno), values=valores, tags=(estado,))
+            self.items_tree.append(item)
+
+            # Aplicar el filtro actual a medida que llegan las filas
+            if not self.pasa_filtro(filtro, dias_presentes):
+                self.tree.detach(item)
+
+            insertadas += 1
+            if insertadas >= cantidad:
+                self.id_carga_bloque = self.root.after(1, self.insertar_bloque)
+                return
+
+        # No quedan filas: se libera la conexión
+        self.detener_carga_detalle()
+
+    def detener_carga_detalle(self):
+        """Cancela la carga diferida en curso y cierra su conexión."""
+        if self.id_carga_bloque:
+            self.root.after_cancel(self.id_carga_bloque)
+            self.id_carga_bloque = None
+        self.filas_pendientes = None
+        if self.conn_detalle:
+            self.conn_detalle.close()
+            self.conn_detalle = None
+
+    def on_tree_scroll(self, primero, ultimo):
+        """Actualiza la barra de scroll y adelanta el próximo bloque si se llegó al final de la tabla."""
+        self.scroll_y.set(primero, ultimo)
+        if self.id_carga_bloque and float(ultimo) >= 0.9:
+            self.root.after_cancel(self.id_carga_bloque)
+            self.id_carga_bloque = self.root.after_idle(self.insertar_bloque)
+
+    def sondear_cambios(self):
+        """Detecta asistencia guardada por otras conexiones y actualiza solo los alumnos afectados."""
+        try:
+            # Durante la carga diferida se espera a que termine (el sondeo siguiente lo aplicará).
+            # La instantánea se vuelve a copiar en segundo plano solo si la base cambió; al terminar la copia
+            # se refresca lo que cambió
+            if self.instantanea:
+                if self.filas_pendientes is None and self.instantanea.sincronizar():
+                    if self.id_curso_cargado and self.anio_cargado in ("Vigente", "Todos"):
+                        self.refrescar_cambios()
+            else:
+                version = bd.data_version(self.conn_monitor)
+                if version != self.ultima_data_version and self.filas_pendientes is None:
+                    if self.id_curso_cargado and self.anio_cargado in ("Vigente", "Todos"):
+                        self.refrescar_cambios()
+                    self.ultima_data_version = version
+            # Un error anterior ya no corresponde
+            self.label_info.config(text="")
+        except Exception as e:
+            self.label_info.config(text=f"No se pudieron verificar cambios de asistencia: {e}")
+        finally:
+            self.root.after(INTERVALO_SONDEO_MS, self.sondear_cambios)
+
+    def refrescar_cambios(self):
+        """
+        Relee las estadísticas del curso y el detalle de los alumnos con cambios en el registro
+        de cambios, y actualiza solo esas filas del Treeview, los recuadros y los gráficos afectados.
+        """
+        self.ultimo_cambio, afectados = bd.alumnos_cambiados(
+            self.conexion_cambios(), self.id_curso_cargado, self.ultimo_cambio
+        )
+        if afectados is None or len(afectados) > FILAS_POR_BLOQUE:
+            # Cambios ya depurados del registro o demasiados: conviene recargar todo
+            self.cargar_estadisticas()
+            return
+        if not afectados:
+            return
+
+        desde, hasta = self.periodo_cargado
+        conn, tabla = self.conectar_anio(self.anio_cargado)
+        try:
+            stats = bd.estadisticas_curso(conn, self.id_curso_cargado, tabla, desde, hasta)
+            filas = bd.detalle_alumnos(conn, self.id_curso_cargado, tabla, desde, hasta, ids=afectados).fetchall()
+        finally:
+            conn.close()
+
+        dias_registrados = stats["dias_registrados"]
+        if stats != self.stats_cargadas:
+            self.mostrar_estadisticas(stats)
+
+        if dias_registrados != self.dias_registrados:
+            # Cambió el total de días: se recalcula el porcentaje de todas las filas, sin consultar la base
+            for item in self.items_tree:
+                idx, nombre, dias_presentes, _, _, ultima, _ = self.tree.item(item)["values"]
+                ultima = None if ultima == "Sin registros" else ultima
+                valores, estado = self.valores_fila(idx, nombre, int(dias_presentes), dias_registrados, ultima)
+                self.tree.item(item, values=valores, tags=(estado,))
+            self.dias_registrados = dias_registrados
+
+        for id_alumno, nombre_alumno, dias_presentes, ultima_asistencia in filas:
+            iid = str(id_alumno)
+            if self.tree.exists(iid):
+                idx = self.tree.item(iid)["values"][0]
+                valores, estado = self.valores_fila(idx, nombre_alumno, dias_presentes, dias_registrados, ultima_asistencia)
+                self.tree.item(iid, values=valores, tags=(estado,))
+            else:
+                # Alumno agregado al curso después de cargar
+                valores, estado = self.valores_fila(len(self.items_tree) + 1, nombre_alumno, dias_presentes,
+                                                    dias_registrados, ultima_asistencia)
+                self.items_tree.append(self.tree.insert("", "end", iid=iid, values=valores, tags=(estado,)))
+        if self.filtro_var.get() != "todos":
+            self.aplicar_filtro()
+
+        if self.id_alumno_grafico in afectados:
+            self.cargar_graficos_alumno(self.id_alumno_grafico)
+        elif self.id_alumno_grafico is None and stats != self.stats_cargadas:
+            self.crear_graficos(**stats)
+        self.stats_cargadas = stats
 
     def determinar_estado(self, dias_presentes, dias_totales, ultima_asistencia):
         """Determina el estado de asistencia del alumno según los umbrales configurados."""
-        if dias_presentes == 0:
-            return "No Asiste", "#D3D3D3"
-            
-        # Si tiene más de 2 asistencias
-        if dias_presentes > self.UMBRAL_REGULAR:
-            return "Regular", "#90EE90"
-        # Si tiene 1-2 asistencias
-        elif dias_presentes >= self.UMBRAL_RIESGO:
-            return "Riesgo", "#FFB6C1"
-        else:
-            return "No Asiste", "#D3D3D3"
+        return informes.determinar_estado(dias_presentes, self.UMBRAL_REGULAR, self.UMBRAL_RIESGO)
 
     def aplicar_filtro(self):
         """Aplica el filtro seleccionado a la tabla de alumnos."""
         filtro = self.filtro_var.get()
-        for item in self.tree.get_children():
+        # Se recorren todos los ítems insertados, incluidos los ocultos por un filtro anterior
+        for item in self.items_tree:
             valores = self.tree.item(item)["values"]
             dias_presentes = int(valores[2])
             
-            if filtro == "todos":
-                self.tree.reattach(item, "", "end")
-            elif filtro == "baja" and dias_presentes <= 1 and dias_presentes > 0:
-                self.tree.reattach(item, "", "end")
-            elif filtro == "no_asisten" and dias_presentes == 0:
+            if self.pasa_filtro(filtro, dias_presentes):
                 self.tree.reattach(item, "", "end")
             else:
                 self.tree.detach(item)
 
+    def pasa_filtro(self, filtro, dias_presentes):
+        """Indica si un alumno con esos días presentes se muestra con el filtro dado."""
+        if filtro == "todos":
+            return True
+        if filtro == "baja":
+            return 0 < dias_presentes <= 1
+        if filtro == "no_asisten":
+            return dias_presentes == 0
+        return False
+
     def on_tree_select(self, event):
         """Muestra información detallada del alumno seleccionado."""
         seleccion = self.tree.selection()
@@ -315,7 +543,7 @@ class DashboardApp:
 
         item = self.tree.item(seleccion[0])
         valores = item["values"]
-        alumno = valores[1]
+        id_alumno = int(seleccion[0])
         
         # Crear ventana emergente con información detallada
         info_window = tk.Toplevel(self.root)
@@ -333,10 +561,70 @@ class DashboardApp:
         ttk.Button(info_window, text="Cerrar", command=info_window.destroy).pack(pady=10)
         
         # Cargar gráficos del alumno
-        self.cargar_graficos_alumno(alumno)
+        self.cargar_graficos_alumno(id_alumno)
+
+    def buscar_alumno(self):
+        """Busca alumnos por nombre en todos los cursos y muestra los resultados."""
+        texto = self.texto_busqueda.get().strip()
+        if not texto:
+            return
+        conn = self.conectar_base()
+        resultados = bd.buscar_alumnos(conn, texto)
+        conn.close()
+
+        if not resultados:
+            messagebox.showinfo("Búsqueda", f"No se encontraron alumnos para \"{texto}\".")
+        elif len(resultados) == 1:
+            self.ir_a_alumno(resultados[0][0], resultados[0][3])
+        else:
+            self.mostrar_resultados_busqueda(resultados)
+
+    def mostrar_resultados_busqueda(self, resultados):
+        """Ventana con los alumnos encontrados; doble clic o Enter abre el detalle del elegido."""
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Resultados de la búsqueda")
+        lista = tk.Listbox(ventana, width=60, height=min(len(resultados), 15))
+        lista.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        for _, nombre, _, nombre_curso in resultados:
+            lista.insert(tk.END, f"{nombre}  ({nombre_curso})")
+        lista.selection_set(0)
+        lista.focus_set()
+
+        def elegir(event=None):
+            seleccion = lista.curselection()
+            if seleccion:
+                id_alumno, _, _, nombre_curso = resultados[seleccion[0]]
+                ventana.destroy()
+                self.ir_a_alumno(id_alumno, nombre_curso)
+
+        lista.bind("<Double-Button-1>", elegir)
+        lista.bind("<Return>", elegir)
+
+    def ir_a_alumno(self, id_alumno, nombre_curso):
+        """Carga el curso del alumno, lo selecciona en la tabla y muestra su detalle."""
+        self.curso_seleccionado.set(nombre_curso)
+        self.cargar_estadisticas()
+
+        # Con la carga diferida, se insertan bloques hasta que aparezca la fila del alumno
+        iid = str(id_alumno)
+        while not self.tree.exists(iid) and self.filas_pendientes is not None:
+            if self.id_carga_bloque:
+                self.root.after_cancel(self.id_carga_bloque)
+            self.insertar_bloque()
+        if not self.tree.exists(iid):
+            return
+        if iid not in self.tree.get_children():
+            # La fila estaba oculta por el filtro actual
+            self.filtro_var.set("todos")
+            self.aplicar_filtro()
+
+        self.tree.selection_set(iid)
+        self.tree.see(iid)
+        self.on_tree_select(None)
 
     def crear_graficos(self, total_alumnos, dias_registrados, asistencia_total, promedio_asistencia):
         """Crea gráficos de barras y pastel para visualizar las estadísticas generales."""
+        self.id_alumno_grafico = None
         for widget in self.graph_frame.winfo_children():
             widget.destroy()
 
@@ -356,35 +644,18 @@ class DashboardApp:
         canvas = FigureCanvasTkAgg(fig, master=self.graph_frame)
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # La figura queda en el canvas; pyplot no debe conservarla (se acumularía una por gráfico)
+        plt.close(fig)
 
-    def cargar_graficos_alumno(self, nombre_alumno):
+    def cargar_graficos_alumno(self, id_alumno):
         """Carga y muestra los gráficos de asistencia para el alumno seleccionado."""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT id FROM alumnos WHERE nombre = ?", (nombre_alumno,))
-        id_alumno = cursor.fetchone()[0]
-
-        # Días presentes
-        cursor.execute("""
-            SELECT SUM(presente)
-            FROM asistencia
-            WHERE id_alumno = ?
-        """, (id_alumno,))
-        dias_presentes = cursor.fetchone()[0]
-        if dias_presentes is None:
-            dias_presentes = 0
-
-        # Días totales
-        cursor.execute("""
-            SELECT COUNT(DISTINCT fecha)
-            FROM asistencia
-            WHERE id_alumno = ?
-        """, (id_alumno,))
-        dias_totales = cursor.fetchone()[0]
-
-        if dias_totales is None:
-            dias_totales = 0
+        self.id_alumno_grafico = id_alumno
+        conn, tabla = self.conectar_anio(self.anio_cargado)
+        try:
+            # Días presentes y días totales en el período cargado
+            dias_presentes, dias_totales = bd.estadisticas_alumno(conn, id_alumno, tabla, *self.periodo_cargado)
+        finally:
+            conn.close()
 
         # Porcentaje
         if dias_totales > 0:
@@ -392,8 +663,6 @@ class DashboardApp:
         else:
             porcentaje = 0.0
 
-        conn.close()
-
         # Crear gráficos específicos del alumno
         self.crear_graficos_alumno(dias_presentes, dias_totales, porcentaje)
 
@@ -418,15 +687,15 @@ class DashboardApp:
         canvas = FigureCanvasTkAgg(fig, master=self.graph_frame)
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # La figura queda en el canvas; pyplot no debe conservarla (se acumularía una por gráfico)
+        plt.close(fig)
 
     def get_id_curso_por_nombre(self, nombre_curso):
         """Devuelve el id de un curso dado su nombre."""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM cursos WHERE nombre = ?", (nombre_curso,))
-        row = cursor.fetchone()
+        conn = self.conectar_base()
+        id_curso = bd.id_curso_por_nombre(conn, nombre_curso)
         conn.close()
-        return row[0] if row else None
+        return id_curso
 
     def exportar_pdf(self):
         """Exporta un informe detallado de asistencia a PDF."""
@@ -442,210 +711,25 @@ class DashboardApp:
             if not file_path:
                 return
 
+            periodo = self.leer_periodo()
+            if periodo is None:
+                return
+            desde, hasta = periodo
+            etiqueta = self.anio_seleccionado.get()
+            if desde:
+                etiqueta += f", {desde} a {hasta}"
+
             # Obtener datos del curso
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
+            conn, tabla = self.conectar_anio()
             
             id_curso = self.get_id_curso_por_nombre(self.curso_seleccionado.get())
             if not id_curso:
                 messagebox.showerror("Error", "No se pudo encontrar el curso seleccionado")
                 return
             
-            # Crear documento PDF
-            doc = SimpleDocTemplate(file_path, pagesize=letter)
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # Estilo para el membrete
-            header_style = ParagraphStyle(
-                'Header',
-                parent=styles['Heading1'],
-                fontSize=14,
-                alignment=1,  # Centrado
-                spaceAfter=5,
-                textColor=colors.HexColor('#1B4F72')  # Azul institucional
-            )
-            
-            subheader_style = ParagraphStyle(
-                'SubHeader',
-                parent=styles['Normal'],
-                fontSize=12,
-                alignment=1,  # Centrado
-                spaceAfter=20,
-                textColor=colors.HexColor('#2874A6')  # Azul más claro
-            )
-            
-            # Membrete
-            elements.append(Paragraph("CEIA Amigos del Padre Hurtado", header_style))
-            elements.append(Paragraph("La Serena", subheader_style))
-            elements.append(Paragraph("Reporte Asistencia - Inspectoría Jornada Noche", subheader_style))
-            elements.append(Spacer(1, 20))
-            
-            # Línea divisoria
-            elements.append(HRFlowable(
-                width="100%",
-                thickness=1,
-                color=colors.HexColor('#1B4F72'),
-                spaceBefore=1,
-                spaceAfter=20
-            ))
-            
-            # Título y fecha
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading2'],
-                fontSize=12,
-                spaceAfter=10,
-                alignment=1
-            )
-            elements.append(Paragraph(f"Informe de Asistencia - {self.curso_seleccionado.get()}", title_style))
-            elements.append(Paragraph(f"Fecha: {datetime.now().strftime('%d/%m/%Y %H:%M')}", 
-                                   ParagraphStyle('Date', parent=styles['Normal'], alignment=1)))
-            elements.append(Spacer(1, 20))
-            
-            # Estadísticas generales
-            elements.append(Paragraph("Estadísticas Generales", styles["Heading2"]))
-            elements.append(Spacer(1, 10))
-            
-            # Obtener estadísticas
-            cursor.execute("SELECT COUNT(*) FROM alumnos WHERE id_curso = ?", (id_curso,))
-            total_alumnos = cursor.fetchone()[0]
-            
-            cursor.execute("""
-                SELECT COUNT(DISTINCT fecha) as dias_registrados,
-                       SUM(CASE WHEN presente = 1 THEN 1 ELSE 0 END) as total_asistencias
-                FROM asistencia
-                WHERE id_alumno IN (SELECT id FROM alumnos WHERE id_curso = ?)
-            """, (id_curso,))
-            
-            row = cursor.fetchone()
-            dias_registrados = row[0] if row[0] is not None else 0
-            asistencia_total = row[1] if row[1] is not None else 0
-            
-            promedio_asistencia = (asistencia_total / (total_alumnos * dias_registrados) * 100) if dias_registrados > 0 and total_alumnos > 0 else 0
-            
-            # Tabla de estadísticas
-            stats_data = [
-                ["Estadística", "Valor"],
-                ["Total de Alumnos", str(total_alumnos)],
-                ["Días Registrados", str(dias_registrados)],
-                ["Total Asistencias", str(asistencia_total)],
-                ["Promedio Asistencia", f"{promedio_asistencia:.1f}%"]
-            ]
-            
-            stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
-            stats_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('PADDING', (0, 0), (-1, -1), 8),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('WORDWRAP', (0, 0), (-1, -1), True),
-            ]))
-            elements.append(stats_table)
-            elements.append(Spacer(1, 20))
-            
-            # Agregar leyenda después de las estadísticas generales
-            elements.append(Paragraph("Criterios de Clasificación:", styles["Heading3"]))
-            elements.append(Spacer(1, 10))
-            
-            # Tabla de leyenda con criterios específicos
-            legend_data = [
-                ["Estado", "Criterio", "Descripción"],
-                ["Regular", ">2 asistencias", "Alumno asiste con regularidad"],
-                ["Riesgo", "1-2 asistencias", "Asistencia baja, requiere seguimiento"],
-                ["No Asiste", "0 asistencias", "Sin asistencias registradas"]
-            ]
-            
-            legend_table = Table(legend_data, colWidths=[1.2*inch, 1.5*inch, 2.8*inch])
-            legend_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('ALIGN', (-1, 1), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('PADDING', (0, 0), (-1, -1), 6),
-                ('BACKGROUND', (0, 1), (-1, 1), colors.lightgreen),
-                ('BACKGROUND', (0, 2), (-1, 2), colors.pink),
-                ('BACKGROUND', (0, 3), (-1, 3), colors.lightgrey),
-                ('WORDWRAP', (0, 0), (-1, -1), True),
-            ]))
-            elements.append(legend_table)
-            elements.append(Spacer(1, 20))
-            
-            # Detalle por alumno
-            elements.append(Paragraph("Detalle por Alumno", styles["Heading2"]))
-            elements.append(Spacer(1, 10))
-            
-            # Obtener datos de alumnos
-            cursor.execute("""
-                SELECT a.nombre,
-                       COUNT(DISTINCT CASE WHEN ast.presente = 1 THEN ast.fecha END) as dias_presentes,
-                       COUNT(DISTINCT ast.fecha) as dias_totales,
-                       MAX(CASE WHEN ast.presente = 1 THEN ast.fecha END) as ultima_asistencia
-                FROM alumnos a
-                LEFT JOIN asistencia ast ON a.id = ast.id_alumno
-                WHERE a.id_curso = ?
-                GROUP BY a.id, a.nombre
-                ORDER BY a.nombre
-            """, (id_curso,))
-            
-            alumnos_data = [["#", "Alumno", "Días\nPresente", "Días\nTotales", "%\nAsistencia", "Última\nAsistencia", "Estado"]]
-            row_colors = [(('BACKGROUND', (0, 0), (-1, 0), colors.grey))]  # Color para el encabezado
-            
-            for idx, row in enumerate(cursor.fetchall(), 1):
-                nombre, dias_presentes, dias_totales, ultima_asistencia = row
-                dias_presentes = dias_presentes or 0
-                dias_totales = dias_totales or 0
-                
-                porcentaje = (dias_presentes / dias_totales * 100) if dias_totales > 0 else 0
-                
-                # Determinar estado basado en asistencia
-                estado, color = self.determinar_estado(dias_presentes, dias_totales, ultima_asistencia)
-                
-                alumnos_data.append([
-                    str(idx),
-                    Paragraph(nombre, styles['Normal']),
-                    str(dias_presentes),
-                    str(dias_totales),
-                    f"{porcentaje:.1f}%",
-                    ultima_asistencia if ultima_asistencia else "Sin registros",
-                    estado
-                ])
-                
-                # Convertir color hexadecimal a objeto Color de reportlab
-                if color == "#90EE90":
-                    pdf_color = colors.lightgreen
-                elif color == "#FFB6C1":
-                    pdf_color = colors.pink
-                else:
-                    pdf_color = colors.lightgrey
-                
-                row_colors.append(('BACKGROUND', (0, idx), (-1, idx), pdf_color))
-            
-            # Ajustar anchos de columna y crear tabla
-            alumnos_table = Table(alumnos_data, colWidths=[0.5*inch, 2.5*inch, 0.8*inch, 0.8*inch, 0.8*inch, 1.3*inch, 0.8*inch])
-            
-            style = TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('PADDING', (0, 0), (-1, -1), 6),
-                ('WORDWRAP', (0, 0), (-1, -1), True),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ] + row_colors)
-            
-            alumnos_table.setStyle(style)
-            elements.append(alumnos_table)
-            
-            # Generar PDF
-            doc.build(elements)
+            # Mismo formato que los informes de cierre de mes (informes.py)
+            informes.generar_pdf(conn, tabla, id_curso, self.curso_seleccionado.get(), file_path,
+                                 etiqueta=etiqueta, desde=desde, hasta=hasta)
             messagebox.showinfo("Éxito", "PDF generado correctamente")
             
         except Exception as e:
@@ -656,6 +740,11 @@ class DashboardApp:
                 conn.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dashboard de asistencia por curso.")
+    parser.add_argument("--instantanea", action="store_true", default=USAR_INSTANTANEA,
+                        help="Consulta una copia en memoria de la base, que se actualiza al detectar cambios")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = DashboardApp(root)
+    app = DashboardApp(root, args.instantanea)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Exportación de la asistencia diaria (un registro por alumno y día) para informes al Ministerio y análisis.
+- Recorre asistencia unida a alumnos y cursos con un cursor que se lee por lotes (fetchmany),
+  de modo que la memoria usada no depende del tamaño de la exportación.
+- Escribe CSV (módulo csv) o Parquet (requiere pyarrow; cada lote se escribe como un grupo de filas).
+- Filtra por rango de fechas y por curso; si hay años archivados se incluyen en la exportación, con el curso
+  de cada alumno en ese año.
+
+Uso:
+    python exportar.py asistencia.csv
+    python exportar.py asistencia.parquet --desde 2024-03-01 --hasta 2025-12-31 --curso "1° Básico A"
+"""
+
+import argparse
+import csv
+import os
+
+import archivo_anual
+import bd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional
+    pa = pq = None
+
+DB_PATH = "asistencia_multiples_cursos.db"
+
+# Filas leídas de la base y escritas en cada paso
+FILAS_POR_LOTE = 10000
+
+COLUMNAS = ["fecha", "id_curso", "curso", "id_alumno", "alumno", "presente"]
+
+
+def consultar(conn, tablas=("asistencia",), desde=None, hasta=None, id_curso=None):
+    """
+    Devuelve un cursor sobre los registros diarios filtrados (sin leerlos todavía) de las tablas de asistencia
+    dadas. Cada tabla se une a los alumnos y cursos de su propia base: los años archivados conservan el curso
+    que tenía cada alumno ese año.
+    """
+    condiciones, parametros = [], []
+    if desde:
+        condiciones.append("ast.fecha >= ?")
+        parametros.append(desde)
+    if hasta:
+        condiciones.append("ast.fecha <= ?")
+        parametros.append(hasta)
+    if id_curso is not None:
+        condiciones.append("al.id_curso = ?")
+        parametros.append(id_curso)
+    where = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+
+    selects = []
+    for tabla in tablas:
+        selects.append(f"""
+            SELECT ast.fecha, c.id, c.nombre, al.id, al.nombre, ast.presente
+            FROM {tabla} ast
+            JOIN {bd.tabla_alumnos(tabla)} al ON al.id = ast.id_alumno
+            JOIN {bd.tabla_cursos(tabla)} c ON c.id = al.id_curso
+            {where}
+        """)
+    return conn.execute(" UNION ALL ".join(selects), parametros * len(selects))
+
+
+def lotes(cursor, tamano=FILAS_POR_LOTE):
+    """Entrega las filas del cursor en listas de a lo más 'tamano' filas."""
+    while True:
+        filas = cursor.fetchmany(tamano)
+        if not filas:
+            return
+        yield filas
+
+
+def escribir_csv(cursor, destino, tamano=FILAS_POR_LOTE):
+    """Escribe los registros en CSV lote a lote. Devuelve la cantidad de filas escritas."""
+    total = 0
+    with open(destino, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(COLUMNAS)
+        for filas in lotes(cursor, tamano):
+            escritor.writerows(filas)
+            total += len(filas)
+    return total
+
+
+def escribir_parquet(cursor, destino, tamano=FILAS_POR_LOTE):
+    """Escribe los registros en Parquet, un grupo de filas por lote. Devuelve la cantidad de filas escritas."""
+    if pa is None:
+        raise RuntimeError("Para exportar en Parquet se necesita pyarrow (pip install pyarrow).")
+    esquema = pa.schema([
+        ("fecha", pa.string()),
+        ("id_curso", pa.int64()),
+        ("curso", pa.string()),
+        ("id_alumno", pa.int64()),
+        ("alumno", pa.string()),
+        ("presente", pa.int8()),
+    ])
+    total = 0
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for filas in lotes(cursor, tamano):
+            columnas = list(zip(*filas))
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+                schema=esquema,
+            ))
+            total += len(filas)
+    return total
+
+
+def exportar(destino, formato=None, desde=None, hasta=None, curso=None, db_path=DB_PATH, tamano=FILAS_POR_LOTE):
+    """
+    Exporta la asistencia diaria a destino (CSV o Parquet según formato o la extensión del archivo).
+    curso es el nombre del curso; si se omite se exportan todos. Devuelve la cantidad de filas escritas.
+    """
+    formato = formato or ("parquet" if destino.lower().endswith(".parquet") else "csv")
+    escribir = escribir_parquet if formato == "parquet" else escribir_csv
+
+    # Con años archivados se consultan también sus bases, adjuntas a la principal
+    anios = archivo_anual.anios_archivados()
+    if anios:
+        conn = archivo_anual.conectar(anios, db_path=db_path)
+    else:
+        conn = bd.conectar(db_path)
+    tablas = ["asistencia"] + [archivo_anual.tabla_asistencia(anio) for anio in anios]
+
+    # Se escribe en un temporal y se renombra al terminar, como en los respaldos
+    temporal = destino + ".tmp"
+    try:
+        id_curso = None
+        if curso is not None:
+            id_curso = bd.id_curso_por_nombre(conn, curso)
+            if id_curso is None:
+                raise ValueError(f"No existe el curso '{curso}'.")
+        total = escribir(consultar(conn, tablas, desde, hasta, id_curso), temporal, tamano)
+        os.replace(temporal, destino)
+    finally:
+        conn.close()
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta la asistencia diaria a CSV o Parquet.")
+    parser.add_argument("destino", help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument("--formato", choices=["csv", "parquet"], help="Formato de salida (por defecto según la extensión)")
+    parser.add_argument("--desde", help="Fecha inicial YYYY-MM-DD (inclusive)")
+    parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD (inclusive)")
+    parser.add_argument("--curso", help="Nombre del curso a exportar (por defecto todos)")
+    parser.add_argument("--lote", type=int, default=FILAS_POR_LOTE, help="Filas por lote")
+    parser.add_argument("--db", default=DB_PATH, help="Ruta de la base de datos")
+    args = parser.parse_args()
+
+    total = exportar(args.destino, args.formato, args.desde, args.hasta, args.curso, args.db, args.lote)
+    print(f"{total} registros exportados a {args.destino}")
@@ -0,0 +1,206 @@
+"""
+Importación masiva de asistencia desde archivos CSV (registros en papel digitados o lectores de tarjetas).
+- Lee el archivo fila a fila; cada fila indica alumno, fecha y presente. El alumno puede venir como
+  id_alumno o como nombre (columna "alumno", opcionalmente con "curso" para distinguir homónimos).
+  El formato que escribe exportar.py se puede importar directamente.
+- Valida cada fila contra los alumnos de la base y el calendario escolar (días de lunes a viernes,
+  no futuros y de años no archivados); las filas rechazadas se informan en <archivo>.rechazos.csv.
+- Primero lee y valida todo el archivo (sin bloquear la base); después escribe todas las filas válidas
+  en una sola transacción inmediata con reintentos, en sentencias de a FILAS_POR_LOTE filas, con la misma
+  tabla y versión por fila que usa guardar_asistencia: si algo falla no queda nada importado. Al final
+  los días importados quedan registrados para todo el curso, como al guardar desde la grilla.
+- Política ante registros existentes: "sobrescribir" (el archivo manda) o "conservar" (solo se
+  agregan los días/alumnos que no tenían registro).
+
+Uso:
+    python importar_asistencia.py lector_marzo.csv
+    python importar_asistencia.py papel_2025.csv --politica conservar
+"""
+
+import argparse
+import csv
+import unicodedata
+from collections import defaultdict
+from datetime import date, datetime
+
+import archivo_anual
+import bd
+
+DB_PATH = "asistencia_multiples_cursos.db"
+
+# Filas escritas por sentencia (todas en la misma transacción)
+FILAS_POR_LOTE = 50000
+
+POLITICAS = ("sobrescribir", "conservar")
+
+FORMATOS_FECHA = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+
+VALORES_PRESENTE = {
+    "1": 1, "p": 1, "presente": 1, "si": 1, "s": 1, "true": 1, "x": 1,
+    "0": 0, "a": 0, "ausente": 0, "no": 0, "n": 0, "false": 0, "": 0,
+}
+
+
+def normalizar(texto):
+    """Nombre en minúsculas, sin tildes ni espacios repetidos, para comparar nombres digitados a mano."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.casefold().split())
+
+
+def cargar_alumnos(conn):
+    """
+    Devuelve (cursos_por_alumno, por_nombre):
+    - cursos_por_alumno: {id_alumno: id_curso}
+    - por_nombre: {(nombre_normalizado, curso_normalizado): [id_alumno]} y además
+      {(nombre_normalizado, None): [id_alumno]} para buscar sin curso.
+    """
+    cursos_por_alumno = {}
+    por_nombre = defaultdict(list)
+    for id_alumno, nombre, id_curso, nombre_curso in conn.execute("""
+        SELECT al.id, al.nombre, al.id_curso, c.nombre
+        FROM alumnos al
+        LEFT JOIN cursos c ON c.id = al.id_curso
+    """):
+        cursos_por_alumno[id_alumno] = id_curso
+        por_nombre[(normalizar(nombre), normalizar(nombre_curso))].append(id_alumno)
+        por_nombre[(normalizar(nombre), None)].append(id_alumno)
+    return cursos_por_alumno, por_nombre
+
+
+def leer_fecha(texto):
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto.strip(), formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def validar_fila(fila, cursos_por_alumno, por_nombre, hoy):
+    """
+    Valida una fila del archivo. Devuelve ((id_alumno, fecha_iso, presente), None) si es válida
+    o (None, motivo) si se rechaza.
+    """
+    id_texto = (fila.get("id_alumno") or "").strip()
+    if id_texto:
+        try:
+            id_alumno = int(id_texto)
+        except ValueError:
+            return None, f"id_alumno inválido: {id_texto}"
+        if id_alumno not in cursos_por_alumno:
+            return None, f"No existe el alumno con id {id_alumno}"
+    else:
+        nombre = normalizar(fila.get("alumno"))
+        if not nombre:
+            return None, "Falta el alumno (columna id_alumno o alumno)"
+        curso = normalizar(fila.get("curso")) or None
+        candidatos = por_nombre.get((nombre, curso), [])
+        if not candidatos:
+            return None, f"No existe el alumno '{fila.get('alumno')}'" + (f" en el curso '{fila.get('curso')}'" if curso else "")
+        if len(candidatos) > 1:
+            return None, f"Hay {len(candidatos)} alumnos llamados '{fila.get('alumno')}'; indique id_alumno o curso"
+        id_alumno = candidatos[0]
+
+    fecha = leer_fecha(fila.get("fecha") or "")
+    if fecha is None:
+        return None, f"Fecha inválida: {fila.get('fecha')}"
+    if fecha.weekday() >= 5:
+        return None, f"{fecha.isoformat()} no es día hábil (sábado o domingo)"
+    if fecha > hoy:
+        return None, f"{fecha.isoformat()} es una fecha futura"
+    if archivo_anual.esta_archivado(fecha.year):
+        return None, f"El año {fecha.year} está archivado y es de solo lectura"
+
+    valor = (fila.get("presente") or "").strip().casefold()
+    if valor not in VALORES_PRESENTE:
+        return None, f"Valor de presente inválido: {fila.get('presente')}"
+
+    return (id_alumno, fecha.isoformat(), VALORES_PRESENTE[valor]), None
+
+
+def _escribir(cursor, registros, politica, dias_por_curso, tamano):
+    """Escribe todos los registros y registra los días importados, en la transacción abierta en cursor."""
+    escribir = bd.aplicar_upsert if politica == "sobrescribir" else bd.aplicar_nuevos
+    escritas = 0
+    for inicio in range(0, len(registros), tamano):
+        escritas += escribir(cursor, registros[inicio:inicio + tamano])
+    # Al final, para que con "conservar" los ausentes agregados no oculten filas posteriores del archivo
+    for id_curso, fechas in dias_por_curso.items():
+        bd.registrar_dias(cursor, id_curso, sorted(fechas))
+    return escritas
+
+
+def importar(ruta, politica="sobrescribir", db_path=DB_PATH, tamano=FILAS_POR_LOTE, ruta_rechazos=None):
+    """
+    Importa el archivo CSV de asistencia en una sola transacción. Devuelve un resumen con las filas leídas,
+    válidas, escritas (celdas nuevas o modificadas, en los dos almacenamientos), rechazadas y la ruta del
+    informe de rechazos (o None si no hubo). Si la escritura falla no se importa ninguna fila.
+    """
+    if politica not in POLITICAS:
+        raise ValueError(f"Política desconocida: {politica} (use {' o '.join(POLITICAS)})")
+    ruta_rechazos = ruta_rechazos or ruta + ".rechazos.csv"
+
+    resumen = {"leidas": 0, "validas": 0, "escritas": 0, "rechazadas": 0, "rechazos": None}
+    registros = []
+    dias_por_curso = defaultdict(set)
+    hoy = date.today()
+
+    conn = bd.conectar(db_path)
+    archivo_rechazos = None
+    try:
+        cursos_por_alumno, por_nombre = cargar_alumnos(conn)
+        with open(ruta, newline="", encoding="utf-8-sig") as f:
+            lector = csv.DictReader(f)
+            columnas = {c.strip() for c in (lector.fieldnames or [])}
+            if not {"fecha", "presente"} <= columnas or not columnas & {"id_alumno", "alumno"}:
+                raise ValueError("El archivo debe tener encabezado con las columnas fecha, presente e id_alumno o alumno.")
+
+            for fila in lector:
+                resumen["leidas"] += 1
+                fila = {(k or "").strip(): v for k, v in fila.items()}
+                registro, motivo = validar_fila(fila, cursos_por_alumno, por_nombre, hoy)
+                if registro is None:
+                    if archivo_rechazos is None:
+                        archivo_rechazos = open(ruta_rechazos, "w", newline="", encoding="utf-8")
+                        escritor_rechazos = csv.writer(archivo_rechazos)
+                        escritor_rechazos.writerow(["linea", "motivo"] + lector.fieldnames)
+                    escritor_rechazos.writerow([lector.line_num, motivo] + [fila.get((k or "").strip()) for k in lector.fieldnames])
+                    resumen["rechazadas"] += 1
+                    continue
+
+                registros.append(registro)
+                dias_por_curso[cursos_por_alumno[registro[0]]].add(registro[1])
+
+        dias_por_curso.pop(None, None)
+        resumen["validas"] = len(registros)
+        if registros:
+            resumen["escritas"] = bd.ejecutar_en_transaccion(conn, _escribir, registros, politica, dias_por_curso, tamano)
+    finally:
+        conn.close()
+        if archivo_rechazos is not None:
+            archivo_rechazos.close()
+            resumen["rechazos"] = ruta_rechazos
+    return resumen
+
+
+def describir(resumen):
+    """Texto breve con el resultado de una importación."""
+    texto = (f"{resumen['leidas']} filas leídas, {resumen['validas']} válidas, "
+             f"{resumen['escritas']} registros nuevos o modificados, {resumen['rechazadas']} rechazadas.")
+    if resumen["rechazos"]:
+        texto += f"\nDetalle de rechazos en {resumen['rechazos']}"
+    return texto
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa asistencia diaria desde un archivo CSV.")
+    parser.add_argument("archivo", help="CSV con columnas fecha, presente e id_alumno o alumno (y opcionalmente curso)")
+    parser.add_argument("--politica", choices=POLITICAS, default="sobrescribir",
+                        help="Qué hacer con registros ya existentes (por defecto sobrescribir)")
+    parser.add_argument("--lote", type=int, default=FILAS_POR_LOTE, help="Filas por sentencia")
+    parser.add_argument("--rechazos", help="Ruta del informe de filas rechazadas")
+    parser.add_argument("--db", default=DB_PATH, help="Ruta de la base de datos")
+    args = parser.parse_args()
+
+    print(describir(importar(args.archivo, args.politica, args.db, args.lote, args.rechazos)))
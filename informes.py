@@ -0,0 +1,422 @@
+"""
+Informes PDF de asistencia por curso (el formato de "Exportar PDF" del dashboard) y su regeneración incremental.
+- generar_pdf(): arma el informe de un curso, opcionalmente limitado a un período (desde/hasta).
+- generar_informes_mes(): genera los informes de cierre de mes de todos los cursos. Guarda en un manifiesto
+  el hash de los datos de entrada de cada (curso, período); al repetirse solo se regeneran los cursos cuyos
+  datos cambiaron. Los gráficos se guardan como imágenes con el mismo hash y se reutilizan.
+
+Uso:
+    python informes.py 2025-03                 # Informes de marzo 2025 de todos los cursos
+    python informes.py 2025-03 --curso 1roC    # Solo un curso
+    python informes.py 2025-03 --forzar        # Regenera aunque los datos no hayan cambiado
+    python informes.py 2025-S1                 # Informes del primer semestre 2025
+"""
+
+import argparse
+import calendar
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+from matplotlib.figure import Figure
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, HRFlowable, Image
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+
+import almacen_mensual
+import archivo_anual
+import bd
+
+DB_PATH = "asistencia_multiples_cursos.db"
+INFORMES_DIR = "informes"
+MANIFIESTO = "manifiesto.json"
+GRAFICOS_DIR = "graficos"
+
+# Umbrales de clasificación (días presentes)
+UMBRAL_REGULAR = 2  # Más de 2 asistencias
+UMBRAL_RIESGO = 1   # 1-2 asistencias
+
+# Meses de inicio y fin de cada semestre
+SEMESTRES = {1: (1, 6), 2: (7, 12)}
+
+# Cambiar al modificar el formato del informe, para que se regeneren todos
+VERSION_FORMATO = 1
+
+COLORES_ESTADO = {
+    "Regular": colors.lightgreen,
+    "Riesgo": colors.pink,
+    "No Asiste": colors.lightgrey,
+}
+
+
+def determinar_estado(dias_presentes, umbral_regular=UMBRAL_REGULAR, umbral_riesgo=UMBRAL_RIESGO):
+    """Determina el estado de asistencia del alumno según los umbrales. Devuelve (estado, color)."""
+    if dias_presentes == 0:
+        return "No Asiste", "#D3D3D3"
+    if dias_presentes > umbral_regular:
+        return "Regular", "#90EE90"
+    elif dias_presentes >= umbral_riesgo:
+        return "Riesgo", "#FFB6C1"
+    else:
+        return "No Asiste", "#D3D3D3"
+
+
+def periodo_mes(periodo):
+    """Convierte "YYYY-MM" en (desde, hasta) ISO del mes."""
+    anio, mes = (int(p) for p in periodo.split("-"))
+    return f"{anio:04d}-{mes:02d}-01", f"{anio:04d}-{mes:02d}-{calendar.monthrange(anio, mes)[1]:02d}"
+
+
+def periodo_semestre(anio, semestre):
+    """Devuelve (desde, hasta) ISO del semestre 1 o 2 del año."""
+    inicio, fin = SEMESTRES[int(semestre)]
+    return periodo_mes(f"{anio}-{inicio}")[0], periodo_mes(f"{anio}-{fin}")[1]
+
+
+def rango_periodo(periodo):
+    """Convierte "YYYY-MM" (mes) o "YYYY-S1" / "YYYY-S2" (semestre) en (desde, hasta) ISO."""
+    m = re.fullmatch(r"(\d{4})-[sS]([12])", periodo)
+    if m:
+        return periodo_semestre(int(m.group(1)), int(m.group(2)))
+    if not re.fullmatch(r"\d{4}-\d{1,2}", periodo):
+        raise ValueError(f"Período inválido: {periodo} (use YYYY-MM o YYYY-S1/YYYY-S2)")
+    return periodo_mes(periodo)
+
+
+def detalle_informe(conn, id_curso, tabla="asistencia", desde=None, hasta=None):
+    """
+    Devuelve [(nombre, dias_presentes, dias_totales, ultima_asistencia)] por alumno del curso,
+    ordenado por nombre, para la tabla de detalle del informe.
+    """
+    if tabla == "asistencia" and almacen_mensual.en_uso(conn):
+        return almacen_mensual.detalle_informe(conn, id_curso, desde, hasta)
+    periodo, parametros = bd.filtro_periodo("ast.fecha", desde, hasta)
+    return conn.execute(f"""
+        SELECT a.nombre,
+               COUNT(DISTINCT CASE WHEN ast.presente = 1 THEN ast.fecha END) as dias_presentes,
+               COUNT(DISTINCT ast.fecha) as dias_totales,
+               MAX(CASE WHEN ast.presente = 1 THEN ast.fecha END) as ultima_asistencia
+        FROM {bd.tabla_alumnos(tabla)} a
+        LEFT JOIN {tabla} ast ON a.id = ast.id_alumno{periodo}
+        WHERE a.id_curso = ?
+        GROUP BY a.id, a.nombre
+        ORDER BY a.nombre
+    """, parametros + [id_curso]).fetchall()
+
+
+def hash_datos(conn, id_curso, nombre_curso, tabla="asistencia", desde=None, hasta=None):
+    """
+    Hash de todo lo que aparece en el informe de un curso y período: nombre del curso, alumnos
+    y sus registros de asistencia. Se calcula recorriendo las filas, sin cargarlas todas en memoria.
+    """
+    h = hashlib.sha256(f"{VERSION_FORMATO}|{UMBRAL_REGULAR}|{UMBRAL_RIESGO}|{nombre_curso}|{desde}|{hasta}".encode())
+    alumnos = bd.tabla_alumnos(tabla)
+    for fila in conn.execute(f"SELECT id, nombre FROM {alumnos} WHERE id_curso = ? ORDER BY id", (id_curso,)):
+        h.update(repr(fila).encode())
+    periodo, parametros = bd.filtro_periodo("ast.fecha", desde, hasta)
+    for fila in conn.execute(f"""
+        SELECT ast.id_alumno, ast.fecha, ast.presente
+        FROM {tabla} ast
+        JOIN {alumnos} al ON al.id = ast.id_alumno
+        WHERE al.id_curso = ?{periodo}
+        ORDER BY ast.id_alumno, ast.fecha
+    """, [id_curso] + parametros):
+        h.update(repr(fila).encode())
+    return h.hexdigest()
+
+
+def crear_grafico(stats, destino):
+    """Guarda en destino (PNG) los gráficos de barras y pastel de las estadísticas generales."""
+    fig = Figure(figsize=(10, 4))
+    axs = fig.subplots(1, 2)
+
+    axs[0].bar(["Total Alumnos", "Días Registrados", "Asistencia Total"],
+               [stats["total_alumnos"], stats["dias_registrados"], stats["asistencia_total"]],
+               color=['#4CAF50', '#2196F3', '#FFC107'])
+    axs[0].set_title("Estadísticas de Asistencia")
+    axs[0].set_ylabel("Cantidad")
+
+    promedio = stats["promedio_asistencia"]
+    axs[1].pie([promedio, 100 - promedio], labels=["Asistencia", "Inasistencia"],
+               autopct='%1.1f%%', colors=['#4CAF50', '#F44336'])
+    axs[1].set_title("Promedio de Asistencia")
+
+    fig.savefig(destino, dpi=100, bbox_inches="tight")
+    return destino
+
+
+def generar_pdf(conn, tabla, id_curso, nombre_curso, destino, etiqueta="", desde=None, hasta=None, grafico=None):
+    """
+    Genera el informe PDF de un curso en destino. etiqueta se muestra junto al curso en el título
+    (año o período). grafico es la ruta de una imagen PNG a incluir tras las estadísticas, o None.
+    """
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Estilo para el membrete
+    header_style = ParagraphStyle(
+        'Header',
+        parent=styles['Heading1'],
+        fontSize=14,
+        alignment=1,  # Centrado
+        spaceAfter=5,
+        textColor=colors.HexColor('#1B4F72')  # Azul institucional
+    )
+
+    subheader_style = ParagraphStyle(
+        'SubHeader',
+        parent=styles['Normal'],
+        fontSize=12,
+        alignment=1,  # Centrado
+        spaceAfter=20,
+        textColor=colors.HexColor('#2874A6')  # Azul más claro
+    )
+
+    # Membrete
+    elements.append(Paragraph("CEIA Amigos del Padre Hurtado", header_style))
+    elements.append(Paragraph("La Serena", subheader_style))
+    elements.append(Paragraph("Reporte Asistencia - Inspectoría Jornada Noche", subheader_style))
+    elements.append(Spacer(1, 20))
+
+    # Línea divisoria
+    elements.append(HRFlowable(
+        width="100%",
+        thickness=1,
+        color=colors.HexColor('#1B4F72'),
+        spaceBefore=1,
+        spaceAfter=20
+    ))
+
+    # Título y fecha
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading2'],
+        fontSize=12,
+        spaceAfter=10,
+        alignment=1
+    )
+    titulo = f"Informe de Asistencia - {nombre_curso}" + (f" ({etiqueta})" if etiqueta else "")
+    elements.append(Paragraph(titulo, title_style))
+    elements.append(Paragraph(f"Fecha: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+                              ParagraphStyle('Date', parent=styles['Normal'], alignment=1)))
+    elements.append(Spacer(1, 20))
+
+    # Estadísticas generales
+    elements.append(Paragraph("Estadísticas Generales", styles["Heading2"]))
+    elements.append(Spacer(1, 10))
+
+    stats = bd.estadisticas_curso(conn, id_curso, tabla, desde, hasta)
+
+    # Tabla de estadísticas
+    stats_data = [
+        ["Estadística", "Valor"],
+        ["Total de Alumnos", str(stats["total_alumnos"])],
+        ["Días Registrados", str(stats["dias_registrados"])],
+        ["Total Asistencias", str(stats["asistencia_total"])],
+        ["Promedio Asistencia", f"{stats['promedio_asistencia']:.1f}%"]
+    ]
+
+    stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
+    stats_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('PADDING', (0, 0), (-1, -1), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('WORDWRAP', (0, 0), (-1, -1), True),
+    ]))
+    elements.append(stats_table)
+    elements.append(Spacer(1, 20))
+
+    if grafico:
+        elements.append(Image(grafico, width=7*inch, height=2.8*inch, kind="proportional"))
+        elements.append(Spacer(1, 20))
+
+    # Agregar leyenda después de las estadísticas generales
+    elements.append(Paragraph("Criterios de Clasificación:", styles["Heading3"]))
+    elements.append(Spacer(1, 10))
+
+    # Tabla de leyenda con criterios específicos
+    legend_data = [
+        ["Estado", "Criterio", "Descripción"],
+        ["Regular", ">2 asistencias", "Alumno asiste con regularidad"],
+        ["Riesgo", "1-2 asistencias", "Asistencia baja, requiere seguimiento"],
+        ["No Asiste", "0 asistencias", "Sin asistencias registradas"]
+    ]
+
+    legend_table = Table(legend_data, colWidths=[1.2*inch, 1.5*inch, 2.8*inch])
+    legend_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (-1, 1), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('PADDING', (0, 0), (-1, -1), 6),
+        ('BACKGROUND', (0, 1), (-1, 1), colors.lightgreen),
+        ('BACKGROUND', (0, 2), (-1, 2), colors.pink),
+        ('BACKGROUND', (0, 3), (-1, 3), colors.lightgrey),
+        ('WORDWRAP', (0, 0), (-1, -1), True),
+    ]))
+    elements.append(legend_table)
+    elements.append(Spacer(1, 20))
+
+    # Detalle por alumno
+    elements.append(Paragraph("Detalle por Alumno", styles["Heading2"]))
+    elements.append(Spacer(1, 10))
+
+    alumnos_data = [["#", "Alumno", "Días\nPresente", "Días\nTotales", "%\nAsistencia", "Última\nAsistencia", "Estado"]]
+    row_colors = [(('BACKGROUND', (0, 0), (-1, 0), colors.grey))]  # Color para el encabezado
+
+    for idx, row in enumerate(detalle_informe(conn, id_curso, tabla, desde, hasta), 1):
+        nombre, dias_presentes, dias_totales, ultima_asistencia = row
+        dias_presentes = dias_presentes or 0
+        dias_totales = dias_totales or 0
+
+        porcentaje = (dias_presentes / dias_totales * 100) if dias_totales > 0 else 0
+
+        # Determinar estado basado en asistencia
+        estado, _ = determinar_estado(dias_presentes)
+
+        alumnos_data.append([
+            str(idx),
+            Paragraph(nombre, styles['Normal']),
+            str(dias_presentes),
+            str(dias_totales),
+            f"{porcentaje:.1f}%",
+            ultima_asistencia if ultima_asistencia else "Sin registros",
+            estado
+        ])
+        row_colors.append(('BACKGROUND', (0, idx), (-1, idx), COLORES_ESTADO[estado]))
+
+    # Ajustar anchos de columna y crear tabla
+    alumnos_table = Table(alumnos_data, colWidths=[0.5*inch, 2.5*inch, 0.8*inch, 0.8*inch, 0.8*inch, 1.3*inch, 0.8*inch])
+
+    style = TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('PADDING', (0, 0), (-1, -1), 6),
+        ('WORDWRAP', (0, 0), (-1, -1), True),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ] + row_colors)
+
+    alumnos_table.setStyle(style)
+    elements.append(alumnos_table)
+
+    # Generar PDF
+    doc.build(elements)
+    return destino
+
+
+def leer_manifiesto(directorio=INFORMES_DIR):
+    """Devuelve {clave: {"hash", "archivo", "generado"}} con los informes ya generados."""
+    ruta = os.path.join(directorio, MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_manifiesto(manifiesto, directorio=INFORMES_DIR):
+    """Escribe el manifiesto de forma atómica (temporal y renombrado)."""
+    ruta = os.path.join(directorio, MANIFIESTO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def nombre_archivo(texto):
+    """Nombre de archivo seguro a partir del nombre de un curso."""
+    return re.sub(r"[^\w.-]+", "_", texto).strip("_") or "curso"
+
+
+def grafico_en_cache(conn, tabla, id_curso, hash_curso, desde, hasta, directorio=INFORMES_DIR):
+    """Devuelve la imagen del gráfico para ese hash, creándola solo si no existe."""
+    carpeta = os.path.join(directorio, GRAFICOS_DIR)
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"{hash_curso}.png")
+    if not os.path.exists(ruta):
+        crear_grafico(bd.estadisticas_curso(conn, id_curso, tabla, desde, hasta), ruta)
+    return ruta
+
+
+def limpiar_graficos(manifiesto, directorio=INFORMES_DIR):
+    """Elimina las imágenes de gráficos que ya no corresponden a ningún informe del manifiesto."""
+    carpeta = os.path.join(directorio, GRAFICOS_DIR)
+    vigentes = {f"{entrada['hash']}.png" for entrada in manifiesto.values()}
+    for nombre in os.listdir(carpeta) if os.path.isdir(carpeta) else []:
+        if nombre not in vigentes:
+            os.remove(os.path.join(carpeta, nombre))
+
+
+def generar_informes_mes(periodo, cursos=None, forzar=False, db_path=DB_PATH, directorio=INFORMES_DIR):
+    """
+    Genera los informes del mes "YYYY-MM" (o del semestre "YYYY-S1"/"YYYY-S2") de los cursos indicados por nombre (todos si cursos es None)
+    en directorio/<periodo>/. Los cursos cuyos datos no cambiaron desde la última vez se omiten.
+    Devuelve (generados, omitidos) como listas de rutas.
+    """
+    desde, hasta = rango_periodo(periodo)
+    anio = int(periodo[:4])
+    if archivo_anual.esta_archivado(anio):
+        conn, tabla = archivo_anual.conectar([anio], db_path=db_path), archivo_anual.tabla_asistencia(anio)
+    else:
+        conn, tabla = bd.conectar(db_path), archivo_anual.tabla_asistencia()
+
+    carpeta = os.path.join(directorio, periodo)
+    os.makedirs(carpeta, exist_ok=True)
+    manifiesto = leer_manifiesto(directorio)
+    generados, omitidos = [], []
+    try:
+        for id_curso, nombre_curso in bd.listar_cursos(conn):
+            if cursos is not None and nombre_curso not in cursos:
+                continue
+            clave = f"{id_curso}|{periodo}"
+            destino = os.path.join(carpeta, f"{nombre_archivo(nombre_curso)}.pdf")
+            hash_curso = hash_datos(conn, id_curso, nombre_curso, tabla, desde, hasta)
+
+            anterior = manifiesto.get(clave)
+            if not forzar and anterior and anterior["hash"] == hash_curso and os.path.exists(anterior["archivo"]):
+                omitidos.append(anterior["archivo"])
+                continue
+
+            grafico = grafico_en_cache(conn, tabla, id_curso, hash_curso, desde, hasta, directorio)
+            generar_pdf(conn, tabla, id_curso, nombre_curso, destino, etiqueta=periodo,
+                        desde=desde, hasta=hasta, grafico=grafico)
+            manifiesto[clave] = {
+                "hash": hash_curso,
+                "archivo": destino,
+                "generado": datetime.now().isoformat(timespec="seconds"),
+            }
+            # Se guarda tras cada curso para no perder el avance si el proceso se interrumpe
+            guardar_manifiesto(manifiesto, directorio)
+            generados.append(destino)
+    finally:
+        conn.close()
+    limpiar_graficos(manifiesto, directorio)
+    return generados, omitidos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los informes PDF de cierre de mes o semestre de cada curso.")
+    parser.add_argument("periodo", help="Mes a informar, YYYY-MM, o semestre, YYYY-S1 / YYYY-S2")
+    parser.add_argument("--curso", action="append", help="Nombre del curso (puede repetirse); por defecto todos")
+    parser.add_argument("--forzar", action="store_true", help="Regenera aunque los datos no hayan cambiado")
+    parser.add_argument("--dir", default=INFORMES_DIR, help="Carpeta de salida")
+    parser.add_argument("--db", default=DB_PATH, help="Ruta de la base de datos")
+    args = parser.parse_args()
+
+    generados, omitidos = generar_informes_mes(args.periodo, args.curso, args.forzar, args.db, args.dir)
+    for ruta in generados:
+        print(f"Generado: {ruta}")
+    print(f"{len(generados)} informes generados, {len(omitidos)} sin cambios.")
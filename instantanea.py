@@ -0,0 +1,135 @@
+"""
+Instantánea en memoria de la base de asistencia para sesiones de consulta (dashboard).
+- Copia la base a una base SQLite en memoria con la API de respaldo (Connection.backup); las consultas
+  de estadísticas, detalle e informes se hacen sobre la copia, sin competir con los guardados de los
+  docentes por la base compartida.
+- La copia es una base en memoria con caché compartida: cada conectar() abre una conexión nueva a la
+  misma copia, que se puede cerrar como cualquier otra; la copia vive mientras exista la instantánea.
+- Tras cada copia se crean en ella índices de resumen (cubren los agregados por alumno y fecha). ANALYZE se
+  ejecuta solo en la primera copia; las siguientes reciben las mismas estadísticas del planificador.
+- sincronizar() vuelve a copiar la base solo si PRAGMA data_version indica que otra conexión la modificó, a lo
+  sumo una vez cada INTERVALO_MINIMO_S segundos. La copia se hace en un hilo aparte sobre una base en memoria
+  nueva, que reemplaza a la anterior (con otra uri) cuando está lista: quien llama no se bloquea.
+"""
+
+import itertools
+import sqlite3
+import threading
+import time
+
+import almacen_mensual
+import bd
+
+DB_PATH = "asistencia_multiples_cursos.db"
+
+# Tiempo mínimo entre el inicio de dos copias (s): con guardados frecuentes no se copia en cada sondeo
+INTERVALO_MINIMO_S = 30
+
+_contador = itertools.count(1)
+
+
+class Instantanea:
+    """Copia en memoria de db_path que se resincroniza en segundo plano cuando la base cambia."""
+
+    def __init__(self, db_path=DB_PATH, intervalo_minimo=INTERVALO_MINIMO_S):
+        self.db_path = db_path
+        self.intervalo_minimo = intervalo_minimo
+        self.origen = bd.conectar(db_path)
+        self.estadisticas = None
+        self.hilo = None
+        # La primera copia se hace en el momento: las consultas la necesitan desde el inicio
+        self.inicio_copia = time.monotonic()
+        self.version = bd.data_version(self.origen)
+        self.uri, self.conn = self.copiar(self.db_path)
+
+    def conectar(self):
+        """Abre una conexión a la copia en memoria vigente (con las funciones y ajustes de bd.conectar)."""
+        return bd.configurar(sqlite3.connect(self.uri, uri=True))
+
+    def copiar(self, db_path):
+        """
+        Copia la base a una base en memoria nueva y la deja lista para consultar.
+        Devuelve (uri, conexión que la mantiene viva). Puede ejecutarse en otro hilo.
+        """
+        # Nombre único por copia: dos copias (o dos instantáneas) del mismo proceso no se comparten
+        uri = f"file:instantanea_{next(_contador)}?mode=memory&cache=shared"
+        # La conexión se crea en el hilo de la copia y después se usa desde el hilo principal
+        conn = bd.configurar(sqlite3.connect(uri, uri=True, check_same_thread=False))
+        origen = bd.conectar(db_path)
+        try:
+            origen.backup(conn)
+            self.precalcular(conn)
+        except Exception:
+            conn.close()
+            raise
+        finally:
+            origen.close()
+        return uri, conn
+
+    def sincronizar(self, forzar=False):
+        """
+        Sin bloquear: si terminó una copia en segundo plano la pone en uso y devuelve True; si no, inicia una
+        nueva cuando la base cambió desde la última copia (o si forzar) y pasó el intervalo mínimo.
+        Devuelve False mientras no haya una copia nueva en uso. Los errores de la copia se lanzan aquí.
+        """
+        if self.hilo is not None:
+            if self.hilo.is_alive():
+                return False
+            return self.reemplazar()
+
+        version = bd.data_version(self.origen)
+        if not forzar and (version == self.version or time.monotonic() - self.inicio_copia < self.intervalo_minimo):
+            return False
+
+        def tarea():
+            try:
+                hilo.resultado = self.copiar(self.db_path)
+            except Exception as e:
+                hilo.error = e
+
+        hilo = threading.Thread(target=tarea, name="instantanea", daemon=True)
+        hilo.resultado = None
+        hilo.error = None
+        hilo.version = version
+        self.hilo = hilo
+        self.inicio_copia = time.monotonic()
+        hilo.start()
+        return False
+
+    def reemplazar(self):
+        """Pone en uso la copia terminada por el hilo y libera la anterior. Devuelve True si la reemplazó."""
+        hilo, self.hilo = self.hilo, None
+        if hilo.error:
+            raise hilo.error
+        anterior = self.conn
+        self.uri, self.conn = hilo.resultado
+        self.version = hilo.version
+        # La copia anterior se libera al cerrarse su última conexión (las consultas en curso la mantienen)
+        anterior.close()
+        return True
+
+    def precalcular(self, conn):
+        """Índices de resumen y estadísticas del planificador en una copia."""
+        if not almacen_mensual.en_uso(conn):
+            # Totales y detalle por alumno se leen solo del índice, sin visitar las filas
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_instantanea_resumen ON asistencia (id_alumno, fecha, presente)")
+        if self.estadisticas is None:
+            conn.execute("ANALYZE")
+            self.estadisticas = conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1").fetchall()
+        else:
+            # Las estadísticas de la primera copia siguen sirviendo: se cargan sin volver a recorrer las tablas
+            conn.execute("ANALYZE sqlite_schema")
+            conn.execute("DELETE FROM sqlite_stat1")
+            conn.executemany("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)", self.estadisticas)
+            conn.execute("ANALYZE sqlite_schema")
+        conn.commit()
+
+    def cerrar(self):
+        """Cierra las conexiones; la copia en memoria se libera al cerrar la última."""
+        if self.hilo is not None:
+            self.hilo.join()
+            if self.hilo.resultado:
+                self.hilo.resultado[1].close()
+            self.hilo = None
+        self.origen.close()
+        self.conn.close()
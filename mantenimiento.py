@@ -0,0 +1,167 @@
+"""
+Mantenimiento periódico de la base de asistencia.
+- Depura la asistencia huérfana (de alumnos que ya no existen), que pueden dejar las ediciones hechas
+  fuera de la aplicación con las claves foráneas desactivadas, y sus entradas en el registro de cambios.
+- Ejecuta ANALYZE para que el planificador de consultas tenga estadísticas actualizadas de las tablas.
+- Recupera el espacio libre con auto_vacuum = INCREMENTAL: PRAGMA incremental_vacuum libera pocas páginas
+  por paso, cada paso en su propia transacción corta, de modo que las estaciones pueden seguir guardando.
+- Activar el modo incremental en una base existente requiere un VACUUM completo, que bloquea la base
+  mientras dura: se hace una sola vez y a mano (--activar-vacuum), fuera del horario de clases.
+  Las bases nuevas ya se crean en modo incremental; el mantenimiento programado nunca lo activa.
+- Informa el espacio recuperado.
+
+Uso:
+    python mantenimiento.py                  # Depura, analiza y recupera el espacio libre
+    python mantenimiento.py --paginas 100    # Páginas liberadas por paso
+    python mantenimiento.py --activar-vacuum # Una sola vez, sin estaciones trabajando: VACUUM completo
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import almacen_mensual
+import bd
+
+DB_PATH = "asistencia_multiples_cursos.db"
+
+# Páginas liberadas por paso y pausa entre pasos (segundos): entre pasos otras estaciones pueden escribir
+PAGINAS_POR_PASO = 256
+PAUSA_ENTRE_PASOS = 0.01
+
+# Valor de PRAGMA auto_vacuum para el modo incremental
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def tamano_base(db_path=DB_PATH):
+    """Tamaño en bytes de la base y su archivo WAL."""
+    return sum(os.path.getsize(ruta) for ruta in (db_path, db_path + "-wal") if os.path.exists(ruta))
+
+
+def paginas_libres(conn):
+    """Cantidad de páginas libres (espacio sin uso dentro del archivo)."""
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _purgar_huerfanos(cursor):
+    tabla = "asistencia_mensual" if almacen_mensual.en_uso(cursor.connection) else "asistencia"
+    cursor.execute(f"DELETE FROM {tabla} WHERE id_alumno NOT IN (SELECT id FROM alumnos)")
+    borrados = cursor.rowcount
+    # Los dashboards ignoran los cambios de alumnos inexistentes (incluidos los que acaba de anotar el borrado)
+    cursor.execute("DELETE FROM cambios_asistencia WHERE id_alumno NOT IN (SELECT id FROM alumnos)")
+    return borrados
+
+
+def purgar_huerfanos(conn):
+    """Borra la asistencia de alumnos inexistentes. Devuelve la cantidad de filas borradas."""
+    return bd.ejecutar_en_transaccion(conn, _purgar_huerfanos)
+
+
+def activar_vacuum_incremental(conn):
+    """
+    Activa auto_vacuum = INCREMENTAL si la base aún no lo usa (requiere un VACUUM completo).
+    Devuelve True si hubo que activarlo.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    bd.con_reintentos(conn.execute, "VACUUM")
+    return True
+
+
+def _paso_vacuum(conn, paginas):
+    # Cada fila del resultado es una página liberada: hay que leerlas todas para completar el paso
+    conn.execute(f"PRAGMA incremental_vacuum({int(paginas)})").fetchall()
+
+
+def vacuum_incremental(conn, paginas=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS, progreso=None):
+    """
+    Libera las páginas libres de a 'paginas' por paso. progreso(restantes, total) se llama tras cada paso.
+    Devuelve la cantidad de páginas liberadas.
+    """
+    total = restantes = paginas_libres(conn)
+    while restantes > 0:
+        bd.con_reintentos(_paso_vacuum, conn, paginas)
+        anteriores, restantes = restantes, paginas_libres(conn)
+        if progreso:
+            progreso(restantes, total)
+        if restantes >= anteriores:
+            break  # No se pudo liberar más (por ejemplo, auto_vacuum no es incremental)
+        time.sleep(pausa)
+    return total - restantes
+
+
+def mantener(db_path=DB_PATH, paginas=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS, progreso=None,
+             activar_vacuum=False):
+    """
+    Ejecuta el mantenimiento y devuelve un resumen con las filas huérfanas borradas,
+    si se activó el modo incremental, las páginas liberadas y el tamaño antes y después (bytes).
+    Con activar_vacuum=True activa antes el modo incremental si hace falta (VACUUM completo).
+    """
+    conn = bd.conectar(db_path)
+    try:
+        bd.migrar(conn)
+        antes = tamano_base(db_path)
+        huerfanos = purgar_huerfanos(conn)
+        bd.con_reintentos(conn.execute, "ANALYZE")
+        activado = activar_vacuum and activar_vacuum_incremental(conn)
+        incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+        liberadas = vacuum_incremental(conn, paginas, pausa, progreso) if incremental else 0
+        # El archivo se achica al traspasar el WAL a la base
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        despues = tamano_base(db_path)
+    finally:
+        conn.close()
+    return {
+        "huerfanos": huerfanos,
+        "vacuum_activado": activado,
+        "vacuum_incremental": incremental,
+        "paginas_liberadas": liberadas,
+        "bytes_antes": antes,
+        "bytes_despues": despues,
+    }
+
+
+def mantener_en_segundo_plano(db_path=DB_PATH):
+    """
+    Lanza mantener en un hilo aparte y devuelve el hilo (sin activar el modo incremental:
+    en una base antigua solo se depura y analiza). El resultado queda en hilo.resultado
+    (resumen) o hilo.error (excepción).
+    """
+    def tarea():
+        try:
+            hilo.resultado = mantener(db_path)
+        except Exception as e:
+            hilo.error = e
+
+    hilo = threading.Thread(target=tarea, name="mantenimiento", daemon=True)
+    hilo.resultado = None
+    hilo.error = None
+    hilo.start()
+    return hilo
+
+
+def describir(resumen):
+    """Texto breve con el resultado del mantenimiento."""
+    recuperado = max(resumen["bytes_antes"] - resumen["bytes_despues"], 0)
+    texto = (f"{resumen['huerfanos']} registros huérfanos borrados, {resumen['paginas_liberadas']} páginas liberadas; "
+             f"{resumen['bytes_antes'] // 1024} KB -> {resumen['bytes_despues'] // 1024} KB "
+             f"({recuperado // 1024} KB recuperados).")
+    if resumen["vacuum_activado"]:
+        texto += "\nSe activó auto_vacuum incremental (VACUUM completo)."
+    elif not resumen["vacuum_incremental"]:
+        texto += "\nLa base no usa auto_vacuum incremental: ejecute una vez mantenimiento.py --activar-vacuum."
+    return texto
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Depura, analiza y recupera el espacio libre de la base.")
+    parser.add_argument("--paginas", type=int, default=PAGINAS_POR_PASO, help="Páginas liberadas por paso")
+    parser.add_argument("--pausa", type=float, default=PAUSA_ENTRE_PASOS, help="Pausa entre pasos (segundos)")
+    parser.add_argument("--db", default=DB_PATH, help="Ruta de la base de datos")
+    parser.add_argument("--activar-vacuum", action="store_true",
+                        help="Activa auto_vacuum incremental con un VACUUM completo (bloquea la base mientras dura)")
+    args = parser.parse_args()
+
+    print(describir(mantener(args.db, args.paginas, args.pausa, activar_vacuum=args.activar_vacuum)))
@@ -0,0 +1,59 @@
+"""
+Contadores de memoria de las aplicaciones Tk (grilla de asistencia y dashboard), para detectar fugas
+en sesiones largas.
+- Widgets vivos bajo la ventana principal (incluidas las ventanas emergentes).
+- Variables Tcl globales (cada IntVar/StringVar es una) y comandos Tcl (cada callback de Python
+  registrado en Tk: command=, bind, trace_add...).
+- Figuras de matplotlib abiertas en pyplot (si la aplicación usa matplotlib).
+- Memoria de Python asignada según tracemalloc, solo si está activo (python -X tracemalloc o
+  prueba_memoria.py); los contadores restantes no tienen costo mientras no se consultan.
+"""
+
+import sys
+import tracemalloc
+
+# Intervalo de actualización del contador en pantalla (ms)
+INTERVALO_CONTADOR_MS = 5000
+
+
+def contar_widgets(widget):
+    """Cantidad de widgets en el árbol de widget (incluido él mismo)."""
+    return 1 + sum(contar_widgets(hijo) for hijo in widget.winfo_children())
+
+
+def figuras_abiertas():
+    """Figuras abiertas en pyplot; 0 si la aplicación no importó matplotlib."""
+    plt = sys.modules.get("matplotlib.pyplot")
+    return len(plt.get_fignums()) if plt else 0
+
+
+def medir(root):
+    """Devuelve los contadores de la aplicación cuya ventana principal es root."""
+    tk = root.tk
+    medida = {
+        "widgets": contar_widgets(root),
+        "variables_tcl": len(tk.splitlist(tk.call("info", "globals"))),
+        "comandos_tcl": len(tk.splitlist(tk.call("info", "commands"))),
+        "figuras": figuras_abiertas(),
+    }
+    if tracemalloc.is_tracing():
+        medida["memoria_kb"] = tracemalloc.get_traced_memory()[0] // 1024
+    return medida
+
+
+def describir(medida):
+    """Texto breve con los contadores, para la barra de estado."""
+    texto = (f"Widgets: {medida['widgets']} | Variables Tcl: {medida['variables_tcl']} | "
+             f"Comandos Tcl: {medida['comandos_tcl']} | Figuras: {medida['figuras']}")
+    if "memoria_kb" in medida:
+        texto += f" | Memoria Python: {medida['memoria_kb']} KB"
+    return texto
+
+
+def mostrar_contador(root, label, intervalo=INTERVALO_CONTADOR_MS):
+    """Actualiza label con los contadores de root cada 'intervalo' ms mientras exista la ventana."""
+    def actualizar():
+        label.config(text=describir(medir(root)))
+        root.after(intervalo, actualizar)
+
+    actualizar()
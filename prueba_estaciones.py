@@ -0,0 +1,295 @@
+"""
+Prueba de carga con varias estaciones docentes guardando a la vez sobre la misma base (p. ej. 15 docentes a las 8:05).
+- Genera una base de prueba (cursos, alumnos y meses de asistencia) sin tocar la base real.
+- Lanza N procesos "estación": cada uno carga el mes de su curso como cargar_asistencia, cambia algunas
+  celdas y guarda como guardar_asistencia (versión por fila, transacción inmediata con reintentos).
+- Lanza además procesos "dashboard" que calculan estadísticas y detalle de cursos en paralelo.
+- Informa por configuración: operaciones por segundo, latencias (p50/p95/p99), tiempo esperando el
+  bloqueo de escritura, reintentos, fallos "database is locked" y conflictos de versión.
+
+Uso:
+    python prueba_estaciones.py                                   # 15 estaciones, WAL, 20 s
+    python prueba_estaciones.py --estaciones 5 15 30 --modo WAL DELETE --segundos 10
+"""
+
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import date
+
+import bd
+
+DIR_PRUEBA = os.path.join(tempfile.gettempdir(), "prueba_estaciones")
+
+# Tamaño de la base generada
+CURSOS = 15
+ALUMNOS_POR_CURSO = 35
+MESES_HISTORIA = 6
+
+# Flujo de cada estación: celdas que cambia antes de guardar y pausa máxima entre guardados (s)
+CELDAS_POR_GUARDADO = 10
+PAUSA_MAXIMA = 0.5
+
+
+def generar_base(ruta, cursos=CURSOS, alumnos_por_curso=ALUMNOS_POR_CURSO, meses=MESES_HISTORIA):
+    """Crea en ruta una base con cursos, alumnos y la asistencia de los últimos meses (días hábiles)."""
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    conn = bd.conectar(ruta)
+    bd.crear_esquema(conn)
+    hoy = date.today()
+    dias = []
+    for i in range(meses - 1, -1, -1):
+        anio, mes = divmod(hoy.year * 12 + hoy.month - 1 - i, 12)
+        dias += [d.isoformat() for d in bd.dias_laborales(anio, mes + 1) if d <= hoy]
+
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    for c in range(1, cursos + 1):
+        cursor.execute("INSERT INTO cursos (nombre) VALUES (?)", (f"Curso {c:02d}",))
+        id_curso = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO alumnos (nombre, id_curso) VALUES (?, ?)",
+            [(f"Alumno {a:02d} del curso {c:02d}", id_curso) for a in range(1, alumnos_por_curso + 1)],
+        )
+    registros = (
+        (id_alumno, dia, int(random.random() < 0.85))
+        for (id_alumno,) in conn.execute("SELECT id FROM alumnos").fetchall()
+        for dia in dias
+    )
+    bd.aplicar_upsert(cursor, registros)
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return ruta
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista ya ordenada."""
+    if not valores:
+        return 0.0
+    return valores[min(int(len(valores) * p / 100), len(valores) - 1)]
+
+
+def _configurar_proceso(config):
+    """Aplica en el proceso hijo el modo de diario y la espera por bloqueos de la configuración."""
+    bd.JOURNAL_MODE = config["modo"]
+    bd.BUSY_TIMEOUT_MS = config["busy_timeout"]
+
+
+def _transaccion_medida(conn, operacion, args, metricas):
+    """Como bd.ejecutar_en_transaccion, midiendo la espera por el bloqueo de escritura y los reintentos."""
+    intentos = 0
+
+    def intento():
+        nonlocal intentos
+        intentos += 1
+        cursor = conn.cursor()
+        inicio = time.perf_counter()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+        finally:
+            metricas["espera_bloqueo"].append(time.perf_counter() - inicio)
+        try:
+            resultado = operacion(cursor, *args)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return resultado
+
+    try:
+        return bd.con_reintentos(intento)
+    finally:
+        metricas["reintentos"] += intentos - 1
+
+
+def _guardar(cursor, celdas, id_curso, dias):
+    resultado = bd.aplicar_celdas(cursor, celdas)
+    bd.registrar_dias(cursor, id_curso, dias)
+    return resultado
+
+
+def estacion(ruta, id_curso, config, barrera, cola):
+    """Simula una estación docente: cargar el mes, marcar celdas y guardar, hasta agotar el tiempo."""
+    _configurar_proceso(config)
+    metricas = {"tipo": "estacion", "cargar": [], "guardar": [], "espera_bloqueo": [],
+                "reintentos": 0, "bloqueos": 0, "bloqueos_lectura": 0, "conflictos": 0, "celdas": 0}
+    conn = bd.conectar(ruta)
+    hoy = date.today()
+    dias = [d.isoformat() for d in bd.dias_laborales(hoy.year, hoy.month) if d <= hoy] or [hoy.isoformat()]
+    aleatorio = random.Random(id_curso * 1000 + os.getpid())
+    barrera.wait()
+    fin = time.perf_counter() + config["segundos"]
+    try:
+        while time.perf_counter() < fin:
+            # Cargar el mes (alumnos del curso y registros con su versión), como cargar_asistencia
+            inicio = time.perf_counter()
+            try:
+                alumnos = bd.listar_alumnos(conn, id_curso)
+                registros = bd.leer_mes(conn, id_curso, dias[0], dias[-1])
+            except sqlite3.OperationalError as e:
+                if not bd.es_bloqueo(e):
+                    raise
+                metricas["bloqueos_lectura"] += 1
+                continue
+            finally:
+                metricas["cargar"].append(time.perf_counter() - inicio)
+
+            # Cambiar algunas celdas y guardar solo esas, como guardar_asistencia
+            celdas = {}
+            for _ in range(config["celdas"]):
+                id_alumno = aleatorio.choice(alumnos)[0]
+                dia = aleatorio.choice(dias)
+                presente, version = registros.get((id_alumno, dia), (0, None))
+                celdas[(id_alumno, dia)] = (id_alumno, dia, 1 - presente, version)
+            dias_editados = sorted({dia for _, dia in celdas})
+
+            inicio = time.perf_counter()
+            try:
+                _, conflictos = _transaccion_medida(
+                    conn, _guardar, (list(celdas.values()), id_curso, dias_editados), metricas
+                )
+                metricas["conflictos"] += len(conflictos)
+                metricas["celdas"] += len(celdas) - len(conflictos)
+            except sqlite3.OperationalError as e:
+                if not bd.es_bloqueo(e):
+                    raise
+                metricas["bloqueos"] += 1
+            metricas["guardar"].append(time.perf_counter() - inicio)
+
+            time.sleep(aleatorio.uniform(0, config["pausa"]))
+    finally:
+        conn.close()
+        cola.put(metricas)
+
+
+def dashboard(ruta, config, barrera, cola):
+    """Simula un dashboard que recalcula estadísticas y detalle de cursos al azar mientras se guarda."""
+    _configurar_proceso(config)
+    metricas = {"tipo": "dashboard", "agregar": [], "bloqueos_lectura": 0}
+    conn = bd.conectar(ruta)
+    cursos = [id_curso for id_curso, _ in bd.listar_cursos(conn)]
+    aleatorio = random.Random(os.getpid())
+    barrera.wait()
+    fin = time.perf_counter() + config["segundos"]
+    try:
+        while time.perf_counter() < fin:
+            id_curso = aleatorio.choice(cursos)
+            inicio = time.perf_counter()
+            try:
+                bd.estadisticas_curso(conn, id_curso)
+                bd.detalle_alumnos(conn, id_curso).fetchall()
+            except sqlite3.OperationalError as e:
+                if not bd.es_bloqueo(e):
+                    raise
+                metricas["bloqueos_lectura"] += 1
+            metricas["agregar"].append(time.perf_counter() - inicio)
+            time.sleep(aleatorio.uniform(0, config["pausa"]))
+    finally:
+        conn.close()
+        cola.put(metricas)
+
+
+def ejecutar_configuracion(plantilla, config):
+    """Ejecuta una configuración sobre una copia de la base de prueba y devuelve las métricas agregadas."""
+    ruta = os.path.join(DIR_PRUEBA, f"prueba_{config['modo']}_{config['estaciones']}.db")
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+    shutil.copyfile(plantilla, ruta)
+    conn = sqlite3.connect(ruta)
+    conn.execute(f"PRAGMA journal_mode = {config['modo']}")
+    cursos = [id_curso for (id_curso,) in conn.execute("SELECT id FROM cursos ORDER BY id")]
+    conn.close()
+
+    ctx = mp.get_context("spawn")
+    total = config["estaciones"] + config["dashboards"]
+    barrera = ctx.Barrier(total)
+    cola = ctx.Queue()
+    procesos = [
+        ctx.Process(target=estacion, args=(ruta, cursos[i % len(cursos)], config, barrera, cola))
+        for i in range(config["estaciones"])
+    ] + [
+        ctx.Process(target=dashboard, args=(ruta, config, barrera, cola))
+        for _ in range(config["dashboards"])
+    ]
+    for p in procesos:
+        p.start()
+    resultados = [cola.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+
+    estaciones = [r for r in resultados if r["tipo"] == "estacion"]
+    dashboards = [r for r in resultados if r["tipo"] == "dashboard"]
+    cargar = sorted(itertools.chain.from_iterable(r["cargar"] for r in estaciones))
+    guardar = sorted(itertools.chain.from_iterable(r["guardar"] for r in estaciones))
+    espera = sorted(itertools.chain.from_iterable(r["espera_bloqueo"] for r in estaciones))
+    agregar = sorted(itertools.chain.from_iterable(r["agregar"] for r in dashboards))
+    segundos = config["segundos"]
+    return {
+        **config,
+        "guardados_s": len(guardar) / segundos,
+        "celdas_s": sum(r["celdas"] for r in estaciones) / segundos,
+        "cargas_s": len(cargar) / segundos,
+        "agregados_s": len(agregar) / segundos,
+        "cargar_ms": [percentil(cargar, p) * 1000 for p in (50, 95, 99)],
+        "guardar_ms": [percentil(guardar, p) * 1000 for p in (50, 95, 99)],
+        "agregar_ms": [percentil(agregar, p) * 1000 for p in (50, 95, 99)],
+        "espera_total_s": sum(espera),
+        "espera_p95_ms": percentil(espera, 95) * 1000,
+        "reintentos": sum(r["reintentos"] for r in estaciones),
+        "bloqueos": sum(r["bloqueos"] for r in estaciones),
+        "bloqueos_lectura": sum(r["bloqueos_lectura"] for r in resultados),
+        "conflictos": sum(r["conflictos"] for r in estaciones),
+    }
+
+
+def imprimir_resultado(r):
+    def ms(valores):
+        return "/".join(f"{v:.1f}" for v in valores)
+
+    print(f"\n== {r['estaciones']} estaciones, {r['dashboards']} dashboards, modo {r['modo']}, "
+          f"busy_timeout {r['busy_timeout']} ms, {r['segundos']} s ==")
+    print(f"  Guardados/s: {r['guardados_s']:.1f}   celdas/s: {r['celdas_s']:.1f}   "
+          f"cargas/s: {r['cargas_s']:.1f}   agregados/s: {r['agregados_s']:.1f}")
+    print(f"  Latencia p50/p95/p99 (ms)  cargar: {ms(r['cargar_ms'])}   guardar: {ms(r['guardar_ms'])}   "
+          f"dashboard: {ms(r['agregar_ms'])}")
+    print(f"  Espera por bloqueo: total {r['espera_total_s']:.2f} s, p95 {r['espera_p95_ms']:.1f} ms   "
+          f"reintentos: {r['reintentos']}")
+    print(f"  'database is locked': {r['bloqueos']} guardados fallidos tras reintentos, "
+          f"{r['bloqueos_lectura']} lecturas   conflictos de versión: {r['conflictos']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga con varias estaciones docentes simultáneas.")
+    parser.add_argument("--estaciones", type=int, nargs="+", default=[15], help="Cantidades de estaciones a probar")
+    parser.add_argument("--dashboards", type=int, default=2, help="Procesos de dashboard en paralelo")
+    parser.add_argument("--modo", nargs="+", default=[bd.JOURNAL_MODE], choices=["WAL", "DELETE"],
+                        help="Modos de diario a probar")
+    parser.add_argument("--busy-timeout", type=int, nargs="+", default=[bd.BUSY_TIMEOUT_MS],
+                        help="Valores de busy_timeout (ms) a probar")
+    parser.add_argument("--segundos", type=float, default=20, help="Duración de cada configuración")
+    parser.add_argument("--celdas", type=int, default=CELDAS_POR_GUARDADO, help="Celdas cambiadas por guardado")
+    parser.add_argument("--pausa", type=float, default=PAUSA_MAXIMA, help="Pausa máxima entre acciones (s)")
+    parser.add_argument("--cursos", type=int, default=CURSOS)
+    parser.add_argument("--alumnos", type=int, default=ALUMNOS_POR_CURSO, help="Alumnos por curso")
+    args = parser.parse_args()
+
+    os.makedirs(DIR_PRUEBA, exist_ok=True)
+    plantilla = generar_base(os.path.join(DIR_PRUEBA, "plantilla.db"), args.cursos, args.alumnos)
+    print(f"Base de prueba generada en {plantilla}")
+
+    for modo, busy_timeout, estaciones in itertools.product(args.modo, args.busy_timeout, args.estaciones):
+        config = {
+            "estaciones": estaciones, "dashboards": args.dashboards, "modo": modo,
+            "busy_timeout": busy_timeout, "segundos": args.segundos,
+            "celdas": args.celdas, "pausa": args.pausa,
+        }
+        imprimir_resultado(ejecutar_configuracion(plantilla, config))
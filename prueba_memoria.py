@@ -0,0 +1,241 @@
+"""
+Prueba de resistencia de memoria de la grilla (Asistencia2025.py) y del dashboard (dash01.py) en sesiones largas
+(p. ej. inspectoría con el dashboard abierto toda la jornada).
+- Genera una base de prueba (como prueba_estaciones.py) en un directorio aparte y trabaja allí: la base real,
+  los respaldos y los años archivados no se tocan.
+- Abre la aplicación con la ventana principal oculta (root.withdraw()). En un servidor sin pantalla se usa
+  una pantalla virtual: xvfb-run python prueba_memoria.py
+- Repite miles de ciclos de uso: en la grilla, cargar el mes de un curso, marcar celdas, deshacer, marcar un
+  día completo y guardar; en el dashboard, cargar un curso y período, recorrer el detalle, seleccionar un
+  alumno (gráfico y ventana de detalle) y refrescar tras cambios de otra estación.
+- Tras el calentamiento toma una medida de referencia (memoria.medir y una instantánea de tracemalloc) y
+  vuelve a medir cada cierto número de ciclos, siempre con la aplicación en el mismo estado.
+- Termina con código 1 si algún contador creció más que su presupuesto (PRESUPUESTOS) o la memoria de Python
+  más que PRESUPUESTO_MEMORIA_KB, y muestra las líneas de código que más memoria sumaron.
+
+Uso:
+    xvfb-run python prueba_memoria.py                              # Ambas aplicaciones, 2000 ciclos
+    python prueba_memoria.py --app grilla --ciclos 500 --muestras 100
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tkinter as tk
+import tracemalloc
+from datetime import date
+
+import bd
+import memoria
+import prueba_estaciones
+
+DB_PATH = "asistencia_multiples_cursos.db"
+DIR_PRUEBA = os.path.join(tempfile.gettempdir(), "prueba_memoria")
+
+# Tamaño de la base generada
+CURSOS = 8
+ALUMNOS_POR_CURSO = 35
+MESES_HISTORIA = 6
+
+# Ciclos de uso, ciclos de calentamiento antes de la referencia y ciclos entre medidas
+CICLOS = 2000
+CALENTAMIENTO = 50
+CICLOS_POR_MUESTRA = 200
+
+# Celdas que se marcan en cada ciclo de la grilla
+CELDAS_POR_CICLO = 5
+
+# Crecimiento permitido de cada contador entre la referencia y la última medida.
+# Los comandos Tcl admiten un margen por las tareas programadas con root.after pendientes al medir.
+PRESUPUESTOS = {"widgets": 0, "variables_tcl": 0, "comandos_tcl": 20, "figuras": 0}
+PRESUPUESTO_MEMORIA_KB = 2048
+
+# Líneas de código que se muestran cuando la memoria supera el presupuesto
+LINEAS_INFORMADAS = 15
+
+
+def meses_con_datos():
+    """(año, mes) de los meses de asistencia generados, del más antiguo al actual."""
+    hoy = date.today()
+    meses = []
+    for i in range(MESES_HISTORIA - 1, -1, -1):
+        anio, mes = divmod(hoy.year * 12 + hoy.month - 1 - i, 12)
+        meses.append((anio, mes + 1))
+    return meses
+
+
+def procesar_eventos(root):
+    """Procesa los eventos pendientes de Tk (dibujo, tareas de root.after vencidas)."""
+    root.update()
+
+
+def cerrar_emergentes(root):
+    """Cierra las ventanas emergentes abiertas, como haría el usuario con "Cerrar"."""
+    for widget in root.winfo_children():
+        if isinstance(widget, tk.Toplevel):
+            widget.destroy()
+
+
+def escenario_grilla(root, cursos, rng):
+    """Abre la grilla de asistencia y devuelve ciclo(i), que repite su uso con el curso y mes i-ésimos."""
+    import Asistencia2025
+
+    app = Asistencia2025.AsistenciaApp(root)
+    meses = meses_con_datos()
+
+    def ciclo(i):
+        anio, mes = meses[i % len(meses)]
+        app.curso_seleccionado.set(cursos[i % len(cursos)])
+        app.mes_seleccionado.set(mes)
+        app.anio_seleccionado.set(anio)
+        app.cargar_asistencia()
+
+        claves = list(app.asistencia_vars)
+        for clave in rng.sample(claves, min(CELDAS_POR_CICLO, len(claves))):
+            var_check = app.asistencia_vars[clave]
+            var_check.set(1 - var_check.get())
+        app.deshacer()
+        app.marcar_dia(rng.choice(app.dias_laborales), rng.randint(0, 1))
+        app.guardar_asistencia()
+        procesar_eventos(root)
+
+    return ciclo
+
+
+def escenario_dashboard(root, cursos, rng):
+    """Abre el dashboard y devuelve ciclo(i), que repite su uso con el curso i-ésimo."""
+    import dash01
+
+    app = dash01.DashboardApp(root)
+    conn = bd.conectar(DB_PATH)
+    ultimo_dia = conn.execute("SELECT MAX(fecha) FROM asistencia").fetchone()[0]
+
+    def ciclo(i):
+        app.curso_seleccionado.set(cursos[i % len(cursos)])
+        app.periodo_seleccionado.set(dash01.PERIODOS[i % 3])  # Todo, Mes y Semestre
+        app.actualizar_periodo()
+        app.cargar_estadisticas()
+        # Se insertan todos los bloques del detalle, como al recorrer la tabla hasta el final
+        while app.filas_pendientes is not None:
+            if app.id_carga_bloque:
+                root.after_cancel(app.id_carga_bloque)
+            app.insertar_bloque()
+
+        iid = rng.choice(app.items_tree)
+        app.tree.selection_set(iid)
+        app.on_tree_select(None)
+        cerrar_emergentes(root)
+
+        # Otra estación guarda la asistencia del alumno: el dashboard refresca su fila y su gráfico
+        bd.ejecutar_en_transaccion(conn, bd.marcar_rango_alumno, int(iid), ultimo_dia, ultimo_dia,
+                                  rng.randint(0, 1))
+        app.refrescar_cambios()
+        procesar_eventos(root)
+
+    return ciclo
+
+
+ESCENARIOS = {"grilla": escenario_grilla, "dashboard": escenario_dashboard}
+
+
+def medir(root, ciclo):
+    """Lleva la aplicación al estado de referencia (ciclo 0) y devuelve (contadores, instantánea de tracemalloc)."""
+    ciclo(0)
+    gc.collect()
+    return memoria.medir(root), tracemalloc.take_snapshot()
+
+
+def excedidos(referencia, medida):
+    """[(contador, crecimiento, presupuesto)] de los contadores que crecieron más que su presupuesto."""
+    fuera = [(nombre, medida[nombre] - referencia[nombre], presupuesto)
+             for nombre, presupuesto in PRESUPUESTOS.items()
+             if medida[nombre] - referencia[nombre] > presupuesto]
+    crecimiento = medida["memoria_kb"] - referencia["memoria_kb"]
+    if crecimiento > PRESUPUESTO_MEMORIA_KB:
+        fuera.append(("memoria_kb", crecimiento, PRESUPUESTO_MEMORIA_KB))
+    return fuera
+
+
+def mayores_crecimientos(instantanea_referencia, instantanea, cantidad=LINEAS_INFORMADAS):
+    """Líneas de código que más memoria sumaron entre las dos instantáneas de tracemalloc."""
+    filtros = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+    diferencias = instantanea.filter_traces(filtros).compare_to(
+        instantanea_referencia.filter_traces(filtros), "lineno")
+    return [d for d in diferencias if d.size_diff > 0][:cantidad]
+
+
+def ejecutar(app, cursos, ciclos=CICLOS, calentamiento=CALENTAMIENTO, ciclos_por_muestra=CICLOS_POR_MUESTRA,
+             semilla=0):
+    """
+    Ejecuta la prueba de una aplicación ("grilla" o "dashboard") e informa cada medida.
+    Devuelve [(contador, crecimiento, presupuesto)] con lo que superó su presupuesto.
+    """
+    rng = random.Random(semilla)
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        ciclo = ESCENARIOS[app](root, cursos, rng)
+        # El calentamiento recorre todos los cursos y meses: cachés y sentencias preparadas quedan llenas
+        for i in range(max(calentamiento, len(cursos) * MESES_HISTORIA)):
+            ciclo(i)
+        referencia, instantanea_referencia = medir(root, ciclo)
+
+        print(f"\n== {app}: {ciclos} ciclos ==")
+        print(f"{'ciclo':>6} {'widgets':>8} {'var. Tcl':>9} {'com. Tcl':>9} {'figuras':>8} {'memoria KB':>11} {'ms/ciclo':>9}")
+        print(f"{0:>6} {referencia['widgets']:>8} {referencia['variables_tcl']:>9} {referencia['comandos_tcl']:>9} "
+              f"{referencia['figuras']:>8} {referencia['memoria_kb']:>11}")
+        medida, instantanea = referencia, instantanea_referencia
+        inicio, desde = time.perf_counter(), 0
+        for i in range(1, ciclos + 1):
+            ciclo(i)
+            if i % ciclos_por_muestra == 0 or i == ciclos:
+                ms = (time.perf_counter() - inicio) * 1000 / (i - desde)
+                medida, instantanea = medir(root, ciclo)
+                print(f"{i:>6} {medida['widgets']:>8} {medida['variables_tcl']:>9} {medida['comandos_tcl']:>9} "
+                      f"{medida['figuras']:>8} {medida['memoria_kb']:>11} {ms:>9.1f}")
+                inicio, desde = time.perf_counter(), i
+
+        fuera = excedidos(referencia, medida)
+        if any(nombre == "memoria_kb" for nombre, _, _ in fuera):
+            print("\nLíneas con mayor crecimiento de memoria:")
+            for diferencia in mayores_crecimientos(instantanea_referencia, instantanea):
+                print(f"  {diferencia}")
+        return fuera
+    finally:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de resistencia de memoria de la grilla y el dashboard.")
+    parser.add_argument("--app", nargs="+", default=list(ESCENARIOS), choices=list(ESCENARIOS),
+                        help="Aplicaciones a probar")
+    parser.add_argument("--ciclos", type=int, default=CICLOS, help="Ciclos de uso medidos")
+    parser.add_argument("--calentamiento", type=int, default=CALENTAMIENTO, help="Ciclos antes de la medida de referencia")
+    parser.add_argument("--muestras", type=int, default=CICLOS_POR_MUESTRA, help="Ciclos entre medidas")
+    parser.add_argument("--cursos", type=int, default=CURSOS)
+    parser.add_argument("--alumnos", type=int, default=ALUMNOS_POR_CURSO, help="Alumnos por curso")
+    args = parser.parse_args()
+
+    # Las aplicaciones usan rutas relativas (base, respaldos, archivo): se trabaja en el directorio de prueba
+    os.makedirs(DIR_PRUEBA, exist_ok=True)
+    os.chdir(DIR_PRUEBA)
+    prueba_estaciones.generar_base(DB_PATH, args.cursos, args.alumnos, MESES_HISTORIA)
+    conn = bd.conectar(DB_PATH)
+    cursos = [nombre for _, nombre in bd.listar_cursos(conn)]
+    conn.close()
+
+    tracemalloc.start()
+    fallas = []
+    for app in args.app:
+        fallas += [(app,) + falla for falla in ejecutar(app, cursos, args.ciclos, args.calentamiento, args.muestras)]
+
+    if fallas:
+        print(f"\n{len(fallas)} contadores superaron su presupuesto de crecimiento:")
+        for app, nombre, crecimiento, presupuesto in fallas:
+            print(f"  [{app}] {nombre}: +{crecimiento} (presupuesto {presupuesto})")
+        sys.exit(1)
+    print("\nSin crecimiento por encima de los presupuestos.")
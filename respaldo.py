@@ -0,0 +1,229 @@
+"""
+Respaldo en línea de la base de datos de asistencia.
+- Usa la API de respaldo de SQLite (Connection.backup) copiando por pasos de pocas páginas,
+  de modo que los docentes pueden seguir guardando asistencia mientras se respalda.
+- Cada guardado de otra conexión hace que la copia por pasos vuelva a empezar; tras MAX_REINICIOS
+  reinicios se copia en un solo paso (la copia termina aunque se siga guardando).
+- Mantiene instantáneas rotativas en la carpeta respaldos/ junto a la base (las más antiguas se eliminan),
+  la misma para todas las estaciones que comparten la base.
+- Un archivo de bloqueo en esa carpeta impide que dos procesos respalden a la vez; el respaldo programado
+  además se omite si otra estación ya creó una instantánea dentro del intervalo.
+- Permite restaurar una instantánea sobre la base principal.
+
+Uso:
+    python respaldo.py respaldar            # Crea una instantánea nueva
+    python respaldo.py listar               # Lista las instantáneas disponibles
+    python respaldo.py restaurar ARCHIVO    # Restaura la instantánea indicada
+"""
+
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+DB_PATH = "asistencia_multiples_cursos.db"
+RESPALDO_DIR = "respaldos"
+
+# Cantidad de instantáneas que se conservan
+MAX_RESPALDOS = 10
+
+# Páginas copiadas por paso y pausa entre pasos (segundos): entre pasos otros procesos pueden escribir
+PAGINAS_POR_PASO = 256
+PAUSA_ENTRE_PASOS = 0.005
+
+# Reinicios de la copia por pasos (por guardados de otras conexiones) antes de copiar en un solo paso
+MAX_REINICIOS = 3
+
+# Archivo de bloqueo en la carpeta de respaldos y antigüedad (min) a partir de la cual se considera
+# abandonado (un proceso que terminó sin liberarlo)
+ARCHIVO_BLOQUEO = "respaldo.lock"
+BLOQUEO_VENCIDO_MIN = 60
+
+
+class RespaldoEnCurso(Exception):
+    """Otro proceso está respaldando la misma base."""
+
+
+class _CopiaReiniciada(Exception):
+    pass
+
+
+def respaldar(destino, db_path=DB_PATH, paginas=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS, progreso=None,
+              max_reinicios=MAX_REINICIOS):
+    """
+    Copia la base db_path en destino usando la API de respaldo por pasos.
+    Si la copia vuelve a empezar más de max_reinicios veces (otras conexiones guardan entre pasos),
+    se completa en un solo paso. La copia se escribe primero en un archivo temporal y luego se renombra,
+    así nunca queda un respaldo a medio escribir con el nombre definitivo.
+    """
+    temporal = destino + ".tmp"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+
+    reinicios = 0
+    restantes_anterior = None
+
+    def controlar_reinicios(estado, restantes, total):
+        nonlocal reinicios, restantes_anterior
+        if restantes_anterior is not None and restantes > restantes_anterior:
+            reinicios += 1
+            if reinicios > max_reinicios:
+                raise _CopiaReiniciada()
+        restantes_anterior = restantes
+        if progreso:
+            progreso(estado, restantes, total)
+
+    origen = sqlite3.connect(db_path)
+    copia = sqlite3.connect(temporal)
+    try:
+        try:
+            origen.backup(copia, pages=paginas, progress=controlar_reinicios, sleep=pausa)
+        except _CopiaReiniciada:
+            # Un solo paso mantiene la lectura hasta terminar: los guardados de otros no la reinician
+            origen.backup(copia, pages=-1)
+    finally:
+        copia.close()
+        origen.close()
+    os.replace(temporal, destino)
+    return destino
+
+
+def carpeta_respaldos(db_path=DB_PATH):
+    """Carpeta de instantáneas de una base: respaldos/ junto al archivo de la base."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), RESPALDO_DIR)
+
+
+def listar_respaldos(db_path=DB_PATH):
+    """Devuelve las instantáneas disponibles, de la más antigua a la más reciente."""
+    return sorted(glob.glob(os.path.join(carpeta_respaldos(db_path), "asistencia_*.db")))
+
+
+def rotar_respaldos(maximo=MAX_RESPALDOS, db_path=DB_PATH):
+    """Elimina las instantáneas más antiguas dejando solo las últimas 'maximo'."""
+    respaldos = listar_respaldos(db_path)
+    for ruta in respaldos[:max(len(respaldos) - maximo, 0)]:
+        os.remove(ruta)
+
+
+@contextmanager
+def bloqueo_respaldo(db_path=DB_PATH):
+    """
+    Toma el archivo de bloqueo de los respaldos de la base (creación exclusiva, válida también entre
+    estaciones que comparten la carpeta). Lanza RespaldoEnCurso si otro proceso lo tiene.
+    """
+    carpeta = carpeta_respaldos(db_path)
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, ARCHIVO_BLOQUEO)
+    try:
+        if time.time() - os.path.getmtime(ruta) > BLOQUEO_VENCIDO_MIN * 60:
+            os.remove(ruta)
+    except FileNotFoundError:
+        pass
+    try:
+        descriptor = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        raise RespaldoEnCurso("Otra estación está respaldando la base; intente en unos minutos.") from None
+    try:
+        os.write(descriptor, f"{os.getpid()} {datetime.now().isoformat(timespec='seconds')}".encode())
+        os.close(descriptor)
+        yield
+    finally:
+        os.remove(ruta)
+
+
+def _crear_instantanea(db_path, maximo):
+    nombre = f"asistencia_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+    destino = respaldar(os.path.join(carpeta_respaldos(db_path), nombre), db_path=db_path)
+    if maximo:
+        rotar_respaldos(maximo, db_path)
+    return destino
+
+
+def crear_instantanea(db_path=DB_PATH, maximo=MAX_RESPALDOS):
+    """Crea una instantánea con fecha y hora en la carpeta de respaldos y rota las antiguas."""
+    with bloqueo_respaldo(db_path):
+        return _crear_instantanea(db_path, maximo)
+
+
+def crear_instantanea_programada(intervalo_min, db_path=DB_PATH, maximo=MAX_RESPALDOS):
+    """
+    Respaldo automático de una estación: crea una instantánea solo si ningún otro proceso está respaldando
+    y la última instantánea tiene más de intervalo_min minutos. Devuelve la ruta creada o None si se omitió.
+    """
+    try:
+        with bloqueo_respaldo(db_path):
+            respaldos = listar_respaldos(db_path)
+            if respaldos and time.time() - os.path.getmtime(respaldos[-1]) < intervalo_min * 60:
+                return None
+            return _crear_instantanea(db_path, maximo)
+    except RespaldoEnCurso:
+        return None
+
+
+def crear_instantanea_en_segundo_plano(db_path=DB_PATH, maximo=MAX_RESPALDOS, intervalo_min=None):
+    """
+    Lanza crear_instantanea en un hilo aparte y devuelve el hilo; con intervalo_min, el respaldo
+    programado (crear_instantanea_programada).
+    El resultado queda en hilo.resultado (ruta creada, None si se omitió) o hilo.error (excepción).
+    """
+    def tarea():
+        try:
+            if intervalo_min is None:
+                hilo.resultado = crear_instantanea(db_path, maximo)
+            else:
+                hilo.resultado = crear_instantanea_programada(intervalo_min, db_path, maximo)
+        except Exception as e:
+            hilo.error = e
+
+    hilo = threading.Thread(target=tarea, name="respaldo", daemon=True)
+    hilo.resultado = None
+    hilo.error = None
+    hilo.start()
+    return hilo
+
+
+def restaurar(ruta_respaldo, db_path=DB_PATH):
+    """
+    Restaura una instantánea sobre la base principal.
+    Antes se verifica la integridad del respaldo y se guarda una instantánea del estado actual.
+    """
+    respaldo = sqlite3.connect(f"file:{os.path.abspath(ruta_respaldo)}?mode=ro", uri=True)
+    try:
+        resultado = respaldo.execute("PRAGMA integrity_check").fetchone()[0]
+        if resultado != "ok":
+            raise ValueError(f"El respaldo {ruta_respaldo} está dañado: {resultado}")
+
+        # Instantánea de seguridad del estado actual (sin rotar, para no perder la que se restaura)
+        if os.path.exists(db_path):
+            crear_instantanea(db_path, maximo=None)
+
+        destino = sqlite3.connect(db_path)
+        try:
+            respaldo.backup(destino)
+        finally:
+            destino.close()
+    finally:
+        respaldo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Respaldo y restauración de la base de asistencia.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("respaldar", help="Crea una instantánea nueva")
+    sub.add_parser("listar", help="Lista las instantáneas disponibles")
+    p_restaurar = sub.add_parser("restaurar", help="Restaura una instantánea")
+    p_restaurar.add_argument("archivo", help="Ruta de la instantánea a restaurar")
+    args = parser.parse_args()
+
+    if args.comando == "respaldar":
+        print(f"Respaldo creado: {crear_instantanea()}")
+    elif args.comando == "listar":
+        for ruta in listar_respaldos():
+            print(f"{ruta}  ({os.path.getsize(ruta) // 1024} KB)")
+    elif args.comando == "restaurar":
+        restaurar(args.archivo)
+        print(f"Base restaurada desde {args.archivo}")
@@ -0,0 +1,263 @@
+"""
+Control de regresiones en los planes de consulta de las aplicaciones.
+- Genera una base grande de prueba (como prueba_estaciones.py), sin tocar la base real.
+- Ejecuta las operaciones de las aplicaciones (grilla, guardado, dashboard, gráfico del alumno, informe PDF
+  y búsqueda) registrando con set_trace_callback cada sentencia SQL, ya con sus parámetros.
+- Para cada sentencia muestra su tiempo y ejecuta EXPLAIN QUERY PLAN; las escrituras se vuelven a ejecutar
+  dentro de una transacción que se deshace, para medirlas sin cambiar la base.
+- Falla si alguna sentencia recorre completa (SCAN) una de las tablas vigiladas (asistencia, alumnos,
+  asistencia_mensual) en vez de buscar por un índice, o si alguna función de bd.py o almacen_mensual.py que
+  ejecuta SQL no se llamó en las operaciones revisadas (hay que agregarla a operaciones()).
+- La revisión corre en las pruebas (test_planes.py, con los dos almacenamientos); este script la ejecuta
+  sobre una base más grande, con tiempos, y termina con código 1 si algo falla.
+
+Uso:
+    python -m pytest test_planes.py
+    python revisar_planes.py
+    python revisar_planes.py --almacen diario mensual --cursos 40 --alumnos 40
+    python revisar_planes.py --planes        # Muestra el plan de todas las sentencias, no solo las que fallan
+"""
+
+import argparse
+import inspect
+import os
+import re
+import sys
+import time
+from collections import Counter
+from datetime import date
+
+import almacen_mensual
+import bd
+import informes
+import prueba_estaciones
+
+DIR_PRUEBA = prueba_estaciones.DIR_PRUEBA
+
+# Tamaño de la base generada
+CURSOS = 30
+ALUMNOS_POR_CURSO = 40
+MESES_HISTORIA = 24
+
+# Ejecuciones de cada sentencia para medir su tiempo
+REPETICIONES = 5
+
+TABLAS_VIGILADAS = {"asistencia", "alumnos", "asistencia_mensual"}
+
+# Funciones con SQL que no son consultas de las aplicaciones: esquema, migraciones y cambio de almacenamiento
+SIN_REVISAR = {"crear_esquema", "migrar", "_agregar_cascada", "crear_triggers", "a_mensual", "a_diario", "en_uso"}
+
+# Palabras que pueden seguir al nombre de una tabla y no son un alias
+PALABRAS_SQL = {
+    "where", "on", "join", "left", "inner", "cross", "group", "order", "limit", "set", "values",
+    "select", "using", "natural", "union", "as", "default", "when", "then", "end",
+}
+
+
+def operaciones(id_curso, id_alumno, hoy):
+    """Devuelve [(nombre, operacion(conn))] con lo que hacen las aplicaciones sobre un curso y un alumno."""
+    desde, hasta = informes.periodo_mes(f"{hoy.year}-{hoy.month}")
+    semestre = informes.periodo_semestre(hoy.year, 1 if hoy.month <= informes.SEMESTRES[1][1] else 2)
+    dias = [d.isoformat() for d in bd.dias_laborales(hoy.year, hoy.month) if d <= hoy]
+
+    def guardar(conn):
+        # Como guardar_asistencia: celdas cargadas con su versión y una celda sin registro previo
+        registros = bd.leer_mes(conn, id_curso, desde, hasta)
+        presente, version = registros.get((id_alumno, dias[0]), (0, None))
+        celdas = [(id_alumno, dias[0], 1 - presente, version), (id_alumno, hasta, 1, None)]
+        return bd.guardar_celdas(conn, celdas, id_curso, dias[:1])
+
+    def masiva(operacion, afectada, *args):
+        # Como aplicar_masivo: la operación recibe las versiones cargadas de las celdas que cambia
+        def ejecutar(conn):
+            registros = bd.leer_mes(conn, id_curso, desde, hasta)
+            versiones = {clave: version for clave, (_, version) in registros.items() if afectada(*clave)}
+            return bd.ejecutar_en_transaccion(conn, operacion, *args, versiones)
+        return ejecutar
+
+    return [
+        ("grilla: cursos", lambda conn: bd.listar_cursos(conn)),
+        ("grilla: curso por nombre", lambda conn: bd.id_curso_por_nombre(conn, "Curso 01")),
+        ("grilla: alumnos del curso", lambda conn: bd.listar_alumnos(conn, id_curso)),
+        ("grilla: leer mes", lambda conn: bd.leer_mes(conn, id_curso, desde, hasta)),
+        ("grilla: guardar celdas", guardar),
+        ("grilla: marcar día",
+         masiva(bd.marcar_dia, lambda _, fecha: fecha == dias[-1], id_curso, dias[-1], 1)),
+        ("grilla: copiar día",
+         masiva(bd.copiar_dia, lambda _, fecha: fecha == dias[-1], id_curso, dias[0], dias[-1])),
+        ("grilla: marcar rango del alumno",
+         masiva(bd.marcar_rango_alumno, lambda alumno, _: alumno == id_alumno, id_alumno, dias[0], dias[-1], 0)),
+        ("servicio: guardar registros",
+         lambda conn: bd.ejecutar_en_transaccion(conn, bd.aplicar_upsert, [(id_alumno, dias[0], 1)])),
+        ("importación: solo registros nuevos",
+         lambda conn: bd.ejecutar_en_transaccion(conn, bd.aplicar_nuevos, [(id_alumno, hasta, 1)])),
+        ("dashboard: estadísticas", lambda conn: bd.estadisticas_curso(conn, id_curso)),
+        ("dashboard: estadísticas del mes", lambda conn: bd.estadisticas_curso(conn, id_curso, desde=desde, hasta=hasta)),
+        ("dashboard: detalle", lambda conn: bd.detalle_alumnos(conn, id_curso).fetchall()),
+        ("dashboard: detalle del semestre",
+         lambda conn: bd.detalle_alumnos(conn, id_curso, "asistencia", *semestre).fetchall()),
+        ("dashboard: cambios recientes",
+         lambda conn: bd.alumnos_cambiados(conn, id_curso, max(bd.ultimo_cambio(conn) - 100, 0))),
+        ("dashboard: refrescar alumnos",
+         lambda conn: bd.detalle_alumnos(conn, id_curso, ids=[id_alumno]).fetchall()),
+        ("dashboard: gráfico del alumno", lambda conn: bd.estadisticas_alumno(conn, id_alumno)),
+        ("dashboard: buscar alumno", lambda conn: bd.buscar_alumnos(conn, "alumno 01")),
+        ("informe PDF: detalle del mes", lambda conn: informes.detalle_informe(conn, id_curso, "asistencia", desde, hasta)),
+        ("informe PDF: hash de datos",
+         lambda conn: informes.hash_datos(conn, id_curso, "Curso", "asistencia", desde, hasta)),
+    ]
+
+
+def es_sentencia(sql):
+    """Indica si lo registrado por el trace es una consulta o escritura (no BEGIN, PRAGMA ni triggers)."""
+    return re.match(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", sql, re.IGNORECASE) is not None
+
+
+def forma(sql):
+    """Sentencia sin literales ni espacios repetidos, para agrupar las ejecuciones de executemany."""
+    sql = re.sub(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b", "?", sql)
+    return " ".join(sql.split())
+
+
+def alias_tablas(sql):
+    """{nombre o alias: tabla} de las tablas nombradas en FROM, JOIN, INTO y UPDATE."""
+    alias = {}
+    for tabla, nombre in re.findall(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+(?:main\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?",
+                                    sql, re.IGNORECASE):
+        alias[tabla] = tabla
+        if nombre and nombre.lower() not in PALABRAS_SQL:
+            alias[nombre] = tabla
+    return alias
+
+
+def tablas_recorridas(plan, alias):
+    """Tablas vigiladas que el plan recorre completas (SCAN), incluso con un índice que cubre la consulta."""
+    recorridas = set()
+    for _, _, _, detalle in plan:
+        m = re.match(r"SCAN (\w+)", detalle)
+        if m and alias.get(m.group(1), m.group(1)) in TABLAS_VIGILADAS:
+            recorridas.add(alias.get(m.group(1), m.group(1)))
+    return recorridas
+
+
+def funciones_sql(modulo):
+    """Nombres de las funciones de modulo que ejecutan SQL de las aplicaciones (revisar() debe llamarlas todas)."""
+    return {nombre for nombre, funcion in inspect.getmembers(modulo, inspect.isfunction)
+            if funcion.__module__ == modulo.__name__ and nombre not in SIN_REVISAR
+            and re.search(r"\b(SELECT|INSERT|UPDATE|DELETE)\b", inspect.getsource(funcion))}
+
+
+def sin_revisar(llamadas, almacen="diario"):
+    """Funciones con SQL del almacenamiento que no se llamaron en la revisión (llamadas: {(módulo, función)})."""
+    modulo = almacen_mensual if almacen == "mensual" else bd
+    return sorted(funciones_sql(modulo) - {nombre for nombre_modulo, nombre in llamadas
+                                           if nombre_modulo == modulo.__name__})
+
+
+def medir(conn, sql, repeticiones=REPETICIONES):
+    """Tiempo medio (s) de una sentencia; las escrituras se deshacen tras cada ejecución."""
+    escritura = re.search(r"\b(INSERT|UPDATE|DELETE)\b", sql, re.IGNORECASE) is not None
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        if escritura:
+            conn.execute("BEGIN")
+        conn.execute(sql).fetchall()
+        if escritura:
+            conn.rollback()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def revisar(ruta, almacen="diario", repeticiones=REPETICIONES, mostrar_planes=False):
+    """
+    Ejecuta las operaciones sobre la base de prueba en ruta e informa plan y tiempo de cada sentencia.
+    Devuelve (fallas, llamadas): fallas es [(operacion, sentencia, tablas_recorridas)] con las sentencias
+    que recorren tablas vigiladas; llamadas, {(módulo, función)} de bd y almacen_mensual ejecutadas.
+    """
+    conn = bd.conectar(ruta)
+    fallas = []
+    llamadas = set()
+    modulos = {os.path.abspath(m.__file__): m.__name__ for m in (bd, almacen_mensual)}
+
+    def registrar_llamada(frame, evento, _):
+        if evento == "call" and frame.f_code.co_filename in modulos:
+            llamadas.add((modulos[frame.f_code.co_filename], frame.f_code.co_name))
+
+    try:
+        if almacen == "mensual" and not almacen_mensual.en_uso(conn):
+            almacen_mensual.a_mensual(conn)
+        bd.migrar(conn)
+
+        # Las vistas (asistencia en el almacén mensual) aportan los alias de las tablas que leen
+        alias_vistas = {}
+        for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view'"):
+            alias_vistas.update(alias_tablas(sql))
+
+        id_curso = bd.listar_cursos(conn)[0][0]
+        id_alumno = bd.listar_alumnos(conn, id_curso)[0][0]
+        # Último día con asistencia: el mes en curso puede no tener días hábiles todavía
+        hoy = date.fromisoformat(conn.execute("SELECT MAX(fecha) FROM asistencia").fetchone()[0])
+        for nombre, operacion in operaciones(id_curso, id_alumno, hoy):
+            registradas = []
+            conn.set_trace_callback(registradas.append)
+            sys.setprofile(registrar_llamada)
+            inicio = time.perf_counter()
+            try:
+                operacion(conn)
+            finally:
+                sys.setprofile(None)
+                conn.set_trace_callback(None)
+            print(f"\n{nombre}: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+            ejecuciones = Counter()
+            primeras = {}
+            for sql in filter(es_sentencia, registradas):
+                ejecuciones[forma(sql)] += 1
+                primeras.setdefault(forma(sql), sql)
+            for clave, sql in primeras.items():
+                plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+                recorridas = tablas_recorridas(plan, {**alias_vistas, **alias_tablas(sql)})
+                ms = medir(conn, sql, repeticiones) * 1000
+                estado = "SCAN " + ", ".join(sorted(recorridas)) if recorridas else "ok"
+                print(f"  [{estado}] {ms:8.2f} ms  x{ejecuciones[clave]:<4} {clave[:110]}")
+                if recorridas or mostrar_planes:
+                    for _, _, _, detalle in plan:
+                        print(f"        {detalle}")
+                if recorridas:
+                    fallas.append((nombre, clave, recorridas))
+    finally:
+        conn.close()
+    return fallas, llamadas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Revisa los planes de consulta de las sentencias de las aplicaciones.")
+    parser.add_argument("--almacen", nargs="+", default=["diario"], choices=["diario", "mensual"],
+                        help="Almacenamientos de asistencia a revisar")
+    parser.add_argument("--cursos", type=int, default=CURSOS)
+    parser.add_argument("--alumnos", type=int, default=ALUMNOS_POR_CURSO, help="Alumnos por curso")
+    parser.add_argument("--meses", type=int, default=MESES_HISTORIA, help="Meses de asistencia generados")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES, help="Ejecuciones para medir cada sentencia")
+    parser.add_argument("--planes", action="store_true", help="Muestra el plan de todas las sentencias")
+    args = parser.parse_args()
+
+    os.makedirs(DIR_PRUEBA, exist_ok=True)
+    fallas, faltantes = [], []
+    for almacen in args.almacen:
+        ruta = os.path.join(DIR_PRUEBA, f"planes_{almacen}.db")
+        prueba_estaciones.generar_base(ruta, args.cursos, args.alumnos, args.meses)
+        print(f"\n== Almacenamiento {almacen}: base de prueba {ruta} ==")
+        fallas_almacen, llamadas = revisar(ruta, almacen, args.repeticiones, args.planes)
+        fallas += [(almacen,) + falla for falla in fallas_almacen]
+        faltantes += [(almacen, nombre) for nombre in sin_revisar(llamadas, almacen)]
+
+    if fallas:
+        print(f"\n{len(fallas)} sentencias recorren tablas completas:")
+        for almacen, nombre, sql, recorridas in fallas:
+            print(f"  [{almacen}] {nombre}: {', '.join(sorted(recorridas))}\n      {sql[:150]}")
+    if faltantes:
+        print(f"\n{len(faltantes)} funciones con SQL no se revisaron (agregarlas a operaciones()):")
+        for almacen, nombre in faltantes:
+            print(f"  [{almacen}] {nombre}")
+    if fallas or faltantes:
+        sys.exit(1)
+    print("\nTodas las sentencias usan índices sobre las tablas vigiladas.")
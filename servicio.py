@@ -0,0 +1,458 @@
+"""
+Servicio local HTTP/JSON de asistencia (opcional).
+Expone las mismas consultas que usan las aplicaciones de escritorio (módulo bd):
+    GET  /cursos                                    -> lista de cursos
+    GET  /cursos/<id>/alumnos                       -> alumnos del curso
+    GET  /cursos/<id>/asistencia?anio=2025&mes=3    -> grilla del mes (días, alumnos y registros con versión)
+    GET  /cursos/<id>/estadisticas                  -> estadísticas generales y detalle por alumno
+    POST /asistencia                                -> guarda registros en lote:
+         {"registros": [{"id_alumno": 1, "fecha": "2025-03-03", "presente": 1, "version": 2}, ...]}
+         Con "version" se detectan conflictos igual que en guardar_asistencia (null = la celda no existía);
+         sin "version" el registro se inserta o reemplaza.
+- Las peticiones se atienden con asyncio; las consultas corren en hilos sobre un pool acotado de conexiones.
+- Las escrituras que llegan casi juntas se agrupan en una sola transacción, con un savepoint por petición:
+  una petición inválida (p. ej. un alumno inexistente) falla sola, sin afectar a las demás del lote.
+- ClienteAsistencia permite a las aplicaciones de escritorio usar el servicio en lugar del archivo.
+
+Uso:
+    python servicio.py servir [--host 127.0.0.1] [--puerto 8765] [--db archivo.db]
+    python servicio.py carga [--url http://127.0.0.1:8765] [--peticiones 2000] [--concurrencia 20]
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+import bd
+
+DB_PATH = "asistencia_multiples_cursos.db"
+HOST = "127.0.0.1"
+PUERTO = 8765
+
+# Conexiones de lectura simultáneas
+TAMANO_POOL = 4
+
+# Registros máximos por transacción de escritura y espera para juntar peticiones (segundos)
+LOTE_MAX = 500
+ESPERA_LOTE = 0.005
+
+# Rango de los enteros de SQLite y de los años que admite la grilla (la última semana de diciembre del
+# año 9999 cae fuera de datetime.date)
+MAX_ENTERO = 2 ** 63 - 1
+ANIO_MIN, ANIO_MAX = 1, 9998
+
+RAZONES = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class ErrorHTTP(Exception):
+    """Error que se informa al cliente con un código HTTP."""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+class PoolConexiones:
+    """Pool acotado de conexiones SQLite; cada consulta corre en un hilo con una conexión libre."""
+
+    def __init__(self, db_path, tamano=TAMANO_POOL):
+        self.ejecutor = ThreadPoolExecutor(max_workers=tamano, thread_name_prefix="lectura")
+        self.libres = asyncio.Queue()
+        self.conexiones = [bd.conectar(db_path, check_same_thread=False) for _ in range(tamano)]
+        for conn in self.conexiones:
+            self.libres.put_nowait(conn)
+
+    async def ejecutar(self, funcion, *args):
+        """Ejecuta funcion(conn, *args) con una conexión del pool, esperando si no hay libres."""
+        conn = await self.libres.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.ejecutor, funcion, conn, *args)
+        finally:
+            self.libres.put_nowait(conn)
+
+    def cerrar(self):
+        self.ejecutor.shutdown(wait=True)
+        for conn in self.conexiones:
+            conn.close()
+
+
+class EscritorPorLotes:
+    """
+    Única conexión de escritura: junta los registros de varias peticiones
+    y los guarda en una sola transacción, respondiendo a cada petición por separado.
+    Cada petición se aplica dentro de su propio savepoint: si falla, se deshace solo esa petición.
+    """
+
+    def __init__(self, db_path):
+        self.conn = bd.conectar(db_path, check_same_thread=False)
+        self.ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escritura")
+        self.pendientes = asyncio.Queue()
+        self.tarea = None
+
+    def iniciar(self):
+        self.tarea = asyncio.create_task(self._procesar())
+
+    async def guardar(self, registros):
+        """Encola los registros de una petición y espera el resultado de su lote."""
+        futuro = asyncio.get_running_loop().create_future()
+        await self.pendientes.put((registros, futuro))
+        return await futuro
+
+    async def _procesar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self.pendientes.get()]
+            total = len(lote[0][0])
+            # Breve espera para juntar las peticiones que llegan casi al mismo tiempo
+            await asyncio.sleep(ESPERA_LOTE)
+            while total < LOTE_MAX and not self.pendientes.empty():
+                item = self.pendientes.get_nowait()
+                lote.append(item)
+                total += len(item[0])
+
+            peticiones = [registros for registros, _ in lote]
+            try:
+                resultados = await loop.run_in_executor(self.ejecutor, bd.con_reintentos, self._escribir, peticiones)
+            except Exception as e:
+                resultados = [e] * len(lote)
+            for (_, futuro), resultado in zip(lote, resultados):
+                # El cliente pudo desconectarse mientras se escribía el lote (futuro cancelado)
+                if futuro.done():
+                    continue
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+    def _escribir(self, peticiones):
+        """
+        Escribe el lote y devuelve, por petición, su resultado o la excepción que la hizo fallar.
+        Un bloqueo de la base deshace el lote completo, para que con_reintentos lo repita.
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            resultados = []
+            for registros in peticiones:
+                cursor.execute("SAVEPOINT peticion")
+                try:
+                    resultados.append(_escribir_peticion(cursor, registros))
+                except Exception as e:
+                    if bd.es_bloqueo(e):
+                        raise
+                    cursor.execute("ROLLBACK TO peticion")
+                    resultados.append(e)
+                cursor.execute("RELEASE peticion")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return resultados
+
+    def cerrar(self):
+        if self.tarea:
+            self.tarea.cancel()
+        self.ejecutor.shutdown(wait=True)
+        self.conn.close()
+
+
+def _escribir_peticion(cursor, registros):
+    """Aplica los registros de una petición dentro de la transacción abierta y devuelve su respuesta."""
+    ids = sorted({r["id_alumno"] for r in registros})
+    existentes = {id_alumno for (id_alumno,) in cursor.execute(
+        f"SELECT id FROM alumnos WHERE id IN ({', '.join('?' * len(ids))})", ids)} if ids else set()
+    faltantes = [id_alumno for id_alumno in ids if id_alumno not in existentes]
+    if faltantes:
+        raise ErrorHTTP(400, f"Alumnos inexistentes: {faltantes}")
+
+    con_version = [(r["id_alumno"], r["fecha"], r["presente"], r["version"]) for r in registros if "version" in r]
+    sin_version = [(r["id_alumno"], r["fecha"], r["presente"]) for r in registros if "version" not in r]
+    guardadas, conflictos = bd.aplicar_celdas(cursor, con_version)
+    bd.aplicar_upsert(cursor, sin_version)
+    return {
+        "guardadas": len(guardadas) + len(sin_version),
+        "versiones": [
+            {"id_alumno": id_alumno, "fecha": fecha, "version": version}
+            for (id_alumno, fecha), version in guardadas.items()
+        ],
+        "conflictos": [
+            {"id_alumno": id_alumno, "fecha": fecha, "presente": presente, "version": version}
+            for (id_alumno, fecha), (presente, version) in conflictos.items()
+        ],
+    }
+
+
+def _grilla_mes(conn, id_curso, anio, mes):
+    dias = bd.dias_laborales(anio, mes)
+    alumnos = bd.listar_alumnos(conn, id_curso)
+    registros = bd.leer_mes(conn, id_curso, dias[0].isoformat(), dias[-1].isoformat())
+    return {
+        "dias": [d.isoformat() for d in dias],
+        "alumnos": [{"id": id_alumno, "nombre": nombre} for id_alumno, nombre in alumnos],
+        "registros": [
+            {"id_alumno": id_alumno, "fecha": fecha, "presente": presente, "version": version}
+            for (id_alumno, fecha), (presente, version) in registros.items()
+        ],
+    }
+
+
+def _estadisticas(conn, id_curso):
+    datos = bd.estadisticas_curso(conn, id_curso)
+    datos["alumnos"] = [
+        {"id": id_alumno, "nombre": nombre, "dias_presentes": dias_presentes, "ultima_asistencia": ultima}
+        for id_alumno, nombre, dias_presentes, ultima in bd.detalle_alumnos(conn, id_curso)
+    ]
+    return datos
+
+
+def _entero(valor, minimo=-MAX_ENTERO - 1, maximo=MAX_ENTERO):
+    """Convierte valor a int y exige que esté en [minimo, maximo]; si no, ValueError."""
+    numero = int(valor)
+    if not minimo <= numero <= maximo:
+        raise ValueError(f"Fuera de rango: {numero}")
+    return numero
+
+
+def _validar_registros(datos):
+    """Valida el cuerpo de POST /asistencia y devuelve la lista de registros."""
+    registros = datos.get("registros") if isinstance(datos, dict) else None
+    if not isinstance(registros, list):
+        raise ErrorHTTP(400, "Se espera {\"registros\": [...]}")
+    for r in registros:
+        try:
+            if not isinstance(r, dict):
+                raise TypeError("Se espera un objeto")
+            r["id_alumno"] = _entero(r["id_alumno"])
+            r["fecha"] = date.fromisoformat(r["fecha"]).isoformat()
+            r["presente"] = 1 if int(r["presente"]) else 0
+            if "version" in r and r["version"] is not None:
+                r["version"] = _entero(r["version"])
+        except (KeyError, TypeError, ValueError, OverflowError):
+            raise ErrorHTTP(400, f"Registro inválido: {r}")
+    return registros
+
+
+class ServicioAsistencia:
+    """Servidor HTTP/1.1 mínimo sobre asyncio con conexiones persistentes (keep-alive)."""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.pool = None
+        self.escritor = None
+
+    async def despachar(self, metodo, destino, cuerpo):
+        partes = urlsplit(destino)
+        ruta = partes.path.rstrip("/")
+        params = parse_qs(partes.query)
+
+        if metodo == "GET" and ruta == "/cursos":
+            cursos = await self.pool.ejecutar(bd.listar_cursos)
+            return [{"id": id_curso, "nombre": nombre} for id_curso, nombre in cursos]
+
+        m = re.fullmatch(r"/cursos/(\d+)/(alumnos|asistencia|estadisticas)", ruta)
+        if metodo == "GET" and m:
+            try:
+                id_curso = _entero(m.group(1))
+            except ValueError:
+                raise ErrorHTTP(400, "Curso inválido")
+            recurso = m.group(2)
+            if recurso == "alumnos":
+                alumnos = await self.pool.ejecutar(bd.listar_alumnos, id_curso)
+                return [{"id": id_alumno, "nombre": nombre} for id_alumno, nombre in alumnos]
+            if recurso == "asistencia":
+                try:
+                    anio = int(params["anio"][0])
+                    mes = int(params["mes"][0])
+                except (KeyError, ValueError):
+                    raise ErrorHTTP(400, "Parámetros anio y mes requeridos")
+                if not 1 <= mes <= 12:
+                    raise ErrorHTTP(400, "Mes inválido")
+                if not ANIO_MIN <= anio <= ANIO_MAX:
+                    raise ErrorHTTP(400, f"Año inválido: debe estar entre {ANIO_MIN} y {ANIO_MAX}")
+                return await self.pool.ejecutar(_grilla_mes, id_curso, anio, mes)
+            return await self.pool.ejecutar(_estadisticas, id_curso)
+
+        if metodo == "POST" and ruta == "/asistencia":
+            try:
+                datos = json.loads(cuerpo or b"{}")
+            except ValueError:
+                raise ErrorHTTP(400, "JSON inválido")
+            return await self.escritor.guardar(_validar_registros(datos))
+
+        raise ErrorHTTP(404, f"Ruta no encontrada: {metodo} {partes.path}")
+
+    async def atender(self, reader, writer):
+        try:
+            while True:
+                linea = await reader.readline()
+                if not linea:
+                    break
+                metodo, destino, _ = linea.decode("latin-1").split(" ", 2)
+                encabezados = {}
+                while True:
+                    encabezado = await reader.readline()
+                    if encabezado in (b"\r\n", b"\n", b""):
+                        break
+                    clave, _, valor = encabezado.decode("latin-1").partition(":")
+                    encabezados[clave.strip().lower()] = valor.strip()
+                largo = int(encabezados.get("content-length", 0))
+                cuerpo = await reader.readexactly(largo) if largo else b""
+
+                try:
+                    estado, datos = 200, await self.despachar(metodo, destino, cuerpo)
+                except ErrorHTTP as e:
+                    estado, datos = e.estado, {"error": e.mensaje}
+                except Exception as e:
+                    estado, datos = 500, {"error": str(e)}
+
+                contenido = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+                cerrar = encabezados.get("connection", "").lower() == "close"
+                respuesta = (
+                    f"HTTP/1.1 {estado} {RAZONES[estado]}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(contenido)}\r\n"
+                    + ("Connection: close\r\n" if cerrar else "")
+                    + "\r\n"
+                )
+                writer.write(respuesta.encode("latin-1") + contenido)
+                await writer.drain()
+                if cerrar:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def servir(self, host=HOST, puerto=PUERTO):
+        self.pool = PoolConexiones(self.db_path)
+        self.escritor = EscritorPorLotes(self.db_path)
+        self.escritor.iniciar()
+        servidor = await asyncio.start_server(self.atender, host, puerto)
+        print(f"Servicio de asistencia en http://{host}:{puerto} (base: {self.db_path})")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            self.escritor.cerrar()
+            self.pool.cerrar()
+
+
+class ClienteAsistencia:
+    """Cliente del servicio para que las aplicaciones de escritorio lo usen en lugar del archivo."""
+
+    def __init__(self, url=f"http://{HOST}:{PUERTO}", timeout=10):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _pedir(self, metodo, ruta, datos=None):
+        cuerpo = json.dumps(datos).encode("utf-8") if datos is not None else None
+        peticion = urllib.request.Request(
+            self.url + ruta, data=cuerpo, method=metodo,
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            return json.loads(respuesta.read().decode("utf-8"))
+
+    def cursos(self):
+        return self._pedir("GET", "/cursos")
+
+    def alumnos(self, id_curso):
+        return self._pedir("GET", f"/cursos/{id_curso}/alumnos")
+
+    def asistencia_mes(self, id_curso, anio, mes):
+        return self._pedir("GET", f"/cursos/{id_curso}/asistencia?anio={anio}&mes={mes}")
+
+    def estadisticas(self, id_curso):
+        return self._pedir("GET", f"/cursos/{id_curso}/estadisticas")
+
+    def guardar(self, registros):
+        return self._pedir("POST", "/asistencia", {"registros": registros})
+
+
+async def _pedir_crudo(reader, writer, metodo, ruta, host):
+    writer.write(f"{metodo} {ruta} HTTP/1.1\r\nHost: {host}\r\nContent-Length: 0\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    estado = int((await reader.readline()).split()[1])
+    largo = 0
+    while True:
+        encabezado = await reader.readline()
+        if encabezado in (b"\r\n", b""):
+            break
+        if encabezado.lower().startswith(b"content-length:"):
+            largo = int(encabezado.split(b":")[1])
+    await reader.readexactly(largo)
+    return estado
+
+
+async def prueba_carga(url, peticiones, concurrencia):
+    """Lanza peticiones de lectura contra una instancia local y devuelve las métricas obtenidas."""
+    partes = urlsplit(url)
+    cliente = ClienteAsistencia(url)
+    cursos = await asyncio.to_thread(cliente.cursos)
+    hoy = date.today()
+    rutas = ["/cursos"]
+    for curso in cursos:
+        rutas.append(f"/cursos/{curso['id']}/asistencia?anio={hoy.year}&mes={hoy.month}")
+        rutas.append(f"/cursos/{curso['id']}/estadisticas")
+
+    latencias = []
+    errores = 0
+    restantes = iter(range(peticiones))
+
+    async def trabajador():
+        nonlocal errores
+        reader, writer = await asyncio.open_connection(partes.hostname, partes.port)
+        try:
+            for i in restantes:
+                inicio = time.perf_counter()
+                estado = await _pedir_crudo(reader, writer, "GET", rutas[i % len(rutas)], partes.netloc)
+                latencias.append(time.perf_counter() - inicio)
+                if estado != 200:
+                    errores += 1
+        finally:
+            writer.close()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "peticiones": len(latencias),
+        "errores": errores,
+        "segundos": duracion,
+        "por_segundo": len(latencias) / duracion if duracion else 0,
+        "p50_ms": latencias[len(latencias) // 2] * 1000 if latencias else 0,
+        "p95_ms": latencias[int(len(latencias) * 0.95)] * 1000 if latencias else 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio local HTTP/JSON de asistencia.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_servir = sub.add_parser("servir", help="Inicia el servicio")
+    p_servir.add_argument("--host", default=HOST)
+    p_servir.add_argument("--puerto", type=int, default=PUERTO)
+    p_servir.add_argument("--db", default=DB_PATH, help="Base de datos a servir")
+    p_carga = sub.add_parser("carga", help="Prueba de carga de lectura contra una instancia local")
+    p_carga.add_argument("--url", default=f"http://{HOST}:{PUERTO}")
+    p_carga.add_argument("--peticiones", type=int, default=2000)
+    p_carga.add_argument("--concurrencia", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.comando == "servir":
+        try:
+            asyncio.run(ServicioAsistencia(args.db).servir(args.host, args.puerto))
+        except KeyboardInterrupt:
+            pass
+    else:
+        m = asyncio.run(prueba_carga(args.url, args.peticiones, args.concurrencia))
+        print(f"{m['peticiones']} peticiones en {m['segundos']:.2f} s: {m['por_segundo']:.0f} pet/s, "
+              f"p50 {m['p50_ms']:.1f} ms, p95 {m['p95_ms']:.1f} ms, errores {m['errores']}")
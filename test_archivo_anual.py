@@ -0,0 +1,91 @@
+"""
+Pruebas de las consultas sobre años archivados (archivo_anual.py): usan los alumnos y cursos copiados
+al archivo, no los de la base principal, en los dos almacenamientos.
+
+Uso:
+    python -m pytest test_archivo_anual.py
+"""
+
+import csv
+import os
+import tempfile
+import unittest
+
+import almacen_mensual
+import archivo_anual
+import bd
+import exportar
+
+ANIO = 2024
+
+
+class ArchivoAnualTest(unittest.TestCase):
+    mensual = False
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.dir.name, "prueba.db")
+        self.archivo_dir = archivo_anual.ARCHIVO_DIR
+        archivo_anual.ARCHIVO_DIR = os.path.join(self.dir.name, "archivo")
+
+        conn = bd.conectar(self.db_path)
+        bd.crear_esquema(conn)
+        conn.executemany("INSERT INTO cursos (nombre) VALUES (?)", [("A",), ("B",)])
+        self.curso_a, self.curso_b = [fila[0] for fila in conn.execute("SELECT id FROM cursos ORDER BY nombre")]
+        conn.executemany("INSERT INTO alumnos (nombre, id_curso) VALUES (?, ?)",
+                         [("Ana", self.curso_a), ("Beto", self.curso_a)])
+        conn.commit()
+        self.ana, self.beto = [fila[0] for fila in conn.execute("SELECT id FROM alumnos ORDER BY nombre")]
+        bd.ejecutar_en_transaccion(conn, bd.aplicar_upsert, [
+            (self.ana, f"{ANIO}-03-04", 1), (self.beto, f"{ANIO}-03-04", 1), (self.beto, f"{ANIO}-03-05", 0),
+        ])
+        if self.mensual:
+            almacen_mensual.a_mensual(conn)
+        bd.migrar(conn)
+        conn.close()
+
+        archivo_anual.archivar_anio(ANIO, self.db_path)
+
+        # Tras el cambio de año: Ana pasa al curso B y Beto se retira
+        conn = bd.conectar(self.db_path)
+        conn.execute("UPDATE alumnos SET id_curso = ? WHERE id = ?", (self.curso_b, self.ana))
+        conn.execute("DELETE FROM alumnos WHERE id = ?", (self.beto,))
+        conn.commit()
+        conn.close()
+
+        self.conn = archivo_anual.conectar([ANIO], self.db_path)
+        self.tabla = archivo_anual.tabla_asistencia(ANIO)
+
+    def tearDown(self):
+        self.conn.close()
+        archivo_anual.ARCHIVO_DIR = self.archivo_dir
+        self.dir.cleanup()
+
+    def test_estadisticas_usan_los_alumnos_del_anio_archivado(self):
+        stats = bd.estadisticas_curso(self.conn, self.curso_a, self.tabla)
+        self.assertEqual(stats["total_alumnos"], 2)
+        self.assertEqual(stats["dias_registrados"], 2)
+        self.assertEqual(stats["asistencia_total"], 2)
+        self.assertEqual(bd.estadisticas_curso(self.conn, self.curso_b, self.tabla)["total_alumnos"], 0)
+
+    def test_detalle_y_mes_incluyen_alumnos_movidos_y_borrados(self):
+        detalle = bd.detalle_alumnos(self.conn, self.curso_a, self.tabla).fetchall()
+        self.assertEqual([(nombre, presentes) for _, nombre, presentes, _ in detalle], [("Ana", 1), ("Beto", 1)])
+        self.assertEqual(bd.listar_alumnos(self.conn, self.curso_a, self.tabla), [(self.ana, "Ana"), (self.beto, "Beto")])
+        registros = bd.leer_mes(self.conn, self.curso_a, f"{ANIO}-03-01", f"{ANIO}-03-31", self.tabla, con_version=False)
+        self.assertEqual(len(registros), 3)
+
+    def test_exportacion_conserva_el_curso_del_anio_archivado(self):
+        destino = os.path.join(self.dir.name, "exportacion.csv")
+        exportar.exportar(destino, db_path=self.db_path)
+        with open(destino, newline="", encoding="utf-8") as archivo:
+            filas = list(csv.DictReader(archivo))
+        self.assertEqual({(fila["alumno"], fila["curso"]) for fila in filas}, {("Ana", "A"), ("Beto", "A")})
+
+
+class ArchivoAnualMensualTest(ArchivoAnualTest):
+    mensual = True
+
+
+if __name__ == "__main__":
+    unittest.main()
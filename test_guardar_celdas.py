@@ -0,0 +1,133 @@
+"""
+Pruebas del control de conflictos de bd.guardar_celdas y de las operaciones masivas (versión por fila),
+en los dos almacenamientos.
+
+Uso:
+    python -m pytest test_guardar_celdas.py
+"""
+
+import os
+import tempfile
+import unittest
+
+import almacen_mensual
+import bd
+
+
+class GuardarCeldasTest(unittest.TestCase):
+    mensual = False
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.conn = bd.conectar(os.path.join(self.dir.name, "prueba.db"))
+        bd.crear_esquema(self.conn)
+        self.conn.execute("INSERT INTO cursos (nombre) VALUES ('Curso')")
+        self.id_curso = self.conn.execute("SELECT id FROM cursos").fetchone()[0]
+        self.conn.executemany("INSERT INTO alumnos (nombre, id_curso) VALUES (?, ?)",
+                              [("Ana", self.id_curso), ("Beto", self.id_curso)])
+        self.conn.commit()
+        self.ana, self.beto = [fila[0] for fila in self.conn.execute("SELECT id FROM alumnos ORDER BY nombre")]
+        bd.ejecutar_en_transaccion(self.conn, bd.aplicar_upsert, [
+            (self.ana, "2030-03-04", 1), (self.ana, "2030-03-05", 0), (self.beto, "2030-03-04", 0),
+        ])
+        if self.mensual:
+            almacen_mensual.a_mensual(self.conn)
+        bd.migrar(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.dir.cleanup()
+
+    def borrar_celda(self, id_alumno, fecha):
+        """Borra el registro de un día, como lo haría otra estación."""
+        if self.mensual:
+            anio, mes, bit = almacen_mensual.bit_dia(fecha)
+            self.conn.execute("""
+                UPDATE asistencia_mensual SET presentes = presentes & ~?1, registrados = registrados & ~?1
+                WHERE id_alumno = ?2 AND anio = ?3 AND mes = ?4
+            """, (bit, id_alumno, anio, mes))
+        else:
+            self.conn.execute("DELETE FROM asistencia WHERE id_alumno = ? AND fecha = ?", (id_alumno, fecha))
+        self.conn.commit()
+
+    def cargar(self):
+        return bd.leer_mes(self.conn, self.id_curso, "2030-03-01", "2030-03-31")
+
+    def test_fila_borrada_es_conflicto_y_no_impide_el_resto(self):
+        cargadas = self.cargar()
+        self.borrar_celda(self.ana, "2030-03-04")
+        guardadas, conflictos = bd.guardar_celdas(self.conn, [
+            (self.ana, "2030-03-04", 0, cargadas[(self.ana, "2030-03-04")][1]),
+            (self.beto, "2030-03-06", 1, None),
+        ])
+        self.assertEqual(conflictos, {(self.ana, "2030-03-04"): (None, None)})
+        self.assertIn((self.beto, "2030-03-06"), guardadas)
+        self.assertEqual(self.cargar()[(self.beto, "2030-03-06")][0], 1)
+
+    def test_alumno_borrado_es_conflicto_y_no_impide_el_resto(self):
+        cargadas = self.cargar()
+        self.conn.execute("DELETE FROM alumnos WHERE id = ?", (self.ana,))
+        self.conn.commit()
+        guardadas, conflictos = bd.guardar_celdas(self.conn, [
+            (self.ana, "2030-03-04", 0, cargadas[(self.ana, "2030-03-04")][1]),
+            (self.ana, "2030-03-06", 1, None),
+            (self.beto, "2030-03-06", 1, None),
+        ], self.id_curso, ["2030-03-06"])
+        self.assertEqual(conflictos, {(self.ana, "2030-03-04"): (None, None), (self.ana, "2030-03-06"): (None, None)})
+        self.assertEqual(self.cargar()[(self.beto, "2030-03-06")][0], 1)
+
+    def test_mismo_valor_guardado_por_otra_estacion_no_es_conflicto(self):
+        cargadas = self.cargar()
+        version = cargadas[(self.ana, "2030-03-05")][1]
+        bd.guardar_celdas(self.conn, [(self.ana, "2030-03-05", 1, version)])
+        guardadas, conflictos = bd.guardar_celdas(self.conn, [(self.ana, "2030-03-05", 1, version)])
+        self.assertEqual(conflictos, {})
+        self.assertIn((self.ana, "2030-03-05"), guardadas)
+
+    def test_valor_distinto_guardado_por_otra_estacion_es_conflicto(self):
+        cargadas = self.cargar()
+        version = cargadas[(self.ana, "2030-03-05")][1]
+        bd.guardar_celdas(self.conn, [(self.ana, "2030-03-05", 1, version)])
+        guardadas, conflictos = bd.guardar_celdas(self.conn, [(self.ana, "2030-03-05", 0, version)])
+        self.assertEqual(guardadas, {})
+        self.assertEqual(conflictos[(self.ana, "2030-03-05")][0], 1)
+        self.assertEqual(self.cargar()[(self.ana, "2030-03-05")][0], 1)
+
+    def test_marcar_dia_no_pisa_celdas_cambiadas_por_otra_estacion(self):
+        cargadas = self.cargar()
+        versiones = {clave: cargadas[clave][1] for clave in [(self.ana, "2030-03-04"), (self.beto, "2030-03-04")]}
+        bd.guardar_celdas(self.conn, [(self.beto, "2030-03-04", 1, versiones[(self.beto, "2030-03-04")])])
+        conflictos = bd.ejecutar_en_transaccion(self.conn, bd.marcar_dia, self.id_curso, "2030-03-04", 0, versiones)
+        self.assertEqual(list(conflictos), [(self.beto, "2030-03-04")])
+        actuales = self.cargar()
+        self.assertEqual(actuales[(self.ana, "2030-03-04")][0], 0)
+        self.assertEqual(actuales[(self.beto, "2030-03-04")][0], 1)
+
+    def test_copiar_dia_informa_fila_borrada(self):
+        cargadas = self.cargar()
+        self.borrar_celda(self.ana, "2030-03-05")
+        conflictos = bd.ejecutar_en_transaccion(self.conn, bd.copiar_dia, self.id_curso, "2030-03-04", "2030-03-05",
+                                                {(self.ana, "2030-03-05"): cargadas[(self.ana, "2030-03-05")][1]})
+        self.assertEqual(conflictos, {(self.ana, "2030-03-05"): (None, None)})
+        actuales = self.cargar()
+        self.assertNotIn((self.ana, "2030-03-05"), actuales)
+        self.assertEqual(actuales[(self.beto, "2030-03-05")][0], 0)
+
+    def test_marcar_rango_alumno_registra_los_dias_del_curso(self):
+        conflictos = bd.ejecutar_en_transaccion(self.conn, bd.marcar_rango_alumno, self.ana,
+                                                "2030-03-08", "2030-03-11", 1, {})
+        self.assertEqual(conflictos, {})
+        actuales = self.cargar()
+        # 2030-03-09 y 10 son sábado y domingo
+        self.assertEqual({fecha: presente for (id_alumno, fecha), (presente, _) in actuales.items()
+                          if id_alumno == self.ana and fecha >= "2030-03-08"}, {"2030-03-08": 1, "2030-03-11": 1})
+        self.assertEqual(actuales[(self.beto, "2030-03-08")][0], 0)
+        self.assertEqual(actuales[(self.beto, "2030-03-11")][0], 0)
+
+
+class GuardarCeldasMensualTest(GuardarCeldasTest):
+    mensual = True
+
+
+if __name__ == "__main__":
+    unittest.main()
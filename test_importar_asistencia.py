@@ -0,0 +1,101 @@
+"""
+Pruebas de importar_asistencia.py: la importación es atómica y cuenta celdas en los dos almacenamientos.
+
+Uso:
+    python -m pytest test_importar_asistencia.py
+"""
+
+import csv
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import almacen_mensual
+import bd
+import importar_asistencia
+
+
+class ImportarAsistenciaTest(unittest.TestCase):
+    mensual = False
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.dir.name, "prueba.db")
+        conn = bd.conectar(self.db_path)
+        bd.crear_esquema(conn)
+        conn.execute("INSERT INTO cursos (nombre) VALUES ('Curso')")
+        id_curso = conn.execute("SELECT id FROM cursos").fetchone()[0]
+        conn.executemany("INSERT INTO alumnos (nombre, id_curso) VALUES (?, ?)", [("Ana", id_curso), ("Beto", id_curso)])
+        conn.commit()
+        self.ana, self.beto = [fila[0] for fila in conn.execute("SELECT id FROM alumnos ORDER BY nombre")]
+        bd.ejecutar_en_transaccion(conn, bd.aplicar_upsert, [(self.ana, "2024-03-04", 1), (self.ana, "2024-03-05", 0)])
+        if self.mensual:
+            almacen_mensual.a_mensual(conn)
+        bd.migrar(conn)
+        conn.close()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def escribir_csv(self, filas):
+        ruta = os.path.join(self.dir.name, "importar.csv")
+        with open(ruta, "w", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(["id_alumno", "fecha", "presente"])
+            escritor.writerows(filas)
+        return ruta
+
+    def registros(self):
+        conn = bd.conectar(self.db_path)
+        try:
+            return dict(((id_alumno, fecha), presente) for id_alumno, fecha, presente
+                        in conn.execute("SELECT id_alumno, fecha, presente FROM asistencia"))
+        finally:
+            conn.close()
+
+    def test_escritas_cuenta_celdas(self):
+        ruta = self.escribir_csv([
+            (self.ana, "2024-03-04", 1),   # sin cambios
+            (self.ana, "2024-03-05", 1),   # modificada
+            (self.ana, "2024-03-06", 0),   # nueva
+            (self.beto, "2024-03-04", 1),  # nueva
+        ])
+        resumen = importar_asistencia.importar(ruta, db_path=self.db_path)
+        self.assertEqual((resumen["validas"], resumen["escritas"]), (4, 3))
+        self.assertEqual(self.registros()[(self.ana, "2024-03-05")], 1)
+
+    def test_conservar_cuenta_solo_celdas_nuevas(self):
+        ruta = self.escribir_csv([(self.ana, "2024-03-05", 1), (self.ana, "2024-03-06", 1)])
+        resumen = importar_asistencia.importar(ruta, "conservar", db_path=self.db_path)
+        self.assertEqual(resumen["escritas"], 1)
+        self.assertEqual(self.registros()[(self.ana, "2024-03-05")], 0)
+
+    def test_falla_en_un_lote_no_deja_lotes_anteriores(self):
+        conn = bd.conectar(self.db_path)
+        if self.mensual:
+            # El día 8 se agrega a la fila del mes que crearon los lotes anteriores
+            conn.execute("""
+                CREATE TRIGGER falla_importacion BEFORE UPDATE ON asistencia_mensual
+                WHEN NEW.registrados & (1 << 7) BEGIN SELECT RAISE(ABORT, 'falla simulada'); END
+            """)
+        else:
+            conn.execute("""
+                CREATE TRIGGER falla_importacion BEFORE INSERT ON asistencia WHEN NEW.fecha = '2024-03-08'
+                BEGIN SELECT RAISE(ABORT, 'falla simulada'); END
+            """)
+        conn.commit()
+        conn.close()
+        antes = self.registros()
+        ruta = self.escribir_csv([(self.beto, "2024-03-06", 1), (self.beto, "2024-03-07", 1), (self.beto, "2024-03-08", 1)])
+        with self.assertRaises(sqlite3.IntegrityError):
+            importar_asistencia.importar(ruta, db_path=self.db_path, tamano=1)
+        self.assertEqual(self.registros(), antes)
+
+
+class ImportarAsistenciaMensualTest(ImportarAsistenciaTest):
+    mensual = True
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Control de regresiones en los planes de consulta (revisar_planes.py) dentro de las pruebas, en los dos
+almacenamientos: ninguna sentencia de las aplicaciones recorre completa una tabla vigilada y todas las
+funciones de bd.py y almacen_mensual.py que ejecutan SQL pasan por la revisión.
+
+Uso:
+    python -m pytest test_planes.py
+"""
+
+import os
+import tempfile
+import unittest
+
+import bd
+import prueba_estaciones
+import revisar_planes
+
+# Base chica: los planes no dependen del tamaño (no hay estadísticas de ANALYZE en la base generada)
+CURSOS = 4
+ALUMNOS_POR_CURSO = 10
+MESES_HISTORIA = 2
+
+
+class PlanesTest(unittest.TestCase):
+    almacen = "diario"
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.ruta = prueba_estaciones.generar_base(os.path.join(self.dir.name, "planes.db"),
+                                                   CURSOS, ALUMNOS_POR_CURSO, MESES_HISTORIA)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def revisar(self):
+        return revisar_planes.revisar(self.ruta, self.almacen, repeticiones=1)
+
+    def test_sentencias_usan_indices(self):
+        fallas, _ = self.revisar()
+        self.assertEqual([(nombre, sql) for nombre, sql, _ in fallas], [])
+
+    def test_todas_las_funciones_con_sql_se_revisan(self):
+        _, llamadas = self.revisar()
+        self.assertEqual(revisar_planes.sin_revisar(llamadas, self.almacen), [])
+
+    def test_recorrido_completo_se_detecta(self):
+        # Sin índice sobre nombre, la consulta recorre alumnos completa
+        conn = bd.conectar(self.ruta)
+        try:
+            sql = "SELECT al.id FROM alumnos al WHERE al.nombre = 'Alumno 01 del curso 01'"
+            plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+        finally:
+            conn.close()
+        self.assertEqual(revisar_planes.tablas_recorridas(plan, revisar_planes.alias_tablas(sql)), {"alumnos"})
+
+
+class PlanesMensualTest(PlanesTest):
+    almacen = "mensual"
+
+
+if __name__ == "__main__":
+    unittest.main()
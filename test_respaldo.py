@@ -0,0 +1,63 @@
+"""
+Pruebas de respaldo.py: la copia termina aunque otra conexión guarde entre pasos, las instantáneas quedan
+junto a la base y un solo proceso respalda a la vez.
+
+Uso:
+    python -m pytest test_respaldo.py
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import respaldo
+
+
+class RespaldoTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.dir.name, "base", "prueba.db")
+        os.makedirs(os.path.dirname(self.db_path))
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("CREATE TABLE t (x)")
+        self.conn.executemany("INSERT INTO t VALUES (?)", [(os.urandom(500),) for _ in range(5000)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.dir.cleanup()
+
+    def test_copia_termina_aunque_otra_conexion_guarde_en_cada_paso(self):
+        def guardar(estado, restantes, total):
+            self.conn.execute("INSERT INTO t VALUES (1)")
+            self.conn.commit()
+
+        destino = os.path.join(self.dir.name, "copia.db")
+        respaldo.respaldar(destino, self.db_path, paginas=50, pausa=0, progreso=guardar)
+        copia = sqlite3.connect(destino)
+        try:
+            self.assertGreaterEqual(copia.execute("SELECT COUNT(*) FROM t").fetchone()[0], 5000)
+        finally:
+            copia.close()
+
+    def test_instantaneas_junto_a_la_base(self):
+        ruta = respaldo.crear_instantanea(self.db_path)
+        self.assertEqual(os.path.dirname(ruta), os.path.join(os.path.dirname(self.db_path), respaldo.RESPALDO_DIR))
+        self.assertEqual(respaldo.listar_respaldos(self.db_path), [ruta])
+
+    def test_un_solo_proceso_respalda_a_la_vez(self):
+        with respaldo.bloqueo_respaldo(self.db_path):
+            with self.assertRaises(respaldo.RespaldoEnCurso):
+                respaldo.crear_instantanea(self.db_path)
+            self.assertIsNone(respaldo.crear_instantanea_programada(0, self.db_path))
+        self.assertIsNotNone(respaldo.crear_instantanea_programada(0, self.db_path))
+
+    def test_respaldo_programado_se_omite_si_hay_uno_reciente(self):
+        respaldo.crear_instantanea(self.db_path)
+        self.assertIsNone(respaldo.crear_instantanea_programada(30, self.db_path))
+        self.assertEqual(len(respaldo.listar_respaldos(self.db_path)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
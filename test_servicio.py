@@ -0,0 +1,84 @@
+"""
+Pruebas de servicio.py: los parámetros malformados o fuera de rango se rechazan con 400 y un mensaje,
+no con un 500 desde dentro del manejador.
+
+Uso:
+    python -m pytest test_servicio.py
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+import bd
+import servicio
+
+
+class ServicioTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.dir.name, "prueba.db")
+        conn = bd.conectar(self.db_path)
+        bd.crear_esquema(conn)
+        conn.execute("INSERT INTO cursos (nombre) VALUES ('Curso')")
+        self.id_curso = conn.execute("SELECT id FROM cursos").fetchone()[0]
+        conn.execute("INSERT INTO alumnos (nombre, id_curso) VALUES ('Ana', ?)", (self.id_curso,))
+        self.ana = conn.execute("SELECT id FROM alumnos").fetchone()[0]
+        conn.commit()
+        conn.close()
+        self.servicio = servicio.ServicioAsistencia(self.db_path)
+        self.servicio.pool = servicio.PoolConexiones(self.db_path)
+
+    def tearDown(self):
+        self.servicio.pool.cerrar()
+        self.dir.cleanup()
+
+    def despachar(self, metodo, destino, cuerpo=b""):
+        async def despachar():
+            self.servicio.escritor = servicio.EscritorPorLotes(self.db_path)
+            self.servicio.escritor.iniciar()
+            try:
+                return await self.servicio.despachar(metodo, destino, cuerpo)
+            finally:
+                self.servicio.escritor.cerrar()
+
+        return asyncio.run(despachar())
+
+    def assertRechazo(self, metodo, destino, cuerpo=b""):
+        with self.assertRaises(servicio.ErrorHTTP) as ctx:
+            self.despachar(metodo, destino, cuerpo)
+        self.assertEqual(ctx.exception.estado, 400)
+        self.assertTrue(ctx.exception.mensaje)
+
+    def test_parametros_validos(self):
+        cuerpo = json.dumps({"registros": [{"id_alumno": self.ana, "fecha": "2025-03-03", "presente": 1}]}).encode()
+        self.assertEqual(self.despachar("POST", "/asistencia", cuerpo)["guardadas"], 1)
+        grilla = self.despachar("GET", f"/cursos/{self.id_curso}/asistencia?anio=2025&mes=3")
+        self.assertEqual(grilla["dias"][0], "2025-03-03")
+        self.assertEqual([(r["id_alumno"], r["presente"]) for r in grilla["registros"]], [(self.ana, 1)])
+
+    def test_anio_mes_y_curso_invalidos(self):
+        for consulta in ("anio=dos&mes=3", "anio=2025", "anio=2025&mes=13", "anio=0&mes=3",
+                         "anio=9999&mes=12", "anio=99999999999999999999&mes=3"):
+            with self.subTest(consulta=consulta):
+                self.assertRechazo("GET", f"/cursos/{self.id_curso}/asistencia?{consulta}")
+        self.assertRechazo("GET", f"/cursos/{2 ** 64}/alumnos")
+
+    def test_registros_invalidos(self):
+        registros = [
+            "2025-03-03",
+            {"id_alumno": 1, "fecha": "2025-02-30", "presente": 1},
+            {"id_alumno": 1, "fecha": 20250303, "presente": 1},
+            {"id_alumno": 1, "fecha": "2025-03-03", "presente": float("inf")},
+            {"id_alumno": 2 ** 64, "fecha": "2025-03-03", "presente": 1},
+            {"id_alumno": 1, "fecha": "2025-03-03", "presente": 1, "version": -2 ** 64},
+        ]
+        for registro in registros:
+            with self.subTest(registro=registro):
+                self.assertRechazo("POST", "/asistencia", json.dumps({"registros": [registro]}).encode())
+
+
+if __name__ == "__main__":
+    unittest.main()